@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# batch.py
+# Описание: Пакетное разбиение и сборка всех файлов папки или маски в одном общем пуле процессов
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from modules.catalog import Catalog, find_catalog
+from modules.options import SplitOptions
+from modules.parallel import default_workers, workers_arg
+from modules.planner import chunk_size_arg
+from modules.scripts import load_script
+
+# Файлы больше этого размера (МБ) разбиваются на куски в общем пуле, меньшие — обрабатываются целиком одним воркером
+LARGE_FILE_MB = 64
+
+
+def collect_files(patterns):
+    """
+    Файлы для разбиения по папкам (рекурсивно) и маскам glob.
+
+    :return: Список (путь, подпапка относительно корня ввода) — подпапка повторяется в output,
+             чтобы одноимённые файлы из разных папок не смешивались.
+    """
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, names in os.walk(pattern):
+                for name in sorted(names):
+                    files.append((os.path.join(root, name), os.path.relpath(root, pattern)))
+            continue
+        matches = [path for path in sorted(glob.glob(pattern, recursive=True)) if os.path.isfile(path)]
+        if matches:
+            common = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in matches])
+            files.extend((path, os.path.relpath(os.path.dirname(os.path.abspath(path)), common)) for path in matches)
+    return files
+
+
+def collect_metadata(patterns):
+    """
+    JSON-метаданные separator-silence.py в папках (рекурсивно) и по маскам glob.
+
+    :return: Список (путь к метаданным, подпапка относительно корня ввода).
+    """
+    found = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = glob.glob(os.path.join(pattern, '**', 'json', '*.json'), recursive=True)
+            root = pattern
+        else:
+            candidates = glob.glob(pattern, recursive=True)
+            root = None
+        for path in sorted(candidates):
+            if path.endswith('.manifest.json') or '_restored_' in os.path.basename(path):
+                continue
+            # <корень>/<подпапка>/<имя>_<хэш>/json/<метаданные>.json
+            split_dir = os.path.dirname(os.path.dirname(os.path.abspath(path)))
+            found.append((path, os.path.relpath(os.path.dirname(split_dir), os.path.abspath(root)) if root else '.'))
+    return found
+
+
+def split_job(input_file, output_dir, options, workers=1, executor=None):
+    """Разбивает один файл через separator-silence.split_file; выполняется в воркере или в родителе."""
+    start = time.perf_counter()
+    split_file = load_script('separator-silence.py').split_file
+    result = split_file(input_file, output_dir, options, workers, executor=executor)
+    return result, time.perf_counter() - start
+
+
+def merge_job(metadata_file, output_dir, options, workers=1, executor=None):
+    """Собирает один файл через merge_parts-silence.merge_file; выполняется в воркере или в родителе."""
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    merge_file = load_script('merge_parts-silence.py').merge_file
+    result = merge_file(metadata_file, output_dir, workers, executor=executor)
+    return result, time.perf_counter() - start
+
+
+def schedule(jobs, job_function, workers, large_bytes):
+    """
+    Выполняет задания в одном пуле из workers процессов.
+
+    Задания упорядочены от больших к меньшим. Большие (больше large_bytes) по одному
+    обрабатываются в отдельном потоке родителя, а их куски раздаются в общий пул;
+    малые целиком уходят в тот же пул, не больше workers сразу. Так ядра заняты
+    до конца: в хвосте остаются только самые маленькие файлы.
+
+    :param jobs: Список словарей {"path", "size", "output"}.
+    :return: Список результатов {"path", "size", "ok", "output", "seconds", "error"}.
+    """
+    jobs = sorted(jobs, key=lambda job: job["size"], reverse=True)
+    large = [job for job in jobs if workers > 1 and job["size"] > large_bytes]
+    small = [job for job in jobs if not (workers > 1 and job["size"] > large_bytes)]
+    results = []
+    lock = threading.Lock()
+
+    def record(job, result=None, seconds=0.0, error=None):
+        if error is None and result is None:
+            error = "завершилось с ошибкой, подробности в логе"
+        with lock:
+            results.append({"path": job["path"], "size": job["size"], "ok": error is None,
+                            "output": result, "seconds": round(seconds, 3), "error": error})
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Процессы пула запускаются до потока больших файлов: fork в момент, когда
+        # другой поток держит блокировку (импорта, логирования), оставил бы её
+        # захваченной в дочернем процессе навсегда
+        pool.submit(os.getpid).result()
+
+        def run_large():
+            for job in large:
+                try:
+                    result, seconds = job_function(job["path"], job["output"], job["options"], workers, pool)
+                    record(job, result, seconds)
+                except Exception as e:
+                    record(job, error=str(e))
+
+        large_thread = threading.Thread(target=run_large)
+        large_thread.start()
+
+        pending = {}
+
+        def collect(done):
+            for future in done:
+                job = pending.pop(future)
+                try:
+                    record(job, *future.result())
+                except Exception as e:
+                    record(job, error=str(e))
+
+        for job in small:
+            if len(pending) >= workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[pool.submit(job_function, job["path"], job["output"], job["options"])] = job
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+        large_thread.join()
+    return results
+
+
+def summarize(mode, results, elapsed, workers):
+    """Сводный отчёт по всему пакету."""
+    total_bytes = sum(result["size"] for result in results)
+    failed = [result for result in results if not result["ok"]]
+    return {
+        "mode": mode,
+        "files": len(results),
+        "succeeded": len(results) - len(failed),
+        "failed": [{"path": result["path"], "error": result["error"]} for result in failed],
+        "total_bytes": total_bytes,
+        "elapsed_seconds": round(elapsed, 3),
+        "files_per_second": round(len(results) / elapsed, 2) if elapsed else None,
+        "mb_per_second": round(total_bytes / 1048576 / elapsed, 2) if elapsed else None,
+        "workers": workers,
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "results": sorted(results, key=lambda result: result["path"]),
+    }
+
+
+def run(mode, jobs, workers, large_mb, report_path):
+    # Скрипт загружается до пула — воркеры получают его уже импортированным
+    load_script('separator-silence.py' if mode == 'split' else 'merge_parts-silence.py')
+    start = time.perf_counter()
+    results = schedule(jobs, split_job if mode == 'split' else merge_job, workers, large_mb * 1024 * 1024)
+    report = summarize(mode, results, time.perf_counter() - start, workers)
+    with open(report_path, 'w') as report_out:
+        json.dump(report, report_out, indent=2)
+
+    print(f"Файлов: {report['files']}, успешно: {report['succeeded']}, с ошибкой: {len(report['failed'])}")
+    print(f"Объём: {report['total_bytes'] / 1048576:.1f} МБ за {report['elapsed_seconds']:.2f} секунд "
+          f"({report['files_per_second']} файлов/с, {report['mb_per_second']} МБ/с)")
+    for failure in report["failed"]:
+        print(f"Ошибка: {failure['path']}: {failure['error']}")
+    print(f"Отчёт сохранён: {report_path}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пакетное разбиение и сборка файлов в общем пуле процессов")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    split_parser = subparsers.add_parser('split', help='Разбить все файлы папки или маски')
+    split_parser.add_argument('--input', required=True, action='append', help="Папка (рекурсивно) или маска, например 'input/*.mp4'; можно указать несколько раз")
+    split_parser.add_argument('--output', required=True, help='Папка для сохранения частей и метаданных')
+    split_parser.add_argument('--chunk-size', type=chunk_size_arg, default=200, help='Размер куска в КБ (auto — для каждого файла по его размеру)')
+    split_parser.add_argument('--encoding', choices=['hex', 'base64', 'base85'], default='base64', help='Кодирование для частей')
+    split_parser.add_argument('--chunking', choices=['fixed', 'cdc'], default='fixed', help='fixed — куски фиксированного размера, cdc — по содержимому с дедупликацией')
+    split_parser.add_argument('--compression', choices=['none', 'zlib', 'bz2', 'lzma', 'auto'], default='none', help='Сжатие кусков перед кодированием')
+    split_parser.add_argument('--compression-level', type=int, default=None, help='Уровень сжатия')
+    split_parser.add_argument('--layout', choices=['files', 'pack'], default='files', help='files — файл на каждую часть, pack — части в контейнерах')
+    split_parser.add_argument('--pack-size', type=int, default=1024, help='Размер контейнера в МБ для pack')
+    split_parser.add_argument('--parity', type=int, default=0, help='Контрольных частей на полосу (0 — без них)')
+    split_parser.add_argument('--stripe-size', type=int, default=8, help='Частей с данными в полосе для --parity')
+    split_parser.add_argument('--read-mode', choices=['buffered', 'mmap'], default='buffered', help='buffered — чтение кусков в буфер, mmap — кодирование прямо из отображения файла в память')
+
+    merge_parser = subparsers.add_parser('merge', help='Собрать все файлы из папки с результатами разбиения')
+    merge_parser.add_argument('--input', required=True, action='append', help='Папка с результатами separator-silence.py (рекурсивно) или маска JSON-метаданных')
+    merge_parser.add_argument('--output', required=True, help='Папка для восстановленных файлов')
+
+    for subparser in (split_parser, merge_parser):
+        subparser.add_argument('--workers', type=workers_arg, default=0, help='Размер общего пула процессов (0 — по числу ядер)')
+        subparser.add_argument('--large-size', type=int, default=LARGE_FILE_MB, help='Файлы больше этого размера в МБ разбиваются на куски в общем пуле')
+        subparser.add_argument('--report', default=None, help='Путь к сводному отчёту (по умолчанию <output>/batch_<команда>_report.json)')
+
+    args = parser.parse_args()
+    workers = args.workers or default_workers()
+    os.makedirs(args.output, exist_ok=True)
+    report_path = args.report or os.path.join(args.output, f"batch_{args.command}_report.json")
+
+    if args.command == 'split':
+        # Общий каталог в корне output: разбиения в подпапки находят его выше себя
+        with Catalog(find_catalog(args.output)):
+            pass
+        options = SplitOptions.from_args(args)
+        jobs = [
+            {"path": path, "size": os.path.getsize(path), "output": os.path.normpath(os.path.join(args.output, subdir)),
+             "options": options}
+            for path, subdir in collect_files(args.input)
+        ]
+    else:
+        jobs = []
+        for path, subdir in collect_metadata(args.input):
+            with open(path, 'r') as metadata_in:
+                size = json.load(metadata_in).get('original_size', 0)
+            jobs.append({"path": path, "size": size, "output": os.path.normpath(os.path.join(args.output, subdir)),
+                         "options": None})
+
+    if not jobs:
+        print("Ошибка: не найдено файлов для обработки.")
+        sys.exit(2)
+
+    batch_report = run(args.command, jobs, workers, args.large_size, report_path)
+    sys.exit(1 if batch_report["failed"] else 0)
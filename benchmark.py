@@ -0,0 +1,453 @@
+#!/usr/bin/env python
+# benchmark.py
+# Описание: Замеры скорости разбиения и сборки по матрице кодировок, размеров частей и числа процессов
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import platform
+import random
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MB = 1024 * 1024
+
+# Виды синтетических входных файлов
+INPUT_KINDS = ('random', 'text', 'sparse')
+
+# Скрипты: silence — separator-silence.py / merge_parts-silence.py, rich — separator.py / merge_parts.py
+SCRIPTS = ('silence', 'rich')
+
+# Способы чтения входного файла при разбиении (см. --read-mode)
+READ_MODES = ('buffered', 'mmap')
+
+# Поля, по которым сопоставляются замеры при сравнении с эталоном
+CASE_KEY = ('script', 'input', 'size_mb', 'encoding', 'chunk_size_kb', 'workers', 'read_mode')
+
+# Значения полей, которых нет в результатах, сохранённых более ранними версиями
+CASE_DEFAULTS = {"read_mode": "buffered"}
+
+# Бюджет времени импорта (мс) для команд cli.py --quiet: быстрый путь не должен импортировать rich
+STARTUP_BUDGET_MS = 60
+
+
+def generate_input(path, kind, size_mb, seed=0):
+    """
+    Создаёт синтетический входной файл блоками по 1 МБ (память не зависит от размера).
+
+    random — несжимаемые данные, text — сжимаемый текст, sparse — нули с редкими
+    случайными участками по 64 КБ на каждый мегабайт.
+    """
+    rng = random.Random(seed)
+    pool = bytearray()
+    if kind == 'text':
+        words = [bytes(rng.choice(b'abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 10))) for _ in range(2000)]
+        while len(pool) < 4 * MB:
+            pool += b' '.join(rng.choices(words, k=10000)) + b'\n'
+    with open(path, 'wb') as f:
+        for _ in range(size_mb):
+            if kind == 'random':
+                block = rng.randbytes(MB)
+            elif kind == 'text':
+                start = rng.randrange(len(pool) - MB)
+                block = pool[start:start + MB]
+            elif kind == 'sparse':
+                block = bytearray(MB)
+                start = rng.randrange(0, MB - 64 * 1024, 4096)
+                block[start:start + 64 * 1024] = rng.randbytes(64 * 1024)
+            else:
+                raise ValueError(f"Неизвестный вид входных данных: {kind}")
+            f.write(block)
+
+
+def file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(MB), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def tree_stats(path):
+    """Число файлов и их общий размер в папке."""
+    count = 0
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            count += 1
+            total += os.path.getsize(os.path.join(root, name))
+    return count, total
+
+
+def run_measured(command):
+    """
+    Запускает команду в отдельном процессе.
+
+    Linux переносит пиковый RSS через exec, поэтому сам процесс замеров должен
+    оставаться небольшим — иначе его память попадёт в замер.
+
+    :return: (секунды, пиковый RSS в МБ — по процессу и дождавшимся его воркерам).
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=BASE_DIR, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise RuntimeError(f"Команда завершилась с кодом {process.returncode}: {shlex.join(command)}")
+    # ru_maxrss в Linux — в КБ
+    return seconds, usage.ru_maxrss / 1024
+
+
+def case_key(case, fields=CASE_KEY):
+    return tuple(case.get(field, CASE_DEFAULTS.get(field)) for field in fields)
+
+
+def split_merge_commands(script, input_path, work_dir, encoding, chunk_size_kb, workers, split_args, read_mode='buffered'):
+    """Команды разбиения и сборки для одного замера и путь к восстановленному файлу."""
+    parts_dir = os.path.join(work_dir, 'parts')
+    merged_dir = os.path.join(work_dir, 'merged')
+    os.makedirs(merged_dir)
+    restored = os.path.join(merged_dir, os.path.basename(input_path))
+    common = ['--chunk-size', str(chunk_size_kb), '--encoding', encoding, '--workers', str(workers)]
+    if script == 'silence':
+        split = [sys.executable, 'separator-silence.py', '--input', input_path, '--output', parts_dir, *common]
+
+        def merge():
+            metadata = next(
+                os.path.join(root, name)
+                for root, _, files in os.walk(parts_dir) for name in files
+                if root.endswith('json') and name.endswith('.json') and not name.endswith('.manifest.json')
+            )
+            return [sys.executable, 'merge_parts-silence.py', '--metadata', metadata, '--output', merged_dir,
+                    '--workers', str(workers)]
+    else:
+        split = [sys.executable, 'separator.py', '--input', input_path, '--output', parts_dir, *common]
+        base_name = os.path.basename(input_path).rsplit('.', 1)[0]
+
+        def merge():
+            return [sys.executable, 'merge_parts.py', '--parts-dir', os.path.join(parts_dir, base_name),
+                    '--output-file', restored, '--encoding', encoding, '--workers', str(workers)]
+    return split + ['--read-mode', read_mode] + split_args, merge, parts_dir, restored
+
+
+def run_case(script, input_path, input_digest, encoding, chunk_size_kb, workers, split_args, repeat, scratch,
+             read_mode='buffered'):
+    """Замер одного сочетания параметров; из repeat повторов берётся лучшее время."""
+    size = os.path.getsize(input_path)
+    best = None
+    for _ in range(repeat):
+        work_dir = tempfile.mkdtemp(dir=scratch)
+        try:
+            split, merge, parts_dir, restored = split_merge_commands(
+                script, input_path, work_dir, encoding, chunk_size_kb, workers, split_args, read_mode)
+            split_seconds, split_rss = run_measured(split)
+            files, encoded_bytes = tree_stats(parts_dir)
+            merge_seconds, merge_rss = run_measured(merge())
+            ok = os.path.isfile(restored) and file_sha256(restored) == input_digest
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        result = {
+            "split_seconds": round(split_seconds, 4),
+            "split_mb_s": round(size / MB / split_seconds, 2),
+            "split_peak_rss_mb": round(split_rss, 1),
+            "merge_seconds": round(merge_seconds, 4),
+            "merge_mb_s": round(size / MB / merge_seconds, 2),
+            "merge_peak_rss_mb": round(merge_rss, 1),
+            "files": files,
+            "output_bytes": encoded_bytes,
+            "growth_percent": round((encoded_bytes - size) / size * 100, 2) if size else 0.0,
+            "ok": ok,
+        }
+        if best is None or split_seconds + merge_seconds < best["split_seconds"] + best["merge_seconds"]:
+            best = result
+    return best
+
+
+def run_matrix(scripts, kinds, sizes_mb, encodings, chunk_sizes_kb, workers_list, split_args=(), repeat=1, work_dir=None,
+               read_modes=('buffered',)):
+    """
+    Прогоняет матрицу замеров. Входные файлы создаются один раз на вид и размер.
+
+    :return: Словарь результатов для сохранения в JSON.
+    """
+    scratch = tempfile.mkdtemp(prefix='separator-bench-', dir=work_dir)
+    cases = []
+    try:
+        for kind, size_mb in itertools.product(kinds, sizes_mb):
+            input_path = os.path.join(scratch, f"{kind}_{size_mb}mb.bin")
+            generate_input(input_path, kind, size_mb)
+            input_digest = file_sha256(input_path)
+            for script, encoding, chunk_size_kb, workers, read_mode in itertools.product(
+                    scripts, encodings, chunk_sizes_kb, workers_list, read_modes):
+                case = {
+                    "script": script,
+                    "input": kind,
+                    "size_mb": size_mb,
+                    "encoding": encoding,
+                    "chunk_size_kb": chunk_size_kb,
+                    "workers": workers,
+                    "read_mode": read_mode,
+                }
+                case.update(run_case(script, input_path, input_digest, encoding, chunk_size_kb, workers,
+                                     list(split_args), repeat, scratch, read_mode))
+                print(format_case(case), flush=True)
+                cases.append(case)
+            os.remove(input_path)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return {
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "split_args": list(split_args),
+        "repeat": repeat,
+        "cases": cases,
+    }
+
+
+def import_profile(command):
+    """
+    Запускает команду под python -X importtime.
+
+    :return: (время всех импортов в мс, имена импортированных модулей, секунды работы команды).
+    """
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-X', 'importtime', *command], cwd=BASE_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    seconds = time.perf_counter() - start
+    if completed.returncode:
+        raise RuntimeError(f"Команда завершилась с кодом {completed.returncode}: {shlex.join(command)}")
+    total_us = 0
+    modules = set()
+    for line in completed.stderr.splitlines():
+        # import time: <собственное> | <с вложенными> | <имя с отступом по вложенности>
+        fields = line.split('|')
+        if not line.startswith('import time:') or len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        modules.add(name.strip())
+        # Импорты верхнего уровня уже включают вложенные
+        if len(name) - len(name.lstrip()) == 1:
+            total_us += int(fields[1])
+    return total_us / 1000, modules, seconds
+
+
+def startup_commands(work_dir):
+    """Команды cli.py для замера запуска на маленьком файле: (название, команда, быстрый путь или нет)."""
+    input_path = os.path.join(work_dir, 'small.bin')
+    with open(input_path, 'wb') as f:
+        f.write(random.Random(0).randbytes(16 * 1024))
+    quiet_dir = os.path.join(work_dir, 'quiet')
+    rich_dir = os.path.join(work_dir, 'rich')
+
+    def metadata():
+        return next(
+            os.path.join(root, name)
+            for root, _, files in os.walk(quiet_dir) for name in files
+            if root.endswith('json') and name.endswith('.json') and not name.endswith('.manifest.json')
+        )
+
+    return [
+        ('split --quiet', lambda: ['cli.py', 'split', '--quiet', '--input', input_path, '--output', quiet_dir,
+                                   '--chunk-size', '4'], True),
+        ('merge --quiet', lambda: ['cli.py', 'merge', '--quiet', '--metadata', metadata(),
+                                   '--output', os.path.join(work_dir, 'merged')], True),
+        ('verify --quiet', lambda: ['cli.py', 'verify', '--quiet', '--manifest', metadata(), '--decode'], True),
+        ('split', lambda: ['cli.py', 'split', '--input', input_path, '--output', rich_dir, '--chunk-size', '4'], False),
+        ('merge --parts-dir', lambda: ['cli.py', 'merge', '--parts-dir', os.path.join(rich_dir, 'small'),
+                                       '--output', os.path.join(work_dir, 'rich.bin')], False),
+    ]
+
+
+def run_startup(budget_ms=STARTUP_BUDGET_MS, repeat=3, work_dir=None):
+    """
+    Замеряет импорты и время запуска команд cli.py на файле 16 КБ (лучшее из repeat).
+
+    Команды с --quiet не проходят, если импорт дольше budget_ms или подтягивает rich.
+    :return: Словарь результатов для сохранения в JSON.
+    """
+    commands = []
+    for _ in range(repeat):
+        scratch = tempfile.mkdtemp(prefix='separator-startup-', dir=work_dir)
+        try:
+            for position, (name, command, fast) in enumerate(startup_commands(scratch)):
+                import_ms, modules, seconds = import_profile(command())
+                if len(commands) <= position:
+                    commands.append({"command": name, "fast_path": fast, "import_ms": import_ms, "seconds": seconds})
+                entry = commands[position]
+                entry["import_ms"] = round(min(entry["import_ms"], import_ms), 1)
+                entry["seconds"] = round(min(entry["seconds"], seconds), 4)
+                entry["rich"] = any(module.split('.')[0] in ('rich', 'rich_click') for module in modules)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+    for entry in commands:
+        entry["ok"] = not entry["fast_path"] or (entry["import_ms"] <= budget_ms and not entry["rich"])
+    return {
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "budget_ms": budget_ms,
+        "repeat": repeat,
+        "commands": commands,
+    }
+
+
+def format_startup(entry):
+    status = "ok" if entry["ok"] else "СВЕРХ БЮДЖЕТА"
+    return (f"{entry['command']:<18} импорт {entry['import_ms']:>7.1f} мс  всего {entry['seconds'] * 1000:>7.1f} мс  "
+            f"rich: {'да' if entry['rich'] else 'нет':<3} {status if entry['fast_path'] else ''}")
+
+
+def format_case(case):
+    return (f"{case['script']:<8} {case['input']:<7} {case['size_mb']:>6} МБ {case['encoding']:<7} "
+            f"{case['chunk_size_kb']:>7} КБ x{case['workers']:<3} {case.get('read_mode', 'buffered'):<8} "
+            f"разбиение {case['split_mb_s']:>8.2f} МБ/с {case['split_peak_rss_mb']:>7.1f} МБ RSS | "
+            f"сборка {case['merge_mb_s']:>8.2f} МБ/с {case['merge_peak_rss_mb']:>7.1f} МБ RSS | "
+            f"файлов {case['files']:>6} рост {case['growth_percent']:>+7.2f}% {'ok' if case['ok'] else 'ОШИБКА'}")
+
+
+def compare_results(baseline, current, threshold=10.0):
+    """
+    Сравнивает замеры с эталоном: скорость ниже эталона или пиковый RSS выше
+    больше чем на threshold процентов считается регрессией.
+
+    :return: Список строк с описанием регрессий.
+    """
+    reference = {case_key(case): case for case in baseline["cases"]}
+    regressions = []
+    for case in current["cases"]:
+        key = case_key(case)
+        base = reference.get(key)
+        if base is None:
+            continue
+        label = " ".join(f"{name}={value}" for name, value in zip(CASE_KEY, key))
+        for metric in ("split_mb_s", "merge_mb_s"):
+            change = (case[metric] - base[metric]) / base[metric] * 100
+            if change < -threshold:
+                regressions.append(f"{label}: {metric} {base[metric]} -> {case[metric]} ({change:+.1f}%)")
+        for metric in ("split_peak_rss_mb", "merge_peak_rss_mb"):
+            change = (case[metric] - base[metric]) / base[metric] * 100
+            if change > threshold:
+                regressions.append(f"{label}: {metric} {base[metric]} -> {case[metric]} ({change:+.1f}%)")
+        if base["ok"] and not case["ok"]:
+            regressions.append(f"{label}: восстановленный файл не совпадает с исходным")
+    return regressions
+
+
+def read_mode_gains(cases):
+    """
+    Разница разбиения с --read-mode mmap относительно buffered при прочих равных.
+
+    :return: Список строк: изменение скорости разбиения и пикового RSS.
+    """
+    fields = tuple(field for field in CASE_KEY if field != 'read_mode')
+    buffered = {case_key(case, fields): case for case in cases if case.get('read_mode', 'buffered') == 'buffered'}
+    lines = []
+    for case in cases:
+        base = buffered.get(case_key(case, fields))
+        if case.get('read_mode') != 'mmap' or base is None:
+            continue
+        label = " ".join(f"{name}={value}" for name, value in zip(fields, case_key(case, fields)))
+        speed = (case["split_mb_s"] - base["split_mb_s"]) / base["split_mb_s"] * 100
+        rss = case["split_peak_rss_mb"] - base["split_peak_rss_mb"]
+        lines.append(f"{label}: разбиение {base['split_mb_s']} -> {case['split_mb_s']} МБ/с ({speed:+.1f}%), "
+                     f"пиковый RSS {rss:+.1f} МБ")
+    return lines
+
+
+def report_comparison(baseline_path, current, threshold):
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    regressions = compare_results(baseline, current, threshold)
+    for line in regressions:
+        print(f"РЕГРЕССИЯ {line}")
+    if not regressions:
+        print(f"Регрессий относительно {baseline_path} нет (порог {threshold}%).")
+    return regressions
+
+
+def parse_list(text, cast=str):
+    return [cast(item.strip()) for item in text.split(',') if item.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры скорости разбиения и сборки файлов")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Прогнать матрицу замеров')
+    run_parser.add_argument('--scripts', default='silence,rich', help='Скрипты через запятую: silence, rich')
+    run_parser.add_argument('--inputs', default='random,text,sparse', help='Виды входных данных через запятую: random, text, sparse')
+    run_parser.add_argument('--sizes', default='16', help='Размеры входных файлов в МБ через запятую, например 16,1024,4096')
+    run_parser.add_argument('--encodings', default='hex,base64,base85', help='Кодировки через запятую')
+    run_parser.add_argument('--chunk-sizes', default='200,4096', help='Размеры частей в КБ через запятую')
+    run_parser.add_argument('--workers', default='1', help='Числа процессов через запятую, например 1,4')
+    run_parser.add_argument('--read-modes', default='buffered', help='Способы чтения при разбиении через запятую: buffered, mmap')
+    run_parser.add_argument('--split-args', default='', help="Дополнительные опции разбиения, например '--compression auto'")
+    run_parser.add_argument('--repeat', type=int, default=1, help='Повторов на замер (берётся лучшее время)')
+    run_parser.add_argument('--work-dir', default=None, help='Папка для временных файлов (по умолчанию системная)')
+    run_parser.add_argument('--save', default=None, help='Сохранить результаты в JSON-файл')
+    run_parser.add_argument('--baseline', default=None, help='Сравнить с сохранёнными результатами')
+    run_parser.add_argument('--threshold', type=float, default=10.0, help='Допустимое ухудшение в процентах')
+
+    startup_parser = subparsers.add_parser('startup', help='Замерить время запуска cli.py (python -X importtime)')
+    startup_parser.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS, help='Допустимое время импорта для --quiet в мс')
+    startup_parser.add_argument('--repeat', type=int, default=3, help='Повторов на команду (берётся лучшее время)')
+    startup_parser.add_argument('--work-dir', default=None, help='Папка для временных файлов (по умолчанию системная)')
+    startup_parser.add_argument('--save', default=None, help='Сохранить результаты в JSON-файл')
+
+    compare_parser = subparsers.add_parser('compare', help='Сравнить сохранённые результаты с эталоном')
+    compare_parser.add_argument('baseline', help='JSON с эталонными результатами')
+    compare_parser.add_argument('current', help='JSON с новыми результатами')
+    compare_parser.add_argument('--threshold', type=float, default=10.0, help='Допустимое ухудшение в процентах')
+
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        with open(args.current, 'r') as current_in:
+            current_results = json.load(current_in)
+        sys.exit(1 if report_comparison(args.baseline, current_results, args.threshold) else 0)
+
+    if args.command == 'startup':
+        startup = run_startup(args.budget_ms, args.repeat, args.work_dir)
+        for entry in startup["commands"]:
+            print(format_startup(entry))
+        if args.save:
+            with open(args.save, 'w') as results_out:
+                json.dump(startup, results_out, indent=2)
+            print(f"Результаты сохранены: {args.save}")
+        sys.exit(0 if all(entry["ok"] for entry in startup["commands"]) else 1)
+
+    for name in parse_list(args.scripts):
+        if name not in SCRIPTS:
+            parser.error(f"Неизвестный скрипт: {name}")
+    for name in parse_list(args.inputs):
+        if name not in INPUT_KINDS:
+            parser.error(f"Неизвестный вид входных данных: {name}")
+    for name in parse_list(args.read_modes):
+        if name not in READ_MODES:
+            parser.error(f"Неизвестный способ чтения: {name}")
+
+    results = run_matrix(
+        parse_list(args.scripts), parse_list(args.inputs), parse_list(args.sizes, int),
+        parse_list(args.encodings), parse_list(args.chunk_sizes, int), parse_list(args.workers, int),
+        shlex.split(args.split_args), args.repeat, args.work_dir, parse_list(args.read_modes),
+    )
+    gains = read_mode_gains(results["cases"])
+    if gains:
+        print("mmap относительно buffered:")
+        for line in gains:
+            print(f"  {line}")
+    if args.save:
+        with open(args.save, 'w') as results_out:
+            json.dump(results, results_out, indent=2)
+        print(f"Результаты сохранены: {args.save}")
+    failed = [case for case in results["cases"] if not case["ok"]]
+    regressions = report_comparison(args.baseline, results, args.threshold) if args.baseline else []
+    sys.exit(1 if failed or regressions else 0)
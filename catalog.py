@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# catalog.py
+# Описание: Каталог наборов частей в output/catalog.sqlite3 — поиск, удаление, пересборка и сборка мусора
+import argparse
+import json
+import os
+import sys
+from modules.catalog import GC_MIN_AGE, Catalog, find_catalog, remove_files
+from modules.parallel import default_workers, workers_arg
+
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def size_arg(value):
+    """Размер для --min-size/--max-size: байты или число с суффиксом K, M, G, T (10M, 1.5G)."""
+    text = value.strip().upper().rstrip('B')
+    unit = text[-1:] if text[-1:] in SIZE_UNITS else ''
+    try:
+        return int(float(text[:len(text) - len(unit)]) * SIZE_UNITS[unit])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"нужен размер вида 512K, 10M или 1.5G: {value}")
+
+
+def format_size(size):
+    if size is None:
+        return "?"
+    for unit in ('Б', 'КБ', 'МБ', 'ГБ'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'Б' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} ТБ"
+
+
+def open_catalog(output, create=False):
+    path = find_catalog(output, create=create)
+    if path is None:
+        print(f"Ошибка: каталог не найден в {output} и выше. Создайте его: catalog.py rebuild --output {output}")
+        sys.exit(2)
+    return Catalog(path)
+
+
+def print_sets(catalog, split_sets):
+    for split_set in split_sets:
+        print(f"{split_set['id']:>5}  {split_set['created_at']}  {format_size(split_set['original_size']):>10}  "
+              f"{split_set['part_count']:>6} ч.  {split_set['encoding']:<6}  {split_set['file_name']}  "
+              f"{os.path.relpath(catalog.absolute(split_set['metadata_path']))}")
+    print(f"Наборов: {len(split_sets)}")
+
+
+def run_find(args):
+    with open_catalog(args.output) as catalog:
+        split_sets = catalog.find(args.name, args.hash, args.since, args.until, args.min_size, args.max_size)
+        if args.json:
+            for split_set in split_sets:
+                split_set["metadata"] = json.loads(split_set["metadata"])
+            print(json.dumps(split_sets, ensure_ascii=False, indent=2))
+        else:
+            print_sets(catalog, split_sets)
+    return 0 if split_sets else 1
+
+
+def run_show(args):
+    with open_catalog(args.output) as catalog:
+        try:
+            split_set = catalog.get(args.set)
+        except KeyError as e:
+            print(f"Ошибка: {e.args[0]}")
+            return 2
+        split_set["metadata"] = json.loads(split_set["metadata"])
+        split_set["merges"] = catalog.merges(split_set["id"])
+        if args.parts:
+            split_set["parts"] = catalog.parts(split_set["id"])
+        print(json.dumps(split_set, ensure_ascii=False, indent=2))
+    return 0
+
+
+def run_rebuild(args):
+    workers = args.workers or default_workers()
+    with open_catalog(args.output, create=True) as catalog:
+        found, removed, errors = catalog.rebuild(workers)
+    for error in errors:
+        print(f"Ошибка чтения: {error}")
+    print(f"Наборов в каталоге: {found}, удалено отсутствующих: {removed}")
+    return 1 if errors else 0
+
+
+def run_gc(args):
+    workers = args.workers or default_workers()
+    with open_catalog(args.output, create=True) as catalog:
+        # Каталог сначала сверяется с диском: ссылки на части берутся из всех наборов дерева
+        _, _, errors = catalog.rebuild(workers)
+        if errors:
+            for error in errors:
+                print(f"Ошибка чтения: {error}")
+            print("Сборка мусора отменена: не все метаданные прочитаны, их части могли бы быть удалены.")
+            return 1
+        orphans = catalog.orphans(args.min_age * 60)
+        orphan_bytes = sum(os.path.getsize(path) for path in orphans)
+        for path in orphans:
+            print(os.path.relpath(path))
+        if args.dry_run:
+            print(f"Ничейных частей: {len(orphans)}, {format_size(orphan_bytes)} (--dry-run: ничего не удалено)")
+            return 0
+        removed, freed = remove_files(orphans, catalog.root)
+        print(f"Удалено ничейных частей: {removed}, освобождено {format_size(freed)}")
+    return 0
+
+
+def run_delete(args):
+    with open_catalog(args.output) as catalog:
+        for key in args.set:
+            try:
+                split_set = catalog.get(key)
+            except KeyError as e:
+                print(f"Ошибка: {e.args[0]}")
+                return 2
+            removed, freed = catalog.delete(split_set["id"])
+            note = " (куски общего хранилища cdc освобождает catalog.py gc)" if split_set["chunking"] == "cdc" else ""
+            print(f"Удалён набор {split_set['file_name']}: файлов {removed}, {format_size(freed)}{note}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Каталог наборов частей: поиск, удаление, пересборка и сборка мусора")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--output', default='output', help='Папка разбиений; каталог ищется в ней и выше (по умолчанию output)')
+
+    find_parser = subparsers.add_parser('find', parents=[common], help='Найти наборы по имени, хэшу, дате или размеру')
+    find_parser.add_argument('--name', default=None, help='Часть имени исходного файла (без учёта регистра)')
+    find_parser.add_argument('--hash', default=None, help='Начало MD5 файла, корня дерева Меркла или SHA-256 части или куска')
+    find_parser.add_argument('--since', default=None, help='Созданные не раньше даты, например 2024-05-01 или 2024-05-01T12:00')
+    find_parser.add_argument('--until', default=None, help='Созданные не позже даты (дата включается целиком)')
+    find_parser.add_argument('--min-size', type=size_arg, default=None, help='Исходный файл не меньше, например 100M')
+    find_parser.add_argument('--max-size', type=size_arg, default=None, help='Исходный файл не больше, например 2G')
+    find_parser.add_argument('--json', action='store_true', help='Вывести наборы в JSON со всеми полями метаданных')
+    find_parser.set_defaults(run=run_find)
+
+    show_parser = subparsers.add_parser('show', parents=[common], help='Показать набор, его метаданные и историю сборок')
+    show_parser.add_argument('set', help='Номер набора в каталоге, путь к метаданным или папка набора')
+    show_parser.add_argument('--parts', action='store_true', help='Вывести также пути, размеры и хэши частей')
+    show_parser.set_defaults(run=run_show)
+
+    rebuild_parser = subparsers.add_parser('rebuild', parents=[common], help='Собрать каталог заново обходом папки')
+    rebuild_parser.add_argument('--workers', type=workers_arg, default=0, help='Процессов для чтения метаданных (0 — по числу ядер)')
+    rebuild_parser.set_defaults(run=run_rebuild)
+
+    gc_parser = subparsers.add_parser('gc', parents=[common], help='Удалить части, на которые не ссылается ни один набор')
+    gc_parser.add_argument('--dry-run', action='store_true', help='Только показать ничейные части')
+    gc_parser.add_argument('--min-age', type=int, default=GC_MIN_AGE // 60, help='Не трогать файлы моложе стольких минут (части идущего разбиения)')
+    gc_parser.add_argument('--workers', type=workers_arg, default=0, help='Процессов для чтения метаданных (0 — по числу ядер)')
+    gc_parser.set_defaults(run=run_gc)
+
+    delete_parser = subparsers.add_parser('delete', parents=[common], help='Удалить набор с диска и из каталога')
+    delete_parser.add_argument('set', nargs='+', help='Номер набора, путь к метаданным или папка набора')
+    delete_parser.set_defaults(run=run_delete)
+
+    args = parser.parse_args()
+    sys.exit(args.run(args))
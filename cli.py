@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# cli.py
+# Описание: Единая точка входа split / merge / verify с быстрым запуском
+import argparse
+import json
+import os
+import sys
+from functools import partial
+from modules.parallel import workers_arg
+from modules.options import SplitOptions
+from modules.planner import chunk_size_arg
+from modules.progress_events import ProgressEmitter
+from modules.scripts import load_script
+
+# Скрипты загружаются только под выбранную команду. Интерактивное разбиение идёт через
+# separator.py (rich), а с --quiet и при сборке по метаданным — через тихие скрипты:
+# они импортируют только стандартную библиотеку и modules/, поэтому запуск для
+# маленького файла не тратит на импорт rich больше времени, чем на саму работу.
+# Бюджет времени запуска проверяет `benchmark.py startup`.
+
+
+def emit(result, file=None):
+    """Машиночитаемый результат --quiet: одна строка JSON в stdout (в stderr, если stdout занят данными)."""
+    print(json.dumps(result, ensure_ascii=False), file=file or sys.stdout)
+
+
+def run_split(args):
+    if args.quiet:
+        split = partial(load_script('separator-silence.py').split_file, args.input, args.output,
+                        SplitOptions.from_args(args), args.workers, args.max_in_flight, ProgressEmitter(args.progress_fd))
+        if args.profile:
+            # cProfile и tracemalloc — только при --profile
+            from modules.stats import profile_call
+            metadata_file = profile_call(split)
+        else:
+            metadata_file = split()
+        emit({"command": "split", "ok": metadata_file is not None, "metadata": metadata_file})
+        return 0 if metadata_file is not None else 1
+
+    split_file = load_script('separator.py').split_file
+    split_file(args.input, args.output, args.chunk_size, args.encoding, args.workers, args.max_in_flight, args.chunking,
+               args.min_chunk_size, args.max_chunk_size, args.compression, args.compression_level, args.layout,
+               args.pack_size, args.read_mode)
+    return 0
+
+
+def run_merge(args):
+    if args.parts_dir is not None:
+        # Папка частей separator.py собирается с выводом rich
+        load_script('merge_parts.py').merge_file(args.parts_dir, args.output, args.encoding, args.workers, args.max_in_flight)
+        return 0
+
+    # С --output - восстановленные байты идут в stdout, а сообщения — в stderr
+    messages = sys.stderr if args.output == '-' else sys.stdout
+    if args.output != '-':
+        os.makedirs(args.output, exist_ok=True)
+    merge_file = load_script('merge_parts-silence.py').merge_file
+    output_path = merge_file(args.metadata, args.output, args.workers, args.max_in_flight, ProgressEmitter(args.progress_fd),
+                             resume=args.resume, parts_url=args.parts_url, connections=args.connections)
+    if args.quiet:
+        emit({"command": "merge", "ok": output_path is not None, "output": output_path}, messages)
+    elif output_path is not None:
+        print(f"Файл восстановлен: {output_path}", file=messages)
+    else:
+        print("Ошибка восстановления, подробности в logs/merge_parts-silence.log", file=messages)
+    return 0 if output_path is not None else 1
+
+
+def run_verify(args):
+    verify_parts = load_script('verify_parts.py')
+    try:
+        if args.quiet:
+            result = verify_parts.check(args.manifest, args.parts, args.workers, args.decode, args.root, args.parts_dir)
+            emit({"command": "verify", "ok": not result["bad_parts"], **result})
+            return 1 if result["bad_parts"] else 0
+        bad_parts = verify_parts.verify(args.manifest, args.parts, args.workers, args.decode, args.root, args.parts_dir)
+    except (OSError, ValueError, KeyError) as e:
+        if args.quiet:
+            emit({"command": "verify", "ok": False, "error": str(e)})
+        else:
+            print(f"Ошибка: {e}")
+        return 2
+    return 1 if bad_parts else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Разбиение, сборка и проверка файлов одной командой")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--quiet', action='store_true', help='Без rich: результат одной строкой JSON в stdout, подробности в logs/')
+    common.add_argument('--workers', type=workers_arg, default=1, help='Количество процессов (0 — по числу ядер)')
+    resumable = argparse.ArgumentParser(add_help=False)
+    resumable.add_argument('--resume', action='store_true', help='Продолжить прерванный запуск по журналу готовых частей (split — только с --quiet, merge — только с --metadata)')
+
+    split_parser = subparsers.add_parser('split', parents=[common, resumable], help='Разбить файл на части')
+    split_parser.add_argument('--input', required=True, help="Путь к исходному файлу ('-' — поток из stdin, только с --quiet)")
+    split_parser.add_argument('--name', default=None, help='Имя файла в метаданных для --input - (по умолчанию stdin)')
+    split_parser.add_argument('--output', required=True, help='Папка для частей')
+    split_parser.add_argument('--chunk-size', type=chunk_size_arg, default=100, help='Размер части в КБ (по умолчанию 100, auto — по размеру файла и замеру скорости записи)')
+    split_parser.add_argument('--encoding', choices=['hex', 'base64', 'base85'], default='base85', help='Кодирование частей')
+    split_parser.add_argument('--max-in-flight', type=int, default=None, help='Максимум кусков в обработке одновременно (по умолчанию 2 * workers)')
+    split_parser.add_argument('--chunking', choices=['fixed', 'cdc'], default='fixed', help='fixed — куски фиксированного размера, cdc — по содержимому с дедупликацией')
+    split_parser.add_argument('--min-chunk-size', type=int, default=None, help='Минимальный размер куска в КБ для cdc')
+    split_parser.add_argument('--max-chunk-size', type=int, default=None, help='Максимальный размер куска в КБ для cdc')
+    split_parser.add_argument('--compression', choices=['none', 'zlib', 'bz2', 'lzma', 'auto'], default='none', help='Сжатие кусков перед кодированием')
+    split_parser.add_argument('--compression-level', type=int, default=None, help='Уровень сжатия')
+    split_parser.add_argument('--layout', choices=['files', 'pack'], default='files', help='files — файл на каждую часть, pack — части подряд в контейнерах')
+    split_parser.add_argument('--pack-size', type=int, default=1024, help='Размер контейнера в МБ для pack')
+    split_parser.add_argument('--read-mode', choices=['buffered', 'mmap'], default='buffered', help='Способ чтения исходного файла')
+    split_parser.add_argument('--parity', type=int, default=0, help='Контрольных частей на полосу (только с --quiet)')
+    split_parser.add_argument('--stripe-size', type=int, default=8, help='Частей с данными в полосе для --parity')
+    split_parser.add_argument('--progress-fd', type=int, default=None, help='Дескриптор канала для событий прогресса (только с --quiet)')
+    split_parser.add_argument('--fsync', action='store_true', help='Сбрасывать каждую часть на диск (только с --quiet)')
+    split_parser.add_argument('--stats', default=None, help='Отчёт по стадиям: .prom — Prometheus, иначе JSON (только с --quiet)')
+    split_parser.add_argument('--sparse', action='store_true', help='Не записывать куски из одного повторённого байта, сборка восстанавливает нули дырами (только с --quiet)')
+    split_parser.add_argument('--profile', action='store_true', help='cProfile и tracemalloc, профиль рядом с метаданными (только с --quiet)')
+    split_parser.set_defaults(run=run_split)
+
+    merge_parser = subparsers.add_parser('merge', parents=[common, resumable], help='Собрать файл из частей')
+    source = merge_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--metadata', help='JSON-метаданные separator-silence.py (cli.py split --quiet)')
+    source.add_argument('--parts-dir', help='Папка частей separator.py (cli.py split), сборка с выводом rich')
+    merge_parser.add_argument('--output', required=True, help="Папка для файла (--metadata, '-' — в stdout) или путь к файлу (--parts-dir)")
+    merge_parser.add_argument('--encoding', choices=['hex', 'base64', 'base85'], default='base85', help='Кодирование частей для --parts-dir')
+    merge_parser.add_argument('--max-in-flight', type=int, default=None, help='Максимум частей в обработке одновременно (по умолчанию 2 * workers)')
+    merge_parser.add_argument('--progress-fd', type=int, default=None, help='Дескриптор канала для событий прогресса (для --metadata)')
+    merge_parser.add_argument('--parts-url', default=None, help='Загружать части по HTTP по шаблону URL с {name} и {index} (для --metadata)')
+    merge_parser.add_argument('--connections', type=int, default=8, help='Постоянных HTTP-соединений для --parts-url')
+    merge_parser.set_defaults(run=run_merge)
+
+    verify_parser = subparsers.add_parser('verify', parents=[common], help='Проверить части по манифесту без сборки')
+    verify_parser.add_argument('--manifest', required=True, help='Путь к манифесту, JSON-метаданным или папке частей')
+    verify_parser.add_argument('--parts-dir', default=None, help='Папка с частями (по умолчанию определяется по манифесту)')
+    verify_parser.add_argument('--parts', default=None, help="Проверить только указанные части, например '1-3,7'")
+    verify_parser.add_argument('--decode', action='store_true', help='Дополнительно декодировать части и сверять хэши кусков')
+    verify_parser.add_argument('--root', default=None, help='Ожидаемый корень дерева Меркла')
+    verify_parser.set_defaults(run=run_verify)
+    return parser
+
+
+if __name__ == "__main__":
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.command == 'split' and not args.quiet and (args.parity or args.progress_fd is not None or args.fsync
+                                                       or args.stats or args.profile or args.resume or args.sparse
+                                                       or args.input == '-'):
+        parser.error("--parity, --progress-fd, --fsync, --stats, --profile, --resume, --sparse и --input - поддерживаются только с --quiet")
+    if args.command == 'merge' and args.quiet and args.parts_dir is not None:
+        parser.error("--quiet собирает по --metadata; папка --parts-dir собирается только с выводом rich")
+    if args.command == 'merge' and (args.resume or args.parts_url or args.output == '-') and args.parts_dir is not None:
+        parser.error("--resume, --parts-url и --output - работают при сборке по --metadata")
+    sys.exit(args.run(args))
@@ -1,18 +1,355 @@
 # merge_parts-silence.py
 import os
 import argparse
+import hashlib
+import io
 import json
-import base64
 import logging
+import sys
 import time
+from contextlib import nullcontext
+from functools import partial
+from modules.codec import DECODE_ERRORS, ENCODINGS, iter_decode
+from modules.journal import JournalWriter, load_journal
+from modules.manifest import check_range, find_bad_parts, format_part_numbers, load_manifest, new_hasher
+from modules.pack import part_location
+from modules.parity import repair_file
+from modules.progress_events import ProgressEmitter
+from modules.parallel import default_workers, ordered_map, parallel_merge, preallocate, verify_parts, workers_arg
+from modules.sparse import hash_run, write_run
 
 # Логирование
 logging.basicConfig(filename="logs/merge_parts-silence.log", level=logging.INFO,
                     format="%(asctime)s - %(levelname)s - %(message)s")
 logging.info("===========merge_parts-silence.py начал===========log %s==========", time.strftime('%Y-%m-%d %H:%M:%S'))
 
-def merge_file(metadata_file, output_dir):
-    """Функция для восстановления файла из частей."""
+def file_md5(path):
+    """MD5 уже собранного файла (когда на лету контрольная сумма считалась с пропусками)."""
+    restored_md5 = hashlib.md5()
+    with open(path, "rb") as restored_file:
+        for block in iter(lambda: restored_file.read(1024 * 1024), b""):
+            restored_md5.update(block)
+    return restored_md5
+
+
+def record_merge(metadata_file, output_path, md5):
+    """Записывает сборку в каталог output/catalog.sqlite3, если он есть (ошибка каталога сборку не прерывает)."""
+    from modules import catalog
+    try:
+        catalog.record_merge(metadata_file, output_path, md5)
+    except catalog.CATALOG_ERRORS as e:
+        logging.warning(f"Каталог не обновлён: {e}")
+
+
+def report_bad_parts(manifest, parts_dir, workers):
+    """Проверяет все части по манифесту и пишет в лог номера повреждённых и отсутствующих."""
+    if manifest is None:
+        return
+    bad_parts = [index for index, status in verify_parts(manifest, parts_dir, workers=workers, decode=True) if status != 'ok']
+    if bad_parts:
+        logging.error(f"Повреждённые или отсутствующие части: {format_part_numbers(bad_parts)}")
+
+
+def manifest_part_list(manifest, parts_dir, runs):
+    """
+    (номер, путь, смещение в файле, (смещение, длина) в контейнере или None) каждой части.
+
+    Путь каждой части (во вложенной папке, контейнере или общем хранилище) и её
+    смещение записаны в манифесте — часть находится по номеру, папки не просматриваются.
+    У кусков из повтора байта (runs) пути нет.
+    """
+    for entry in manifest['parts']:
+        if entry['index'] in runs:
+            yield entry['index'], None, entry['offset'], None
+            continue
+        part_file_path, part_range = part_location(parts_dir, entry)
+        yield entry['index'], part_file_path, entry['offset'], part_range
+
+
+def legacy_part_list(parts_dir, file_name, name_hash, part_count, chunk_size):
+    """Как manifest_part_list для старых метаданных без манифеста: плоская папка с номерами не короче трёх цифр."""
+    for part_number in range(1, part_count + 1):
+        part_file_name = f"{file_name[:5]}_{name_hash}_part_{part_number:03d}.txt"
+        yield part_number, os.path.join(parts_dir, part_file_name), (part_number - 1) * chunk_size * 1024, None
+
+
+def resumed_parts(manifest, journal_path, journal_header, partial_path, workers, max_in_flight, executor):
+    """Записи манифеста частей из журнала, чьи диапазоны в .partial совпали с хэшами манифеста."""
+    records = load_journal(journal_path, journal_header)
+    entries = {entry['index']: entry for entry in manifest['parts']}
+    tasks = ((index, (partial_path, entries[index]['offset'], entries[index]['size'], entries[index]['chunk_sha256']))
+             for index in sorted(records)
+             if index in entries and records[index]['chunk_sha256'] == entries[index]['chunk_sha256'])
+    if workers > 1:
+        checked = ordered_map(check_range, tasks, workers, max_in_flight, executor)
+    else:
+        checked = ((index, check_range(*args)) for index, args in tasks)
+    done = [entries[index] for index, ok in checked if ok]
+    logging.info(f"Продолжение: собранных частей по журналу {len(records)}, совпали с манифестом {len(done)}")
+    return done
+
+
+class MergeTarget:
+    """
+    Собираемый файл (<имя>.partial) или stdout: контрольная сумма на лету, хэши
+    собранных кусков для сверки с манифестом, журнал и потерянные части.
+
+    done — записи манифеста частей, собранных до продолжения: они не декодируются заново.
+    parity — запись parity манифеста: потерянные части не прерывают сборку, а
+    восстанавливаются после неё.
+    """
+
+    def __init__(self, partial_path, to_stdout, encoding, compression, part_count, progress,
+                 journal=None, done=(), parity=None):
+        self.partial_path = partial_path
+        self.to_stdout = to_stdout
+        self.encoding = encoding
+        self.compression = compression
+        self.part_count = part_count
+        self.progress = progress
+        self.journal = journal
+        self.parity = parity
+        self.done = {entry['index'] for entry in done}
+        self.chunk_digests = {entry['index']: entry['chunk_sha256'] for entry in done}
+        self.restored_size = sum(entry['size'] for entry in done)
+        # Контрольная сумма считается по мере записи, без повторного чтения файла
+        self.restored_md5 = hashlib.md5()
+        self.lost = set()
+
+    def open(self):
+        if self.to_stdout:
+            return nullcontext(sys.stdout.buffer)
+        return open(self.partial_path, "r+b" if self.done else "wb")
+
+    def decode_part(self, part_file, output_file, offset, length=None):
+        """Декодирует часть окнами в output_file с offset (память не зависит от размера части); хэш куска."""
+        chunk_hash = new_hasher()
+        # После пропущенной части запись продолжается с её смещения (stdout пишется подряд)
+        if not self.to_stdout:
+            output_file.seek(offset)
+        for decoded_data in iter_decode(part_file, self.encoding, self.compression, length):
+            output_file.write(decoded_data)
+            self.restored_md5.update(decoded_data)
+            chunk_hash.update(decoded_data)
+            self.restored_size += len(decoded_data)
+        return chunk_hash.hexdigest()
+
+    def fill_run(self, output_file, entry):
+        """Кусок из повторённого байта: нули в новом файле остаются дырой, остальное пишется."""
+        if not self.to_stdout:
+            output_file.seek(entry['offset'])
+        # В продолжаемом .partial на месте дыры могли остаться чужие байты — нули пишутся явно
+        write_run(output_file, entry['size'], entry['fill'], hole=not self.to_stdout and not self.done)
+        hash_run(entry['fill'], entry['size'], (self.restored_md5,))
+        self.restored_size += entry['size']
+        return entry['chunk_sha256']
+
+    def record(self, part_number, chunk_digest):
+        """Запоминает хэш собранного куска и записывает его в журнал."""
+        self.chunk_digests[part_number] = chunk_digest
+        if self.journal is not None and chunk_digest is not None:
+            self.journal.record({"index": part_number, "chunk_sha256": chunk_digest})
+
+    def restored(self, part_number):
+        logging.debug("Часть %d/%d восстановлена.", part_number, self.part_count)
+        self.progress.part(part_number, self.restored_size)
+
+    def lose(self, part_number, problem, detail):
+        """
+        Часть не прочитана: с контрольными частями она пропускается и восстанавливается
+        после сборки (True), без них сборка прерывается (False).
+        """
+        if self.parity is not None:
+            logging.warning(f"{problem}, будет восстановлена: {detail}")
+            self.lost.add(part_number)
+            return True
+        logging.error(f"{problem}: {detail}")
+        return False
+
+
+def merge_remote(target, manifest, runs, parts_url, connections, max_in_flight, original_size):
+    """
+    Собирает файл из частей, загружаемых по HTTP (см. modules.remote.HttpPartSource).
+
+    :return: True, если все части собраны или оставлены для восстановления.
+    """
+    # http.client нужен только для загрузки — не замедляет обычный запуск
+    from modules.remote import HttpPartSource
+    try:
+        source = HttpPartSource(parts_url, connections)
+    except ValueError as e:
+        logging.error(str(e))
+        return False
+    with source, target.open() as output_file:
+        entries = (entry for entry in manifest['parts'] if entry['index'] not in target.done)
+        # Следующие части загружаются, пока текущая декодируется и пишется
+        for entry, data, error in source.fetch_parts(entries, max_in_flight):
+            part_number = entry['index']
+            try:
+                if error is not None:
+                    raise error
+                if part_number in runs:
+                    chunk_digest = target.fill_run(output_file, entry)
+                else:
+                    chunk_digest = target.decode_part(io.BytesIO(data), output_file, entry['offset'])
+            except (OSError, *DECODE_ERRORS) as e:
+                if target.lose(part_number, f"Часть {part_number} не загружена или повреждена", e):
+                    continue
+                return False
+            target.record(part_number, chunk_digest)
+            target.restored(part_number)
+        if target.done or (runs and not target.to_stdout):
+            output_file.truncate(original_size)
+    logging.info(f"Части загружены по {source}: соединений {source.pool.opened}, повторов {source.retried}")
+    return True
+
+
+def merge_parallel(target, part_list, runs, original_size, workers, max_in_flight, executor, manifest, parts_dir):
+    """
+    Декодирует части в пуле процессов прямо по их смещениям в заранее созданном файле.
+
+    :return: True, если все части собраны или оставлены для восстановления.
+    """
+    # Все части проверяются заранее, чтобы не оставлять недописанный файл
+    for part_number, part_file_path, _, _ in part_list():
+        if part_number not in runs and not os.path.isfile(part_file_path):
+            if target.lose(part_number, "Часть файла не найдена", part_file_path):
+                continue
+            report_bad_parts(manifest, parts_dir, workers)
+            return False
+
+    # Итоговый размер и смещения известны из метаданных: файл создаётся сразу
+    # нужного размера, а части декодируются и пишутся по своим смещениям параллельно
+    if not target.done:
+        preallocate(target.partial_path, original_size, sparse=bool(runs))
+    if runs:
+        # Куски из повтора пишет сам процесс (нули — дырами); в контрольную сумму
+        # parallel_merge добавит их по порядку, читая промежутки между частями
+        with open(target.partial_path, "r+b") as output_file:
+            for part_number, entry in runs.items():
+                if part_number not in target.done:
+                    output_file.seek(entry['offset'])
+                    write_run(output_file, entry['size'], entry['fill'], hole=not target.done)
+                    target.record(part_number, entry['chunk_sha256'])
+                    target.restored_size += entry['size']
+    skipped = target.lost | target.done | runs.keys()
+    try:
+        jobs = (job for job in part_list() if job[0] not in skipped)
+        # При продолжении контрольная сумма считается по файлу после сборки
+        for part_number, part_size, chunk_digest in parallel_merge(jobs, target.partial_path, target.encoding, workers,
+                                                                     max_in_flight,
+                                                                     None if target.done else target.restored_md5,
+                                                                     target.compression, executor,
+                                                                     skip_corrupt=target.parity is not None):
+            target.record(part_number, chunk_digest)
+            target.restored_size += part_size
+            target.restored(part_number)
+    except DECODE_ERRORS as e:
+        logging.error(f"Ошибка декодирования части: {e}")
+        report_bad_parts(manifest, parts_dir, workers)
+        return False
+    return True
+
+
+def merge_sequential(target, part_list, runs, original_size, workers, manifest, parts_dir):
+    """
+    Декодирует части по порядку в одном процессе — в файл или подряд в stdout.
+
+    :return: True, если все части собраны или оставлены для восстановления.
+    """
+    with target.open() as output_file:
+        for part_number, part_file_path, offset, part_range in part_list():
+            if part_number in target.done:
+                continue
+            if part_number in runs:
+                target.record(part_number, target.fill_run(output_file, runs[part_number]))
+                target.progress.part(part_number, target.restored_size)
+                continue
+            if not os.path.isfile(part_file_path):
+                if target.lose(part_number, "Часть файла не найдена", part_file_path):
+                    continue
+                report_bad_parts(manifest, parts_dir, workers)
+                return False
+
+            start, length = part_range or (0, None)
+            try:
+                with open(part_file_path, "rb") as part_file:
+                    part_file.seek(start)
+                    chunk_digest = target.decode_part(part_file, output_file, offset, length)
+            except DECODE_ERRORS as e:
+                if target.lose(part_number, f"Ошибка декодирования части {part_file_path}", e):
+                    continue
+                report_bad_parts(manifest, parts_dir, workers)
+                return False
+            target.record(part_number, chunk_digest)
+            target.restored(part_number)
+        if target.done or (runs and not target.to_stdout):
+            # Дыра в конце файла не продлевает его сама
+            output_file.truncate(original_size)
+    return True
+
+
+def repair_parts(target, manifest, parts_dir):
+    """
+    Сверяет хэши собранных кусков с манифестом; с контрольными частями несовпавшие
+    и потерянные части восстанавливаются прямо в собранном файле.
+
+    :return: True, если все куски совпали или восстановлены.
+    """
+    bad_parts = find_bad_parts(manifest, target.chunk_digests)
+    if bad_parts and target.parity is not None:
+        try:
+            repaired = repair_file(manifest, parts_dir, target.partial_path, bad_parts)
+        except ValueError as e:
+            logging.error(f"Не удалось восстановить части {format_part_numbers(bad_parts)}: {e}")
+            return False
+        logging.info(f"Части восстановлены по контрольным частям: {format_part_numbers(repaired)}")
+        # Восстановленных байтов нет в контрольной сумме на лету
+        target.restored_md5 = None
+        return True
+    if bad_parts:
+        logging.error(f"Части не совпадают с манифестом: {format_part_numbers(bad_parts)}")
+        return False
+    return True
+
+
+def merge_file(metadata_file, output_dir, workers=1, max_in_flight=None, progress=None, executor=None, resume=False,
+               parts_url=None, connections=8):
+    """
+    Функция для восстановления файла из частей (workers > 1 — параллельное декодирование).
+
+    Если при разбиении записаны контрольные части (--parity), отсутствующие и
+    повреждённые части не прерывают сборку: после неё до parity_parts таких частей
+    в каждой полосе восстанавливаются прямо в собранном файле.
+
+    progress — ProgressEmitter для событий прогресса (по событию на часть).
+    executor — общий пул процессов для workers > 1 (пакетный режим batch.py).
+
+    Файл собирается под именем <имя>.partial и переименовывается в итоговое только
+    после сверки с манифестом и контрольной суммой, поэтому недособранный файл не
+    выглядит готовым. Номера и хэши собранных частей пишутся в журнал <имя>.journal.
+    resume=True — продолжить прерванную сборку: части из журнала, чьи диапазоны в
+    .partial совпали с хэшами манифеста, не декодируются заново (нужен манифест).
+
+    parts_url — загружать части не из папки parts, а по HTTP по шаблону URL
+    с подстановками {name} и {index} (см. modules.remote.HttpPartSource): до
+    connections постоянных соединений, не больше max_in_flight частей в загрузке,
+    повторы при сбоях. Части декодируются из памяти сразу в собираемый файл, на диск
+    не сохраняются. Нужен манифест; контрольные части для --parity берутся из папки parts.
+
+    output_dir="-" — писать восстановленные байты в stdout по порядку частей (например,
+    в | tar x) с постоянной памятью. Проверка по манифесту и MD5 тогда идёт по ходу
+    записи, и об ошибке сообщают только лог и результат None: отданные байты не вернуть.
+    Части декодируются по порядку в одном процессе; потерянную часть в уже отданный
+    поток не восстановить, поэтому контрольные части и --resume не используются.
+
+    Куски из одного повторённого байта (разбиение с --sparse) не читаются из частей:
+    нулевые остаются в файле дырами (место на диске не выделяется), остальные
+    записываются образцом; в stdout идут обычные байты.
+
+    Возвращает путь к восстановленному файлу или None при ошибке.
+    """
+    progress = progress or ProgressEmitter()
     with open(metadata_file, "r") as f:
         metadata = json.load(f)
 
@@ -21,52 +358,133 @@ def merge_file(metadata_file, output_dir):
     chunk_size = metadata['chunk_size']
     encoding = metadata['encoding']
     original_file_name = metadata['original_file_name']
+    original_size = metadata['original_size']
     md5_hash = metadata['md5']
+    # Сжатие кусков перед кодированием (в старых метаданных поля нет)
+    compression = metadata.get('compression')
+    # В старых метаданных поле md5 хранило хэш имени файла, а не содержимого
+    name_hash = metadata.get('name_hash', md5_hash[:5])
+    content_md5 = md5_hash if 'name_hash' in metadata else None
 
     parts_dir = os.path.join(os.path.dirname(metadata_file), '../parts')
-    output_path = os.path.join(output_dir, original_file_name)
+    # Вывод в stdout: файла, который можно дописать или переименовать, нет
+    to_stdout = output_dir == "-"
+    output_path = "-" if to_stdout else os.path.join(output_dir, original_file_name)
+    partial_path = f"{output_path}.partial"
 
     logging.info(f"Общее количество частей: {part_count}")
     logging.info(f"Начало восстановления файла в: {output_path}")
+    progress.start(original_size, part_count)
 
-    with open(output_path, "wb") as output_file:
-        for part_number in range(1, part_count + 1):
-            part_file_name = f"{file_name[:5]}_{md5_hash[:5]}_part_{part_number:03d}.txt"
-            part_file_path = os.path.join(parts_dir, part_file_name)
+    # Манифест с хэшами частей (если есть) позволяет найти конкретные повреждённые части
+    manifest = None
+    if 'manifest' in metadata:
+        try:
+            manifest = load_manifest(os.path.join(os.path.dirname(metadata_file), metadata['manifest']))
+        except (OSError, ValueError, KeyError) as e:
+            # Повреждённый или чужой манифест: собирать по нему нельзя
+            logging.error(f"Манифест частей не прошёл проверку: {e}")
+            return None
+    # Куски из повторённого байта (--sparse): частей для них нет
+    runs = {entry['index']: entry for entry in manifest['parts'] if 'fill' in entry} if manifest is not None else {}
+    # Контрольные части позволяют пропустить потерянные части и восстановить их после сборки
+    parity = manifest.get('parity') if manifest is not None and not to_stdout else None
 
-            if not os.path.isfile(part_file_path):
-                logging.error(f"Часть файла не найдена: {part_file_path}")
-                return
-
-            with open(part_file_path, "rb") as part_file:
-                part_data = part_file.read()
-
-                if encoding == "hex":
-                    output_file.write(bytes.fromhex(part_data.decode()))
-                elif encoding == "base64":
-                    output_file.write(base64.b64decode(part_data))
-                elif encoding == "base85":
-                    output_file.write(base64.b85decode(part_data))
-                else:
-                    logging.error(f"Неизвестная кодировка: {encoding}")
-                    return
-            logging.info(f"Часть {part_number}/{part_count} восстановлена.")
+    if manifest is not None:
+        if 'store' in manifest:
+            parts_dir = os.path.join(os.path.dirname(metadata_file), manifest['store'])
+        part_list = partial(manifest_part_list, manifest, parts_dir, runs)
+    else:
+        part_list = partial(legacy_part_list, parts_dir, file_name, name_hash, part_count, chunk_size)
+
+    if encoding not in ENCODINGS:
+        logging.error(f"Неизвестная кодировка: {encoding}")
+        return
+
+    if workers == 0:
+        workers = default_workers()
+    if to_stdout:
+        if resume:
+            logging.warning("Продолжение невозможно при выводе в stdout: сборка начинается заново")
+        workers = 1
+
+    # Журнал собранных частей; при продолжении их диапазоны в .partial сверяются с манифестом
+    journal = None
+    done = []
+    if manifest is not None and not to_stdout:
+        journal_path = f"{output_path}.journal"
+        journal_header = {"md5": md5_hash, "original_size": original_size,
+                          "merkle_root": manifest.get('merkle_root')}
+        if resume and os.path.isfile(partial_path):
+            done = resumed_parts(manifest, journal_path, journal_header, partial_path, workers, max_in_flight, executor)
+        journal = JournalWriter(journal_path, journal_header,
+                                ({"index": entry['index'], "chunk_sha256": entry['chunk_sha256']}
+                                 for entry in sorted(done, key=lambda entry: entry['index'])))
+    elif resume and not to_stdout:
+        logging.warning("Продолжение без манифеста невозможно: сборка начинается заново")
+
+    target = MergeTarget(partial_path, to_stdout, encoding, compression, part_count, progress, journal, done, parity)
+    if parts_url is not None:
+        if manifest is None:
+            logging.error("Загрузка частей по URL возможна только по манифесту")
+            return
+        merged = merge_remote(target, manifest, runs, parts_url, connections, max_in_flight, original_size)
+    elif workers > 1:
+        merged = merge_parallel(target, part_list, runs, original_size, workers, max_in_flight, executor,
+                                manifest, parts_dir)
+    else:
+        merged = merge_sequential(target, part_list, runs, original_size, workers, manifest, parts_dir)
+    if not merged:
+        return
+
+    if manifest is not None and not repair_parts(target, manifest, parts_dir):
+        return
+
+    restored_md5 = target.restored_md5
+    if restored_md5 is None or done:
+        # Контрольная сумма на лету считалась с пропусками (восстановленные или
+        # уже собранные до продолжения части) — пересчитывается по файлу
+        restored_md5 = file_md5(partial_path)
+    if content_md5 is not None and restored_md5.hexdigest() != content_md5:
+        logging.error(f"Контрольная сумма не совпадает: {restored_md5.hexdigest()} != {content_md5}")
+        return
+
+    if to_stdout:
+        sys.stdout.buffer.flush()
+        logging.info("Файл успешно восстановлен в stdout")
+        record_merge(metadata_file, output_path, restored_md5.hexdigest())
+        progress.done(output_path)
+        return output_path
 
+    # Файл проверен — только теперь он появляется под итоговым именем
+    os.replace(partial_path, output_path)
+    if journal is not None:
+        journal.remove()
     logging.info(f"Файл успешно восстановлен: {output_path}")
+    record_merge(metadata_file, output_path, restored_md5.hexdigest())
+    progress.done(output_path)
     
-    restored_metadata_path = os.path.join(output_dir, f"{md5_hash[:5]}_restored_{original_file_name}.json")
+    restored_metadata_path = os.path.join(output_dir, f"{name_hash}_restored_{original_file_name}.json")
     with open(restored_metadata_path, "w") as metadata_out:
         json.dump(metadata, metadata_out)
 
     logging.info(f"Метаданные восстановленного файла сохранены: {restored_metadata_path}")
+    return output_path
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Восстановление файла из частей на основе метаданных")
     parser.add_argument('--metadata', required=True, help='Путь к JSON файлу с метаданными')
-    parser.add_argument('--output', required=True, help='Путь для сохранения восстановленного файла')
+    parser.add_argument('--output', required=True, help="Папка для восстановленного файла ('-' — вывести его в stdout)")
+    parser.add_argument('--workers', type=workers_arg, default=1, help='Количество процессов для декодирования (0 — по числу ядер)')
+    parser.add_argument('--max-in-flight', type=int, default=None, help='Максимум частей в обработке одновременно (по умолчанию 2 * workers)')
+    parser.add_argument('--progress-fd', type=int, default=None, help='Дескриптор канала для событий прогресса в формате JSON (для меню)')
+    parser.add_argument('--resume', action='store_true', help='Продолжить прерванную сборку: части из журнала, совпавшие с манифестом, не декодируются заново')
+    parser.add_argument('--parts-url', default=None, help='Загружать части по HTTP по шаблону URL, например http://host:8000/parts/{name}')
+    parser.add_argument('--connections', type=int, default=8, help='Постоянных HTTP-соединений для --parts-url')
 
     args = parser.parse_args()
 
-    merge_file(args.metadata, args.output)
+    merge_file(args.metadata, args.output, args.workers, args.max_in_flight, ProgressEmitter(args.progress_fd),
+               resume=args.resume, parts_url=args.parts_url, connections=args.connections)
 
     logging.info("===========merge_parts-silence.py завершен===========log %s==========", time.strftime('%Y-%m-%d %H:%M:%S'))
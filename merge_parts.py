@@ -3,7 +3,6 @@
 # Описание: Скрипт для восстановления оригинального файла из частей, сохранённых с помощью separator.py
 
 import os
-import base64
 import hashlib
 import time
 import math  # Добавляем импорт библиотеки math
@@ -11,18 +10,15 @@ import rich_click as click
 from rich.console import Console
 from rich.progress import Progress
 from rich.table import Table
+from modules.catalog import CATALOG_ERRORS, record_merge
+from modules.codec import DECODE_ERRORS, ENCODINGS, iter_decode, part_decoded_length
+from modules.manifest import find_bad_parts, format_part_numbers, load_manifest, new_hasher
+from modules.pack import part_location
+from modules.parallel import default_workers, parallel_merge, preallocate, verify_parts
 
 # Инициализация Rich для красивого вывода
 console = Console(force_terminal=True, color_system="256")
 
-def calculate_md5(file_path):
-    """Вычисление контрольной суммы файла."""
-    md5_hash = hashlib.md5()
-    with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            md5_hash.update(byte_block)
-    return md5_hash.hexdigest()
-
 def format_size(size_bytes):
     """Форматирует размер файла в человекочитаемый формат."""
     if size_bytes == 0:
@@ -33,15 +29,53 @@ def format_size(size_bytes):
     s = round(size_bytes / p, 2)
     return f"{s} {size_name[i]}"
 
-def merge_file(parts_dir, output_file, encoding):
+def merge_file(parts_dir, output_file, encoding, workers=1, max_in_flight=None):
     """
     Восстанавливает файл из частей и проверяет контрольную сумму.
 
     :param parts_dir: Папка, содержащая части файла.
     :param output_file: Путь для сохранения восстановленного файла.
     :param encoding: Метод декодирования частей файла ('hex', 'base64' или 'base85').
+    :param workers: Количество процессов для декодирования (0 — по числу ядер).
+    :param max_in_flight: Максимум частей в обработке одновременно (по умолчанию 2 * workers).
     """
-    parts = sorted([f for f in os.listdir(parts_dir) if f.endswith('.txt') and '_part_' in f], key=lambda x: int(x.split('_part_')[-1].split('.')[0]))
+    if encoding not in ENCODINGS:
+        console.print(f"[red]Ошибка:[/red] Некорректный тип декодирования '{encoding}'.")
+        return
+
+    if workers == 0:
+        workers = default_workers()
+
+    # Манифест с хэшами частей (если разбиение делалось с ним) позволяет найти повреждённые части
+    manifest_path = os.path.join(parts_dir, "manifest.json")
+    manifest = None
+    if os.path.exists(manifest_path):
+        try:
+            manifest = load_manifest(manifest_path)
+        except (ValueError, KeyError) as e:
+            console.print(f"[yellow]Предупреждение: манифест частей не прошёл проверку: {e}[/yellow]")
+    chunk_digests = {}
+    # Сжатие кусков перед кодированием записано в манифесте
+    compression = manifest.get("compression") if manifest is not None else None
+
+    # Список частей: (номер, путь, смещение или None, если его нужно вычислить по размеру,
+    # (смещение, длина) части в контейнере или None)
+    source_dir = parts_dir
+    if manifest is not None:
+        # Путь каждой части (во вложенной папке, контейнере или общем хранилище) и её
+        # смещение записаны в манифесте — часть находится по номеру, папки не просматриваются
+        source_dir = os.path.join(parts_dir, manifest.get("store", ""))
+        parts = []
+        for entry in manifest["parts"]:
+            part_path, part_range = part_location(source_dir, entry)
+            parts.append((entry["index"], part_path, entry["offset"], part_range))
+    else:
+        # Разбиение без манифеста: части лежат в одной папке, порядок — по номеру в имени
+        names = sorted([f for f in os.listdir(parts_dir) if f.endswith('.txt') and '_part_' in f], key=lambda x: int(x.split('_part_')[-1].split('.')[0]))
+        parts = []
+        for name in names:
+            index = int(name.split('_part_')[-1].split('.')[0])
+            parts.append((index, os.path.join(parts_dir, name), None, None))
 
     if not parts:
         console.print(f"[red]Ошибка:[/red] В папке '{parts_dir}' не найдено частей для восстановления.")
@@ -53,34 +87,48 @@ def merge_file(parts_dir, output_file, encoding):
         task = progress.add_task(f"\n", total=len(parts))  # Прогресс-бар без текста, перенос строки
         start_time = time.time()
 
-        try:
-            with open(output_file, 'wb') as output:
-                for index, part in enumerate(parts, start=1):
-                    part_path = os.path.join(parts_dir, part)
-
-                    with open(part_path, 'r') as part_file:
-                        encoded_data = part_file.read()
-
-                        if encoding == 'hex':
-                            decoded_data = bytes.fromhex(encoded_data)
-                        elif encoding == 'base64':
-                            decoded_data = base64.b64decode(encoded_data)
-                        elif encoding == 'base85':
-                            decoded_data = base64.b85decode(encoded_data)
-                        else:
-                            console.print(f"[red]Ошибка:[/red] Некорректный тип декодирования '{encoding}'.")
-                            return
-
-                        output.write(decoded_data)
+        # Контрольная сумма и размер считаются по мере записи, без повторного чтения файла
+        md5_hash = hashlib.md5()
+        restored_file_size = 0
 
+        try:
+            if workers > 1:
+                # Смещения частей известны заранее по их размерам — файл создаётся
+                # сразу итогового размера, а части пишутся параллельно по своим смещениям
+                jobs = []
+                end = 0
+                for index, part_path, offset, part_range in parts:
+                    if offset is None:
+                        offset = end
+                    jobs.append((index, part_path, offset, part_range))
+                    end = offset + part_decoded_length(part_path, encoding)
+                preallocate(output_file, manifest["original_size"] if manifest is not None else end)
+
+                for index, decoded_size, chunk_digest in parallel_merge(jobs, output_file, encoding, workers, max_in_flight, md5_hash, compression):
+                    chunk_digests[index] = chunk_digest
+                    restored_file_size += decoded_size
                     progress.update(task, advance=1)
-
-            # Подсчёт размера восстановленного файла
-            restored_file_size = os.path.getsize(output_file)
+            else:
+                with open(output_file, 'wb') as output:
+                    for index, part_path, _, part_range in parts:
+                        chunk_hash = new_hasher()
+                        start, length = part_range or (0, None)
+
+                        # Часть читается в бинарном режиме и декодируется окнами
+                        with open(part_path, 'rb') as part_file:
+                            part_file.seek(start)
+                            for decoded_data in iter_decode(part_file, encoding, compression, length):
+                                output.write(decoded_data)
+                                md5_hash.update(decoded_data)
+                                chunk_hash.update(decoded_data)
+                                restored_file_size += len(decoded_data)
+                        chunk_digests[index] = chunk_hash.hexdigest()
+
+                        progress.update(task, advance=1)
 
             # Чтение контрольной суммы из файла
             checksum_file_path = os.path.join(parts_dir, "checksum.md5")
-            restored_md5 = calculate_md5(output_file)
+            restored_md5 = md5_hash.hexdigest()
 
             if os.path.exists(checksum_file_path):
                 with open(checksum_file_path, 'r') as checksum_file:
@@ -99,6 +147,9 @@ def merge_file(parts_dir, output_file, encoding):
                 table.add_row("Число частей", str(len(parts)))
                 table.add_row("Размер восстановленного файла", format_size(restored_file_size))
                 table.add_row("Контрольная сумма (MD5)", restored_md5)
+                if manifest is not None:
+                    bad_parts = find_bad_parts(manifest, chunk_digests)
+                    table.add_row("Повреждённые части", format_part_numbers(bad_parts) if bad_parts else "нет")
                 table.add_row("Время выполнения", f"{end_time - start_time:.2f} секунд")
 
                 console.print(table)
@@ -106,20 +157,35 @@ def merge_file(parts_dir, output_file, encoding):
                 # Сообщение о завершении
                 if restored_md5 == original_md5:
                     console.print(f"\n[bold green]✔ Файл успешно восстановлен. Контрольная сумма совпадает.[/bold green]")
+                    if manifest is not None:
+                        # Сборка записывается в каталог, если папка частей в нём есть
+                        try:
+                            record_merge(manifest_path, output_file, restored_md5)
+                        except CATALOG_ERRORS as e:
+                            console.print(f"[yellow]Предупреждение: каталог не обновлён: {e}[/yellow]")
                 else:
                     console.print(f"\n[bold red]✘ Контрольная сумма не совпадает. Файл может быть поврежден.[/bold red]")
+                if manifest is not None and bad_parts:
+                    console.print(f"[bold red]✘ Части не совпадают с манифестом: {format_part_numbers(bad_parts)}[/bold red]")
 
             else:
                 console.print(f"[yellow]Предупреждение: файл с контрольной суммой не найден.[/yellow]")
 
         except Exception as e:
             console.print(f"[red]Ошибка при восстановлении файла:[/red] {e}")
+            if manifest is not None:
+                # Манифест позволяет указать, какие именно части повреждены
+                bad_parts = [index for index, status in verify_parts(manifest, source_dir, workers=workers, decode=True) if status != 'ok']
+                if bad_parts:
+                    console.print(f"[bold red]✘ Части не совпадают с манифестом: {format_part_numbers(bad_parts)}[/bold red]")
 
 @click.command()
 @click.option('--parts-dir', required=True, help='Путь к папке, содержащей части файла.')
 @click.option('--output-file', required=True, help='Путь для сохранения восстановленного файла.')
 @click.option('--encoding', type=click.Choice(['hex', 'base64', 'base85'], case_sensitive=False), default='base85', help='Тип декодирования частей файла (hex, base64, base85). По умолчанию base85.')
-def main(parts_dir, output_file, encoding):
+@click.option('--workers', type=click.IntRange(min=0), default=1, help='Количество процессов для декодирования частей (0 — по числу ядер). По умолчанию 1.')
+@click.option('--max-in-flight', type=int, default=None, help='Максимум частей в обработке одновременно (по умолчанию 2 * workers).')
+def main(parts_dir, output_file, encoding, workers, max_in_flight):
     """
     **Восстанавливает файл из частей и сверяет контрольные суммы.**
 
@@ -128,7 +194,7 @@ def main(parts_dir, output_file, encoding):
     python3 merge_parts.py --parts-dir output/ --output-file restored_file.mp4 --encoding base85
     ```
     """
-    merge_file(parts_dir, output_file, encoding)
+    merge_file(parts_dir, output_file, encoding, workers, max_in_flight)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,192 @@
+# api.py
+import hashlib
+import io
+import os
+from functools import partial
+
+from modules.codec import ENCODINGS, encode_chunk, encode_stream, iter_decode
+from modules.compression import choose_compression
+from modules.manifest import build_manifest, new_hasher, part_entry
+from modules.options import SplitOptions
+
+# Размер куска по умолчанию, как у separator-silence.py
+DEFAULT_CHUNK_SIZE = 200 * 1024
+
+
+def open_source(source):
+    """
+    Открывает источник данных для чтения.
+
+    :param source: Путь, байты (bytes, bytearray, memoryview) или бинарный файловый объект.
+    :return: (файловый объект, нужно ли его закрыть).
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb'), True
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source), True
+    if hasattr(source, 'readinto'):
+        return source, False
+    raise TypeError(f"Неподдерживаемый источник данных: {type(source).__name__}")
+
+
+class Splitter:
+    """
+    Разбиение в текущем процессе, без записи частей на диск.
+
+    Итерация выдаёт (номер части, закодированная часть) по мере чтения источника —
+    части можно сразу отправлять в сеть или в хранилище pyChainLite. В памяти
+    одновременно находится одна часть. После итерации доступны manifest (тот же
+    формат, что у скриптов, с корнем дерева Меркла), md5 и size.
+
+        splitter = Splitter('input/file.bin', encoding='base85')
+        for index, part in splitter:
+            send(index, part)
+        save(splitter.manifest)
+    """
+
+    def __init__(self, source, chunk_size_bytes=DEFAULT_CHUNK_SIZE, encoding='base64',
+                 compression=None, compression_level=None, base_name=None):
+        """
+        :param source: Путь, байты или бинарный файловый объект.
+        :param compression: 'zlib', 'bz2', 'lzma', 'auto' (только для пути) или None.
+        :param base_name: Префикс имён частей в манифесте: <base_name>_part_N.txt.
+        """
+        error = SplitOptions(encoding=encoding, compression=compression or 'none').error()
+        if error is not None:
+            raise ValueError(error)
+        if compression == 'auto':
+            if not isinstance(source, (str, os.PathLike)):
+                raise ValueError("Автоматический выбор сжатия возможен только для файла на диске")
+            compression, compression_level, _ = choose_compression(
+                source, chunk_size_bytes, partial(encode_chunk, encoding=encoding))
+        self.source = source
+        self.chunk_size_bytes = chunk_size_bytes
+        self.encoding = encoding
+        self.compression = None if compression == 'none' else compression
+        self.compression_level = compression_level
+        self.base_name = base_name
+        self.manifest = None
+        self.md5 = None
+        self.size = None
+
+    @classmethod
+    def from_options(cls, source, options, base_name=None):
+        """
+        Splitter с параметрами SplitOptions — теми же, что у separator-silence.py и batch.py.
+
+        В памяти выполняется только разбиение на фиксированные куски: cdc, контейнеры,
+        контрольные части, --sparse и размер куска auto требуют файлов на диске.
+        """
+        if (options.chunking != 'fixed' or options.layout != 'files' or options.parity_parts or options.sparse
+                or options.chunk_size_kb == 'auto'):
+            raise ValueError("Splitter разбивает только на фиксированные куски заданного размера: "
+                             "cdc, pack, --parity, --sparse и auto доступны в separator-silence.py")
+        return cls(source, options.chunk_size_kb * 1024, options.encoding, options.compression,
+                   options.compression_level, base_name)
+
+    def part_name(self, index):
+        return f"{self.base_name}_part_{index}.txt" if self.base_name else f"part_{index}.txt"
+
+    def __iter__(self):
+        src, close = open_source(self.source)
+        content_md5 = hashlib.md5()
+        entries = []
+        offset = 0
+        try:
+            while True:
+                chunk_hash = new_hasher()
+                part_hash = new_hasher()
+                part = io.BytesIO()
+                length, encoded_size = encode_stream(src, part, self.encoding, self.chunk_size_bytes,
+                                                     (content_md5, chunk_hash), (part_hash,),
+                                                     self.compression, self.compression_level)
+                # Пустой источник даёт ноль частей, как и separator-silence.py
+                if not length:
+                    break
+                index = len(entries) + 1
+                entries.append(part_entry(index, self.part_name(index), offset, length, encoded_size,
+                                          chunk_hash.hexdigest(), part_hash.hexdigest()))
+                offset += length
+                yield index, part.getvalue()
+                if length < self.chunk_size_bytes:
+                    break
+        finally:
+            if close:
+                src.close()
+        self.size = offset
+        self.md5 = content_md5.hexdigest()
+        self.manifest = build_manifest(entries, self.encoding, self.chunk_size_bytes, offset,
+                                       compression=self.compression or 'none',
+                                       compression_level=self.compression_level)
+
+
+def split(source, chunk_size_bytes=DEFAULT_CHUNK_SIZE, encoding='base64', compression=None, compression_level=None):
+    """Генератор (номер части, закодированная часть) — краткая форма Splitter без манифеста."""
+    return iter(Splitter(source, chunk_size_bytes, encoding, compression, compression_level))
+
+
+def iter_merge(parts, encoding=None, compression=None, manifest=None):
+    """
+    Декодирует поток частей, выдавая блоки восстановленных байтов.
+
+    Части должны идти по порядку; номер нужен, чтобы обнаружить пропуск.
+    С манифестом кодировка и сжатие берутся из него, хэш каждой части сверяется
+    до декодирования, а хэш куска — после (при несовпадении ValueError с номером
+    части; блоки этой части к этому моменту уже выданы).
+
+    :param parts: Итерируемый набор (номер части, закодированная часть) или просто частей.
+    """
+    if manifest is not None:
+        encoding = manifest["encoding"]
+        compression = manifest.get("compression")
+        entries = {entry["index"]: entry for entry in manifest["parts"]}
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Неизвестная кодировка: {encoding}")
+
+    expected = 1
+    for item in parts:
+        index, encoded = item if isinstance(item, tuple) else (expected, item)
+        if index != expected:
+            raise ValueError(f"Ожидалась часть {expected}, получена {index}")
+        expected += 1
+
+        entry = None
+        if manifest is not None:
+            entry = entries.get(index)
+            if entry is None:
+                raise ValueError(f"Части {index} нет в манифесте")
+            part_hash = new_hasher()
+            part_hash.update(encoded)
+            if part_hash.hexdigest() != entry["part_sha256"]:
+                raise ValueError(f"Часть {index} повреждена: хэш не совпадает с манифестом")
+
+        chunk_hash = new_hasher()
+        for block in iter_decode(io.BytesIO(encoded), encoding, compression):
+            chunk_hash.update(block)
+            yield block
+        if entry is not None and chunk_hash.hexdigest() != entry["chunk_sha256"]:
+            raise ValueError(f"Часть {index} повреждена: хэш куска не совпадает с манифестом")
+
+    if manifest is not None and expected - 1 != manifest["part_count"]:
+        raise ValueError(f"Получено частей: {expected - 1}, в манифесте: {manifest['part_count']}")
+
+
+def merge(parts, output, encoding=None, compression=None, manifest=None):
+    """
+    Собирает файл из потока частей (см. iter_merge).
+
+    :param output: Путь или бинарный файловый объект для записи.
+    :return: (размер восстановленных данных, MD5 в hex).
+    """
+    content_md5 = hashlib.md5()
+    size = 0
+    dst = open(output, 'wb') if isinstance(output, (str, os.PathLike)) else output
+    try:
+        for block in iter_merge(parts, encoding, compression, manifest):
+            dst.write(block)
+            content_md5.update(block)
+            size += len(block)
+    finally:
+        if dst is not output:
+            dst.close()
+    return size, content_md5.hexdigest()
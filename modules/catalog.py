@@ -0,0 +1,515 @@
+# catalog.py
+import json
+import os
+import sqlite3
+import time
+
+from modules.manifest import locate_manifest
+from modules.parallel import ordered_map
+
+# Файл каталога в корне дерева разбиений (обычно output/catalog.sqlite3)
+CATALOG_NAME = "catalog.sqlite3"
+
+# Ошибки обновления каталога: разбиение и сборка из-за них не прерываются
+CATALOG_ERRORS = (sqlite3.Error, OSError, ValueError, KeyError)
+
+# Файлы частей, которые сборщик мусора считает своими (остальные файлы не трогаются)
+PART_SUFFIXES = ('.txt', '.pack', '.tmp')
+
+# Файлы моложе этого возраста (с) не считаются мусором: части идущего разбиения
+# лежат на диске раньше, чем набор попадает в каталог
+GC_MIN_AGE = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS split_sets (
+    id INTEGER PRIMARY KEY,
+    metadata_path TEXT NOT NULL UNIQUE,
+    set_dir TEXT NOT NULL,
+    manifest_path TEXT,
+    parts_dir TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    original_size INTEGER,
+    part_count INTEGER,
+    encoded_size INTEGER,
+    encoding TEXT,
+    chunk_size INTEGER,
+    chunking TEXT,
+    layout TEXT,
+    compression TEXT,
+    md5 TEXT,
+    merkle_root TEXT,
+    created_at TEXT,
+    metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS split_sets_file_name ON split_sets (file_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS split_sets_md5 ON split_sets (md5);
+CREATE INDEX IF NOT EXISTS split_sets_merkle_root ON split_sets (merkle_root);
+CREATE INDEX IF NOT EXISTS split_sets_created_at ON split_sets (created_at);
+CREATE INDEX IF NOT EXISTS split_sets_original_size ON split_sets (original_size);
+
+CREATE TABLE IF NOT EXISTS parts (
+    set_id INTEGER NOT NULL REFERENCES split_sets (id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    stripe INTEGER,
+    idx INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    offset INTEGER,
+    size INTEGER,
+    encoded_size INTEGER,
+    pack_offset INTEGER,
+    chunk_sha256 TEXT,
+    part_sha256 TEXT
+);
+CREATE INDEX IF NOT EXISTS parts_set_id ON parts (set_id);
+CREATE INDEX IF NOT EXISTS parts_path ON parts (path);
+CREATE INDEX IF NOT EXISTS parts_chunk_sha256 ON parts (chunk_sha256);
+CREATE INDEX IF NOT EXISTS parts_part_sha256 ON parts (part_sha256);
+
+CREATE TABLE IF NOT EXISTS merges (
+    id INTEGER PRIMARY KEY,
+    set_id INTEGER REFERENCES split_sets (id) ON DELETE SET NULL,
+    output_path TEXT NOT NULL,
+    md5 TEXT,
+    merged_at TEXT NOT NULL
+);
+"""
+
+SET_FIELDS = ('metadata_path', 'set_dir', 'manifest_path', 'parts_dir', 'file_name', 'original_size', 'part_count',
+              'encoded_size', 'encoding', 'chunk_size', 'chunking', 'layout', 'compression', 'md5', 'merkle_root',
+              'created_at', 'metadata')
+
+PART_FIELDS = ('kind', 'stripe', 'idx', 'path', 'offset', 'size', 'encoded_size', 'pack_offset',
+               'chunk_sha256', 'part_sha256')
+
+
+def find_catalog(directory, create=True):
+    """
+    Каталог для папки разбиений: ближайший catalog.sqlite3 в ней или выше (как .git),
+    поэтому разбиения в подпапки (batch.py) попадают в общий каталог output/.
+
+    :param create: Если каталога нет — путь к новому в directory (иначе None).
+    """
+    directory = os.path.abspath(directory)
+    current = directory
+    while True:
+        path = os.path.join(current, CATALOG_NAME)
+        if os.path.isfile(path):
+            return path
+        parent = os.path.dirname(current)
+        if parent == current:
+            return os.path.join(directory, CATALOG_NAME) if create else None
+        current = parent
+
+
+def read_split_set(path):
+    """
+    Читает набор частей по JSON-метаданным separator-silence.py или по манифесту
+    (папке частей) separator.py.
+
+    :return: Поля набора с абсолютными путями и списком частей в "parts"; None, если
+             path — не метаданные разбиения (манифест, метаданные сборки и т. п.).
+    """
+    path = os.path.abspath(path)
+    with open(path) as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or ("file_name" not in data and "merkle_root" not in data):
+        return None
+    manifest_path, parts_dir = locate_manifest(path)
+    parts_dir = os.path.normpath(parts_dir)
+
+    if "file_name" in data:
+        # separator-silence.py: <набор>/json/<хэш>_<имя>.json, части в <набор>/parts
+        metadata = data
+        set_dir = os.path.dirname(os.path.dirname(path))
+        manifest = None
+        if manifest_path != path:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        created_at = metadata.get("creation_date")
+    else:
+        # separator.py: manifest.json и checksum.md5 рядом с частями
+        metadata = None
+        manifest = data
+        set_dir = os.path.dirname(path)
+        created_at = None
+    if created_at is None:
+        created_at = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(os.path.getmtime(path)))
+
+    md5 = None
+    if metadata is not None and "name_hash" in metadata:
+        md5 = metadata["md5"]
+    elif os.path.isfile(os.path.join(set_dir, "checksum.md5")):
+        with open(os.path.join(set_dir, "checksum.md5")) as checksum_file:
+            md5 = checksum_file.read().strip()
+
+    parts = []
+    if manifest is not None:
+        for entry in manifest["parts"]:
+            if "fill" in entry:
+                # Кусок из повторённого байта (--sparse): файла части нет
+                continue
+            parts.append(("data", None, entry["index"], os.path.normpath(os.path.join(parts_dir, entry["name"])),
+                          entry["offset"], entry["size"], entry["encoded_size"], entry.get("pack_offset"),
+                          entry["chunk_sha256"], entry["part_sha256"]))
+        for entry in manifest.get("parity", {}).get("parts", ()):
+            parts.append(("parity", entry["stripe"], entry["index"], os.path.normpath(os.path.join(parts_dir, entry["name"])),
+                          None, entry["size"], entry["encoded_size"], None, entry["chunk_sha256"], entry["part_sha256"]))
+
+    source = metadata if metadata is not None else manifest
+    summary = metadata if metadata is not None else {key: value for key, value in manifest.items() if key not in ("parts", "parity")}
+    return {
+        "metadata_path": path,
+        "set_dir": set_dir,
+        "manifest_path": manifest_path if manifest is not None else None,
+        "parts_dir": parts_dir,
+        "file_name": metadata["file_name"] if metadata is not None else os.path.basename(set_dir),
+        "original_size": source.get("original_size"),
+        "part_count": manifest["part_count"] if manifest is not None else source.get("part_count"),
+        "encoded_size": (metadata.get("encoded_size") if metadata is not None
+                         else sum(part[6] for part in parts if part[0] == "data")),
+        "encoding": source.get("encoding"),
+        "chunk_size": manifest["chunk_size"] if manifest is not None else source["chunk_size"] * 1024,
+        "chunking": source.get("chunking", "fixed"),
+        "layout": source.get("layout", "files"),
+        "compression": source.get("compression") or "none",
+        "md5": md5,
+        "merkle_root": source.get("merkle_root"),
+        "created_at": created_at,
+        "metadata": json.dumps(summary, ensure_ascii=False),
+        "parts": parts,
+    }
+
+
+def read_split_set_or_error(path):
+    try:
+        return read_split_set(path), None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return None, f"{path}: {e}"
+
+
+def scan_split_sets(root):
+    """
+    Пути к метаданным всех наборов частей в дереве root: <набор>/json/*.json
+    separator-silence.py и manifest.json separator.py. В папки частей и общее
+    хранилище обход не заходит.
+    """
+    for current, dirs, names in os.walk(root):
+        if os.path.basename(current) == "json":
+            dirs[:] = []
+            for name in sorted(names):
+                if name.endswith(".json") and not name.endswith(".manifest.json") and "_restored_" not in name:
+                    yield os.path.join(current, name)
+            continue
+        if "manifest.json" in names:
+            # Папка частей separator.py (вложенные папки — её же части)
+            dirs[:] = []
+            yield os.path.join(current, "manifest.json")
+            continue
+        dirs[:] = sorted(name for name in dirs if name not in ("parts", "store"))
+
+
+def iter_part_files(directory):
+    """Файлы частей (PART_SUFFIXES) в папке и вложенных папках."""
+    for current, _, names in os.walk(directory):
+        for name in names:
+            if name.endswith(PART_SUFFIXES):
+                yield os.path.join(current, name)
+
+
+def remove_files(paths, root):
+    """
+    Удаляет файлы и опустевшие после этого папки (вверх до root, не включая его).
+
+    :return: (удалено файлов, освобождено байтов).
+    """
+    removed = 0
+    freed = 0
+    parents = set()
+    for path in paths:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        removed += 1
+        freed += size
+        parents.add(os.path.dirname(path))
+    root = os.path.abspath(root)
+    # Сначала самые глубокие папки: вложенные папки частей опустевают раньше родителей
+    for directory in sorted(parents, key=len, reverse=True):
+        while directory != root and directory.startswith(root + os.sep):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                # Папка не пуста (или уже удалена вместе с другой веткой)
+                break
+            directory = os.path.dirname(directory)
+    return removed, freed
+
+
+class Catalog:
+    """
+    Каталог наборов частей в SQLite: поля метаданных, пути, размеры и хэши частей,
+    история сборок. Пути хранятся относительно папки каталога, поэтому дерево
+    output/ можно переносить целиком.
+
+    Разбиение и сборка обновляют каталог сами (record_split, record_merge), удаление
+    набора — catalog.py delete; rebuild() собирает каталог заново обходом дерева.
+
+        with Catalog(find_catalog("output")) as catalog:
+            for split_set in catalog.find(name="video", min_size=1 << 30):
+                print(split_set["metadata_path"])
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.root = os.path.dirname(self.path)
+        # Несколько процессов (batch.py) пишут в каталог одновременно — ждём блокировку
+        self.connection = sqlite3.connect(self.path, timeout=60)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+
+    def relative(self, path):
+        return os.path.relpath(os.path.abspath(path), self.root)
+
+    def absolute(self, path):
+        return os.path.normpath(os.path.join(self.root, path))
+
+    def insert(self, split_set):
+        """Добавляет или заменяет набор (по пути к метаданным) без фиксации транзакции."""
+        values = dict(split_set)
+        for field in ('metadata_path', 'set_dir', 'manifest_path', 'parts_dir'):
+            if values[field] is not None:
+                values[field] = self.relative(values[field])
+        # Повторное разбиение тем же именем сохраняет номер набора и историю его сборок
+        self.connection.execute(
+            f"INSERT INTO split_sets ({', '.join(SET_FIELDS)}) VALUES ({', '.join('?' * len(SET_FIELDS))}) "
+            f"ON CONFLICT (metadata_path) DO UPDATE SET "
+            f"{', '.join(f'{field} = excluded.{field}' for field in SET_FIELDS[1:])}",
+            [values[field] for field in SET_FIELDS])
+        set_id = self.connection.execute("SELECT id FROM split_sets WHERE metadata_path = ?",
+                                         (values["metadata_path"],)).fetchone()[0]
+        self.connection.execute("DELETE FROM parts WHERE set_id = ?", (set_id,))
+        self.connection.executemany(
+            f"INSERT INTO parts (set_id, {', '.join(PART_FIELDS)}) VALUES (?, {', '.join('?' * len(PART_FIELDS))})",
+            ((set_id, *part[:3], self.relative(part[3]), *part[4:]) for part in split_set["parts"]))
+        return set_id
+
+    def add(self, split_set):
+        with self.connection:
+            return self.insert(split_set)
+
+    def remove(self, set_id):
+        with self.connection:
+            self.connection.execute("DELETE FROM split_sets WHERE id = ?", (set_id,))
+
+    def add_merge(self, set_id, output_path, md5):
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO merges (set_id, output_path, md5, merged_at) VALUES (?, ?, ?, ?)",
+                (set_id, output_path if output_path == "-" else os.path.abspath(output_path), md5,
+                 time.strftime('%Y-%m-%dT%H:%M:%S')))
+
+    def set_id(self, metadata_path):
+        row = self.connection.execute("SELECT id FROM split_sets WHERE metadata_path = ?",
+                                      (self.relative(metadata_path),)).fetchone()
+        return row[0] if row else None
+
+    def get(self, key):
+        """
+        Набор по номеру в каталоге, пути к метаданным или папке набора
+        (например, output/video_1a2b3 или просто video_1a2b3).
+
+        :raises KeyError: Набор не найден или под папкой несколько наборов.
+        """
+        rows = []
+        if str(key).isdigit():
+            rows = self.connection.execute("SELECT * FROM split_sets WHERE id = ?", (int(key),)).fetchall()
+        if not rows:
+            candidates = {key, self.relative(key), os.path.normpath(key)}
+            rows = self.connection.execute(
+                f"SELECT * FROM split_sets WHERE metadata_path IN ({', '.join('?' * len(candidates))}) "
+                f"OR set_dir IN ({', '.join('?' * len(candidates))})", [*candidates, *candidates]).fetchall()
+        if len(rows) != 1:
+            raise KeyError(f"{'Несколько наборов' if rows else 'Набор не найден'}: {key}")
+        return dict(rows[0])
+
+    def find(self, name=None, hash_prefix=None, since=None, until=None, min_size=None, max_size=None):
+        """
+        Поиск наборов; условия объединяются через И, все поиски идут по индексам.
+
+        :param name: Подстрока имени файла (без учёта регистра).
+        :param hash_prefix: Начало MD5 файла, корня дерева Меркла или SHA-256 любой части или куска.
+        :param since: Не раньше даты или момента ISO (2024-05-01 или 2024-05-01T12:00).
+        :param until: Не позже даты или момента ISO (дата включается целиком).
+        :param min_size: Размер исходного файла не меньше, байт.
+        :param max_size: Размер исходного файла не больше, байт.
+        :return: Список наборов (словари полей split_sets) от новых к старым.
+        """
+        conditions = []
+        params = []
+        if name:
+            conditions.append("file_name LIKE ? ESCAPE '\\'")
+            params.append("%" + name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if hash_prefix:
+            prefix = hash_prefix.lower()
+            bounds = (prefix, prefix + "g")
+            conditions.append(
+                "(md5 >= ? AND md5 < ? OR merkle_root >= ? AND merkle_root < ? OR id IN ("
+                "SELECT set_id FROM parts WHERE chunk_sha256 >= ? AND chunk_sha256 < ? "
+                "UNION SELECT set_id FROM parts WHERE part_sha256 >= ? AND part_sha256 < ?))")
+            params += bounds * 4
+        if since:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        if until:
+            # Строки ISO сравниваются посимвольно: '~' больше любой цифры и 'T'
+            conditions.append("created_at <= ?")
+            params.append(until + "~")
+        if min_size is not None:
+            conditions.append("original_size >= ?")
+            params.append(min_size)
+        if max_size is not None:
+            conditions.append("original_size <= ?")
+            params.append(max_size)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return [dict(row) for row in self.connection.execute(
+            f"SELECT * FROM split_sets {where} ORDER BY created_at DESC, id DESC", params)]
+
+    def parts(self, set_id):
+        return [dict(row) for row in self.connection.execute(
+            "SELECT * FROM parts WHERE set_id = ? ORDER BY kind, stripe, idx", (set_id,))]
+
+    def merges(self, set_id):
+        return [dict(row) for row in self.connection.execute(
+            "SELECT * FROM merges WHERE set_id = ? ORDER BY merged_at", (set_id,))]
+
+    def rebuild(self, workers=1, max_in_flight=None):
+        """
+        Собирает каталог заново обходом дерева: метаданные читаются параллельно
+        (workers процессов), наборы добавляются одной транзакцией, а исчезнувшие
+        с диска — удаляются. История сборок сохраняется.
+
+        :return: (наборов найдено, удалено из каталога, список ошибок чтения).
+        """
+        paths = list(scan_split_sets(self.root))
+        tasks = ((position, (path,)) for position, path in enumerate(paths))
+        if workers > 1:
+            results = ordered_map(read_split_set_or_error, tasks, workers, max_in_flight)
+        else:
+            results = ((position, read_split_set_or_error(*args)) for position, args in tasks)
+
+        found = set()
+        errors = []
+        with self.connection:
+            for _, (split_set, error) in results:
+                if error is not None:
+                    errors.append(error)
+                elif split_set is not None:
+                    self.insert(split_set)
+                    found.add(self.relative(split_set["metadata_path"]))
+            stale = [row["id"] for row in self.connection.execute("SELECT id, metadata_path FROM split_sets")
+                     if row["metadata_path"] not in found]
+            self.connection.executemany("DELETE FROM split_sets WHERE id = ?", ((set_id,) for set_id in stale))
+        return len(found), len(stale), errors
+
+    def orphans(self, min_age=GC_MIN_AGE):
+        """
+        Файлы частей, на которые не ссылается ни один набор каталога: лишние части
+        в папках наборов (например, после разбиения тем же именем с другим размером
+        куска), куски общего хранилища cdc удалённых наборов и части прерванных
+        разбиений без метаданных. Папки разбиений с журналом (их можно продолжить)
+        и файлы моложе min_age секунд не затрагиваются. Перед вызовом стоит
+        выполнить rebuild(), чтобы каталог совпадал с диском.
+
+        :return: Список абсолютных путей.
+        """
+        referenced = {self.absolute(row[0]) for row in self.connection.execute("SELECT DISTINCT path FROM parts")}
+        sets = [dict(row) for row in self.connection.execute("SELECT set_dir, parts_dir, manifest_path FROM split_sets")]
+        # Части наборов без манифеста (старые метаданные) неизвестны — их папки не трогаются
+        protected = {self.absolute(row["parts_dir"]) for row in sets if row["manifest_path"] is None}
+        known_sets = {self.absolute(row["set_dir"]) for row in sets}
+
+        directories = {self.absolute(row["parts_dir"]) for row in sets} - protected
+        store_root = os.path.join(self.root, "store")
+        if os.path.isdir(store_root):
+            directories.add(store_root)
+        for current, dirs, _ in os.walk(self.root):
+            if current in known_sets:
+                dirs[:] = []
+                continue
+            if "parts" in dirs:
+                # Разбиение без метаданных: прервано (или метаданные удалены вручную)
+                json_dir = os.path.join(current, "json")
+                if not (os.path.isdir(json_dir) and any(name.endswith(".journal") for name in os.listdir(json_dir))):
+                    directories.add(os.path.join(current, "parts"))
+            dirs[:] = [name for name in dirs if name not in ("parts", "store", "json")]
+
+        now = time.time()
+        orphans = []
+        for directory in sorted(directories):
+            for path in iter_part_files(directory):
+                if (path not in referenced and not any(path.startswith(keep + os.sep) for keep in protected)
+                        and now - os.path.getmtime(path) >= min_age):
+                    orphans.append(path)
+        return orphans
+
+    def delete(self, key):
+        """
+        Удаляет набор (ключ — как у get()) с диска и из каталога: части (кроме кусков
+        общего хранилища cdc — их освобождает сборка мусора), метаданные, манифест,
+        журнал и опустевшие папки.
+
+        :return: (удалено файлов, освобождено байтов).
+        """
+        split_set = self.get(key)
+        files = set()
+        if split_set["chunking"] != "cdc":
+            files.update(self.absolute(part["path"]) for part in self.parts(split_set["id"]))
+            if split_set["manifest_path"] is None:
+                # Старые метаданные без манифеста: частями набора считается вся его папка parts
+                files.update(iter_part_files(self.absolute(split_set["parts_dir"])))
+        for field in ("metadata_path", "manifest_path"):
+            if split_set[field] is not None:
+                files.add(self.absolute(split_set[field]))
+        set_dir = self.absolute(split_set["set_dir"])
+        metadata_path = self.absolute(split_set["metadata_path"])
+        files.add(os.path.join(set_dir, "checksum.md5") if split_set["manifest_path"] == split_set["metadata_path"]
+                  else os.path.splitext(metadata_path)[0] + ".journal")
+
+        self.remove(split_set["id"])
+        return remove_files(sorted(files), self.root)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def record_split(output_dir, metadata_path):
+    """Добавляет набор в каталог output_dir (или ближайший выше), создавая каталог при необходимости."""
+    split_set = read_split_set(metadata_path)
+    with Catalog(find_catalog(output_dir)) as catalog:
+        catalog.add(split_set)
+
+
+def record_merge(metadata_path, output_path, md5):
+    """
+    Записывает сборку набора в каталог, если он есть рядом с набором или выше;
+    набор, которого в каталоге ещё нет, добавляется.
+    """
+    split_set = read_split_set(metadata_path)
+    catalog_path = find_catalog(os.path.dirname(split_set["set_dir"]), create=False)
+    if catalog_path is None:
+        return
+    with Catalog(catalog_path) as catalog:
+        set_id = catalog.set_id(metadata_path)
+        if set_id is None:
+            set_id = catalog.add(split_set)
+        catalog.add_merge(set_id, output_path, md5)
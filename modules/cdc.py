@@ -0,0 +1,216 @@
+# cdc.py
+import io
+import os
+from contextlib import nullcontext
+from functools import lru_cache
+
+from modules.codec import encode_stream
+from modules.journal import temp_path
+from modules.manifest import new_hasher, part_entry
+from modules.parallel import encode_range, ordered_map
+
+HASH_MASK = 0xFFFFFFFFFFFFFFFF
+
+
+@lru_cache(maxsize=None)
+def gear_table():
+    """
+    Таблица Gear: 256 псевдослучайных 64-битных чисел с фиксированным зерном,
+    чтобы границы кусков совпадали между запусками и машинами. Строится при
+    первом разбиении cdc: random не замедляет запуск остальных команд.
+    """
+    import random
+    gear_random = random.Random(0x5EED)
+    return tuple(gear_random.getrandbits(64) for _ in range(256))
+
+
+def chunk_bounds(avg_size, min_size=None, max_size=None):
+    """Границы размеров кусков: по умолчанию min = avg / 4, max = avg * 4 (как в FastCDC)."""
+    min_size = min_size or max(64, avg_size // 4)
+    max_size = max_size or avg_size * 4
+    if not min_size <= avg_size <= max_size:
+        raise ValueError(f"Нужно min <= avg <= max, получено {min_size}, {avg_size}, {max_size}")
+    return min_size, avg_size, max_size
+
+
+def masks(avg_size):
+    """
+    Маски нормализованного разбиения FastCDC: до среднего размера проверяется
+    на бит больше (срез реже), после — на бит меньше (срез чаще). Используются
+    старшие биты хэша Gear — они зависят от последних 64 байтов.
+    """
+    bits = max(2, avg_size.bit_length() - 1)
+    mask_small = ((1 << (bits + 1)) - 1) << (63 - bits)
+    mask_large = ((1 << (bits - 1)) - 1) << (65 - bits)
+    return mask_small, mask_large
+
+
+def cut_point(data, min_size, avg_size, max_size, mask_small, mask_large):
+    """Длина первого куска в data по скользящему хэшу Gear."""
+    size = len(data)
+    if size <= min_size:
+        return size
+    size = min(size, max_size)
+    normal = min(avg_size, size)
+    gear = gear_table()
+    h = 0
+    # Первые min_size байтов пропускаются без хэширования
+    i = min_size
+    while i < normal:
+        h = ((h << 1) + gear[data[i]]) & HASH_MASK
+        if not h & mask_small:
+            return i + 1
+        i += 1
+    while i < size:
+        h = ((h << 1) + gear[data[i]]) & HASH_MASK
+        if not h & mask_large:
+            return i + 1
+        i += 1
+    return size
+
+
+def iter_cdc_chunks(src, min_size, avg_size, max_size):
+    """
+    Разбивает поток на куски переменной длины по содержимому.
+
+    Вставка байта в начало файла меняет только соседние куски, а не все последующие.
+    Память ограничена max_size.
+
+    :return: Генератор (смещение, кусок).
+    """
+    mask_small, mask_large = masks(avg_size)
+    buffer = bytearray()
+    offset = 0
+    eof = False
+    while True:
+        while not eof and len(buffer) < max_size:
+            block = src.read(max_size - len(buffer))
+            if not block:
+                eof = True
+            buffer += block
+        if not buffer:
+            return
+        cut = cut_point(buffer, min_size, avg_size, max_size, mask_small, mask_large)
+        yield offset, bytes(buffer[:cut])
+        del buffer[:cut]
+        offset += cut
+
+
+def store_part_name(chunk_digest):
+    """Имя части в хранилище: адрес по хэшу содержимого, разложенный по подпапкам."""
+    return os.path.join(chunk_digest[:2], f"{chunk_digest}.txt")
+
+
+def file_digest(path):
+    hasher = new_hasher()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def store_split(input_file, store_dir, encoding, min_size, avg_size, max_size,
+                hashers=(), workers=1, max_in_flight=None, compression=None, compression_level=None,
+                executor=None):
+    """
+    Разбивает файл по содержимому и складывает части в общее хранилище,
+    адресуемое хэшем куска. Кусок, уже лежащий в хранилище (из этого или
+    другого файла, любой версии), повторно не кодируется и не записывается.
+
+    :param input_file: Путь к файлу или бинарный поток (поток, например stdin, — только при workers <= 1).
+    :param store_dir: Папка хранилища для данной кодировки.
+    :param hashers: Объекты hashlib, обновляемые всеми байтами файла по порядку.
+    :param workers: > 1 — новые куски кодируются в пуле процессов.
+    :param compression: Метод сжатия кусков перед кодированием (хранилище для него должно быть отдельным).
+    :param executor: Общий пул процессов для workers > 1 (по умолчанию создаётся свой).
+    :return: Генератор (запись манифеста, True если кусок был новым) в порядке частей.
+    """
+    def chunks():
+        with open(input_file, 'rb') if isinstance(input_file, str) else nullcontext(input_file) as f:
+            for index, (offset, chunk) in enumerate(iter_cdc_chunks(f, min_size, avg_size, max_size), start=1):
+                for hasher in hashers:
+                    hasher.update(chunk)
+                chunk_hasher = new_hasher()
+                chunk_hasher.update(chunk)
+                yield index, offset, chunk, chunk_hasher.hexdigest()
+
+    def finish(index, offset, length, chunk_digest, encoded_size, part_digest, is_new):
+        entry = part_entry(index, store_part_name(chunk_digest), offset, length,
+                           encoded_size, chunk_digest, part_digest)
+        return entry, is_new
+
+    def store_path(chunk_digest):
+        path = os.path.join(store_dir, store_part_name(chunk_digest))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    # Куски, записанные в этом запуске: повтор внутри одного файла тоже не кодируется
+    written = {}
+
+    if workers <= 1:
+        for index, offset, chunk, chunk_digest in chunks():
+            path = store_path(chunk_digest)
+            if chunk_digest in written:
+                encoded_size, part_digest = written[chunk_digest]
+                yield finish(index, offset, len(chunk), chunk_digest, encoded_size, part_digest, False)
+                continue
+            if os.path.exists(path):
+                written[chunk_digest] = (os.path.getsize(path), file_digest(path))
+                yield finish(index, offset, len(chunk), chunk_digest, *written[chunk_digest], False)
+                continue
+            part_hasher = new_hasher()
+            path_tmp = temp_path(path)
+            with open(path_tmp, 'wb') as part_file:
+                _, encoded_size = encode_stream(io.BytesIO(chunk), part_file, encoding, encoded_hashers=(part_hasher,),
+                                                compression=compression, compression_level=compression_level)
+            os.replace(path_tmp, path)
+            written[chunk_digest] = (encoded_size, part_hasher.hexdigest())
+            yield finish(index, offset, len(chunk), chunk_digest, *written[chunk_digest], True)
+        return
+
+    # Родитель ищет границы и хэширует, воркеры кодируют новые куски по их диапазонам
+    pending = {}
+    results = {}
+
+    def tasks():
+        for index, offset, chunk, chunk_digest in chunks():
+            path = store_path(chunk_digest)
+            if chunk_digest in pending or chunk_digest in written:
+                results[index] = (offset, len(chunk), chunk_digest, None)
+                continue
+            if os.path.exists(path):
+                written[chunk_digest] = (os.path.getsize(path), file_digest(path))
+                results[index] = (offset, len(chunk), chunk_digest, None)
+                continue
+            pending[chunk_digest] = path
+            results[index] = (offset, len(chunk), chunk_digest, path)
+            # Воркер пишет кусок под временным именем и сам переименовывает его в path
+            yield index, (input_file, offset, len(chunk), encoding, path, compression, compression_level)
+
+    next_index = 1
+    for done_index, (encoded_size, _, part_digest) in ordered_map(encode_range, tasks(), workers, max_in_flight, executor):
+        offset, length, chunk_digest, path = results[done_index]
+        written[chunk_digest] = (encoded_size, part_digest)
+        del pending[chunk_digest]
+        # Куски до завершённого (повторы и уже лежавшие в хранилище) выдаются по порядку
+        while next_index in results and (next_index == done_index or results[next_index][3] is None):
+            offset, length, chunk_digest, _ = results.pop(next_index)
+            yield finish(next_index, offset, length, chunk_digest, *written[chunk_digest], next_index == done_index)
+            next_index += 1
+    while next_index in results:
+        offset, length, chunk_digest, _ = results.pop(next_index)
+        yield finish(next_index, offset, length, chunk_digest, *written[chunk_digest], False)
+        next_index += 1
+
+
+def dedup_ratio(total_bytes, stored_bytes):
+    """Коэффициент дедупликации: объём файла к объёму впервые записанных кусков (None — всё уже было)."""
+    if not stored_bytes:
+        return None if total_bytes else 1.0
+    return round(total_bytes / stored_bytes, 2)
+
+
+def store_directory(output_dir, encoding, compression=None):
+    """Папка общего хранилища: отдельная для каждой кодировки и метода сжатия."""
+    name = encoding if compression in (None, 'none') else f"{encoding}.{compression}"
+    return os.path.join(output_dir, "store", name)
@@ -0,0 +1,227 @@
+# codec.py
+import base64
+import binascii
+import os
+
+from modules.compression import DECOMPRESSION_ERRORS, compressor, iter_decompress
+
+# Поддерживаемые методы кодирования частей
+ENCODINGS = ('hex', 'base64', 'base85')
+
+# Окна потоковой обработки. Сырые окна кратны 3 (base64) и 4 (base85), текстовые —
+# 2 (hex), 4 (base64) и 5 (base85), поэтому закодированные окна склеиваются в тот же
+# текст, что и при кодировании куска целиком, а декодирование окнами даёт те же байты.
+ENCODE_WINDOW = 12 * 64 * 1024
+DECODE_WINDOW = 20 * 52429
+ENCODE_ALIGN = 12
+
+# Исключения, означающие повреждённую часть: ошибка декодирования текста или распаковки
+DECODE_ERRORS = (ValueError,) + DECOMPRESSION_ERRORS
+
+
+class NullStats:
+    """
+    Заглушка StageStats (modules.stats), когда замер не нужен: ничего не копит и
+    не вызывает таймер. modules.stats импортируется только при --stats.
+    """
+
+    def now(self):
+        return 0.0
+
+    def lap(self, stage, start, size=0):
+        return 0.0
+
+
+NULL_STATS = NullStats()
+
+
+def sync_file(file, stats=NULL_STATS):
+    """Сбрасывает файл на диск (fsync), относя время к стадии fsync."""
+    file.flush()
+    start = stats.now()
+    os.fsync(file.fileno())
+    stats.lap('fsync', start)
+
+
+def encode_chunk(chunk, encoding):
+    """Кодирует блок байтов в текстовое представление (ASCII-байты)."""
+    if encoding == 'hex':
+        return chunk.hex().encode()
+    if encoding == 'base64':
+        return base64.b64encode(chunk)
+    if encoding == 'base85':
+        return base64.b85encode(chunk)
+    raise ValueError(f"Неизвестная кодировка: {encoding}")
+
+
+def decode_chunk(data, encoding):
+    """Декодирует текстовое представление части обратно в байты."""
+    if encoding == 'hex':
+        return binascii.unhexlify(data)
+    if encoding == 'base64':
+        return base64.b64decode(data)
+    if encoding == 'base85':
+        return base64.b85decode(data)
+    raise ValueError(f"Неизвестная кодировка: {encoding}")
+
+
+def decoded_length(encoded_size, encoding, tail=b''):
+    """
+    Размер декодированных данных по размеру закодированной части без декодирования.
+
+    :param tail: Последние байты части — нужны для base64, чтобы учесть символы '='.
+    """
+    if encoding == 'hex':
+        return encoded_size // 2
+    if encoding == 'base64':
+        return encoded_size // 4 * 3 - tail[-2:].count(b'=')
+    if encoding == 'base85':
+        full, rest = divmod(encoded_size, 5)
+        return full * 4 + (rest - 1 if rest else 0)
+    raise ValueError(f"Неизвестная кодировка: {encoding}")
+
+
+def part_decoded_length(part_path, encoding):
+    """Размер декодированного содержимого файла части (читаются только последние байты)."""
+    encoded_size = os.path.getsize(part_path)
+    tail = b''
+    if encoding == 'base64' and encoded_size:
+        with open(part_path, 'rb') as part_file:
+            part_file.seek(max(0, encoded_size - 2))
+            tail = part_file.read()
+    return decoded_length(encoded_size, encoding, tail)
+
+
+def read_windows(src, window, length=None):
+    """
+    Читает бинарный поток окнами фиксированного размера в один переиспользуемый буфер.
+
+    Выдаёт memoryview на заполненную часть буфера — он действителен только до
+    следующей итерации. Короткое окно бывает только последним.
+
+    Из memoryview (например, на отображённый в память файл) окна выдаются
+    срезами без копирования.
+
+    :param length: Сколько байтов прочитать (None — до конца потока).
+    """
+    if isinstance(src, memoryview):
+        view = src if length is None else src[:length]
+        for start in range(0, len(view), window):
+            yield view[start:start + window]
+        return
+
+    buffer = bytearray(window)
+    view = memoryview(buffer)
+    remaining = length
+    while remaining is None or remaining > 0:
+        want = window if remaining is None else min(window, remaining)
+        filled = 0
+        while filled < want:
+            read = src.readinto(view[filled:want])
+            if not read:
+                break
+            filled += read
+        if not filled:
+            return
+        yield view[:filled]
+        if remaining is not None:
+            remaining -= filled
+        if filled < want:
+            return
+
+
+class AlignedEncoder:
+    """
+    Кодирует поток байтов произвольными порциями (например, вывод компрессора),
+    пропуская в кодировщик только кратные ENCODE_ALIGN блоки. Остаток ждёт
+    следующей порции, поэтому результат совпадает с кодированием всего потока сразу.
+
+    Время кодирования, хэширования и записи относится к стадиям stats (см. StageStats).
+    """
+
+    def __init__(self, dst, encoding, encoded_hashers=(), stats=NULL_STATS):
+        self.dst = dst
+        self.encoding = encoding
+        self.encoded_hashers = encoded_hashers
+        self.stats = stats
+        self.pending = bytearray()
+        self.encoded_size = 0
+
+    def _emit(self, data):
+        stats = self.stats
+        start = stats.now()
+        encoded = encode_chunk(data, self.encoding)
+        start = stats.lap('encode', start, len(data))
+        if self.encoded_hashers:
+            for encoded_hasher in self.encoded_hashers:
+                encoded_hasher.update(encoded)
+            start = stats.lap('hash', start, len(encoded))
+        self.dst.write(encoded)
+        stats.lap('write', start, len(encoded))
+        self.encoded_size += len(encoded)
+
+    def write(self, data):
+        if self.pending:
+            self.pending += data
+            data = bytes(self.pending)
+            self.pending.clear()
+        usable = len(data) - len(data) % ENCODE_ALIGN
+        if usable:
+            self._emit(memoryview(data)[:usable])
+        if usable < len(data):
+            self.pending += memoryview(data)[usable:]
+
+    def finish(self):
+        if self.pending:
+            self._emit(bytes(self.pending))
+            self.pending.clear()
+        return self.encoded_size
+
+
+def encode_stream(src, dst, encoding, length=None, hashers=(), encoded_hashers=(),
+                  compression=None, compression_level=None, stats=NULL_STATS):
+    """
+    Кодирует данные из src в dst окнами ENCODE_WINDOW — память не зависит от размера куска.
+
+    :param src: Бинарный поток или memoryview (окна берутся срезами без копирования).
+    :param hashers: Объекты hashlib, обновляемые сырыми байтами.
+    :param encoded_hashers: Объекты hashlib, обновляемые закодированными байтами.
+    :param compression: Метод сжатия куска перед кодированием ('zlib', 'bz2', 'lzma' или None).
+    :param stats: StageStats для времени стадий read, hash, compress, encode и write.
+    :return: (прочитано байтов, записано закодированных байтов).
+    """
+    engine = compressor(compression, compression_level)
+    writer = AlignedEncoder(dst, encoding, encoded_hashers, stats)
+    read_size = 0
+    start = stats.now()
+    for window in read_windows(src, ENCODE_WINDOW, length):
+        start = stats.lap('read', start, len(window))
+        if hashers:
+            for raw_hasher in hashers:
+                raw_hasher.update(window)
+            start = stats.lap('hash', start, len(window))
+        if engine is not None:
+            compressed = engine.compress(window)
+            stats.lap('compress', start, len(window))
+            writer.write(compressed)
+        else:
+            writer.write(window)
+        read_size += len(window)
+        start = stats.now()
+    if engine is not None:
+        start = stats.now()
+        compressed = engine.flush()
+        stats.lap('compress', start)
+        writer.write(compressed)
+    return read_size, writer.finish()
+
+
+def iter_decode(src, encoding, compression=None, length=None):
+    """
+    Декодирует бинарный поток части окнами DECODE_WINDOW, выдавая блоки байтов.
+    Сжатые части распаковываются на лету порциями ограниченного размера.
+
+    :param length: Размер части в потоке (None — до конца), для частей внутри контейнера.
+    """
+    blocks = (decode_chunk(window, encoding) for window in read_windows(src, DECODE_WINDOW, length))
+    return iter_decompress(blocks, compression)
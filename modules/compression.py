@@ -0,0 +1,142 @@
+# compression.py
+import bz2
+import lzma
+import os
+import time
+import zlib
+
+# Поддерживаемые методы сжатия кусков перед кодированием (только стандартная библиотека)
+COMPRESSIONS = ('none', 'zlib', 'bz2', 'lzma')
+
+# Уровни по умолчанию
+DEFAULT_LEVELS = {'zlib': 6, 'bz2': 9, 'lzma': 6}
+
+# Кандидаты автоматического выбора: (метод, уровень)
+AUTO_CANDIDATES = (('zlib', 1), ('zlib', 6), ('bz2', 9), ('lzma', 1))
+
+# Если лучший кандидат сжимает выборку хуже этого порога, данные считаются уже сжатыми
+AUTO_MIN_GAIN = 0.95
+
+# Оценка скорости записи закодированных частей на диск, байт/с (для сравнения кандидатов)
+WRITE_BANDWIDTH = 200 * 1024 * 1024
+
+# Исключения повреждённых сжатых данных
+DECOMPRESSION_ERRORS = (zlib.error, lzma.LZMAError, OSError, EOFError)
+
+# Максимальный объём вывода распаковщика за один шаг — память не зависит от степени сжатия
+DECOMPRESS_LIMIT = 1024 * 1024
+
+
+def compressor(name, level=None):
+    """Потоковый компрессор (compress/flush) или None, если сжатие не используется."""
+    if name in (None, 'none'):
+        return None
+    level = DEFAULT_LEVELS[name] if level is None else level
+    if name == 'zlib':
+        return zlib.compressobj(level)
+    if name == 'bz2':
+        return bz2.BZ2Compressor(level)
+    if name == 'lzma':
+        return lzma.LZMACompressor(preset=level)
+    raise ValueError(f"Неизвестный метод сжатия: {name}")
+
+
+def iter_decompress(blocks, name):
+    """
+    Распаковывает поток блоков, выдавая не больше DECOMPRESS_LIMIT байтов за шаг.
+
+    :param blocks: Итерируемый набор сжатых блоков.
+    """
+    if name in (None, 'none'):
+        yield from blocks
+        return
+    if name == 'zlib':
+        decompressor = zlib.decompressobj()
+        for block in blocks:
+            data = block
+            while data:
+                out = decompressor.decompress(data, DECOMPRESS_LIMIT)
+                if out:
+                    yield out
+                data = decompressor.unconsumed_tail
+        out = decompressor.flush()
+        if out:
+            yield out
+        return
+    if name == 'bz2':
+        decompressor = bz2.BZ2Decompressor()
+    elif name == 'lzma':
+        decompressor = lzma.LZMADecompressor()
+    else:
+        raise ValueError(f"Неизвестный метод сжатия: {name}")
+    for block in blocks:
+        out = decompressor.decompress(block, DECOMPRESS_LIMIT)
+        if out:
+            yield out
+        while not decompressor.eof and not decompressor.needs_input:
+            out = decompressor.decompress(b'', DECOMPRESS_LIMIT)
+            if out:
+                yield out
+
+
+def compress_chunk(chunk, name, level=None):
+    """Сжимает кусок целиком (используется при выборе метода)."""
+    engine = compressor(name, level)
+    return engine.compress(chunk) + engine.flush()
+
+
+def sample_chunks(input_file, chunk_size_bytes, samples=4, sample_size=256 * 1024):
+    """Читает несколько кусков, равномерно распределённых по файлу."""
+    file_size = os.path.getsize(input_file)
+    sample_size = min(chunk_size_bytes, sample_size)
+    if file_size <= sample_size * samples:
+        offsets = range(0, file_size, sample_size)
+    else:
+        step = (file_size - sample_size) // (samples - 1)
+        offsets = [i * step for i in range(samples)]
+    with open(input_file, 'rb') as f:
+        for offset in offsets:
+            f.seek(offset)
+            chunk = f.read(sample_size)
+            if chunk:
+                yield chunk
+
+
+def choose_compression(input_file, chunk_size_bytes, encode):
+    """
+    Выбирает метод и уровень сжатия по нескольким кускам файла.
+
+    Для каждого кандидата измеряется время сжатия и кодирования выборки плюс
+    оценка времени записи результата (WRITE_BANDWIDTH) и относительный размер;
+    выбирается кандидат с наименьшим произведением времени на размер. Если никто
+    не сжимает выборку лучше AUTO_MIN_GAIN (видео, архивы), сжатие не используется.
+
+    :param encode: Функция кодирования куска, например partial(encode_chunk, encoding='base85').
+    :return: (метод, уровень, сводка замеров для метаданных).
+    """
+    chunks = list(sample_chunks(input_file, chunk_size_bytes))
+    raw_size = sum(len(chunk) for chunk in chunks)
+    if not raw_size:
+        return 'none', None, {"sample_bytes": 0}
+
+    def measure(name, level):
+        start = time.perf_counter()
+        compressed_size = 0
+        encoded_size = 0
+        for chunk in chunks:
+            compressed = compress_chunk(chunk, name, level) if name != 'none' else chunk
+            encoded_size += len(encode(compressed))
+            compressed_size += len(compressed)
+        seconds = time.perf_counter() - start + encoded_size / WRITE_BANDWIDTH
+        return seconds, compressed_size / raw_size
+
+    seconds, ratio = measure('none', None)
+    best = ('none', None, seconds * ratio)
+    measured = {"none": {"ratio": 1.0, "seconds": round(seconds, 6)}}
+    for name, level in AUTO_CANDIDATES:
+        seconds, ratio = measure(name, level)
+        measured[f"{name}:{level}"] = {"ratio": round(ratio, 4), "seconds": round(seconds, 6)}
+        if ratio < AUTO_MIN_GAIN and seconds * ratio < best[2]:
+            best = (name, level, seconds * ratio)
+
+    return best[0], best[1], {"sample_bytes": raw_size, "candidates": measured}
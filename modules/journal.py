@@ -0,0 +1,101 @@
+# journal.py
+import json
+import os
+
+
+def temp_path(path):
+    """
+    Временное имя рядом с path: файл пишется под ним и переименовывается в path
+    через os.replace, поэтому под итоговым именем не бывает недописанного файла.
+
+    Номер процесса в имени разводит процессы, пишущие один и тот же файл
+    (например, одинаковый кусок в общем хранилище cdc).
+    """
+    return f"{path}.{os.getpid()}.tmp"
+
+
+def remove_temp_files(directory):
+    """Удаляет временные файлы прерванного запуска (и во вложенных папках частей)."""
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.endswith('.tmp'):
+                os.remove(os.path.join(root, name))
+
+
+def replace_json(data, path):
+    """Атомарно сохраняет data в JSON-файл path (через временный файл)."""
+    path_tmp = temp_path(path)
+    with open(path_tmp, 'w') as json_out:
+        json.dump(data, json_out)
+    os.replace(path_tmp, path)
+
+
+def load_journal(path, header):
+    """
+    Читает журнал завершённых частей.
+
+    Журнал — строки JSON: первая — заголовок запуска (параметры и исходный файл),
+    остальные — записи частей с полем index. Оборванная последняя строка
+    (процесс прервался на записи) отбрасывается.
+
+    :param header: Ожидаемый заголовок; журнал другого запуска не используется.
+    :return: {номер части: запись}; пусто, если журнала нет или он от другого запуска.
+    """
+    try:
+        with open(path) as journal:
+            lines = journal.read().split("\n")
+    except FileNotFoundError:
+        return {}
+    try:
+        if json.loads(lines[0]) != header:
+            return {}
+    except ValueError:
+        return {}
+    records = {}
+    for line in lines[1:]:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            break
+        records[record["index"]] = record
+    return records
+
+
+class JournalWriter:
+    """
+    Журнал завершённых частей для продолжения прерванного запуска (--resume).
+
+    Журнал переписывается заголовком и уже проверенными записями, затем каждая
+    завершённая часть дописывается строкой и сразу сбрасывается из буфера. Запись
+    делается только после того, как часть целиком лежит на диске под своим именем,
+    а при продолжении часть всё равно сверяется с хэшем — журнал лишь говорит,
+    какие части стоит проверить вместо повторной обработки.
+
+        journal = JournalWriter(path, header, load_journal(path, header).values())
+        journal.record({"index": 1, ...})
+        journal.remove()  # после успешного завершения
+    """
+
+    def __init__(self, path, header, records=()):
+        self.path = path
+        path_tmp = temp_path(path)
+        with open(path_tmp, 'w') as journal:
+            journal.write(json.dumps(header) + "\n")
+            for record in records:
+                journal.write(json.dumps(record) + "\n")
+        os.replace(path_tmp, path)
+        self.file = open(path, 'a')
+
+    def record(self, record):
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def remove(self):
+        """Закрывает и удаляет журнал: запуск завершён и продолжать нечего."""
+        self.close()
+        os.remove(self.path)
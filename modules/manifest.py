@@ -0,0 +1,237 @@
+# manifest.py
+import hashlib
+import json
+import os
+
+from modules.codec import DECODE_ERRORS, DECODE_WINDOW, iter_decode, read_windows
+
+MANIFEST_VERSION = 1
+MANIFEST_ALGORITHM = 'sha256'
+
+# Префиксы доменов, чтобы лист нельзя было выдать за внутренний узел дерева
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+def new_hasher():
+    """Хэш-функция, используемая в манифесте."""
+    return hashlib.new(MANIFEST_ALGORITHM)
+
+
+def part_entry(index, name, offset, size, encoded_size, chunk_digest, part_digest, pack_offset=None):
+    """
+    Запись манифеста об одной части.
+
+    :param pack_offset: Смещение части внутри контейнера name (None — часть в отдельном файле).
+    """
+    entry = {
+        "index": index,
+        "name": name,
+        "offset": offset,
+        "size": size,
+        "encoded_size": encoded_size,
+        "chunk_sha256": chunk_digest,
+        "part_sha256": part_digest,
+    }
+    if pack_offset is not None:
+        entry["pack_offset"] = pack_offset
+    return entry
+
+
+def leaf_hash(entry):
+    """Лист дерева Меркла: хэш закодированной части и декодированного куска."""
+    return hashlib.sha256(
+        LEAF_PREFIX + bytes.fromhex(entry["part_sha256"]) + bytes.fromhex(entry["chunk_sha256"])
+    ).digest()
+
+
+def merkle_levels(leaves):
+    """Все уровни дерева Меркла от листьев до корня. Непарный узел поднимается без изменений."""
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [
+            hashlib.sha256(NODE_PREFIX + level[i] + level[i + 1]).digest()
+            for i in range(0, len(level) - 1, 2)
+        ]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def merkle_root(entries):
+    """Корень дерева Меркла по записям частей (hex). Для пустого файла — хэш пустой строки."""
+    if not entries:
+        return hashlib.sha256(b'').hexdigest()
+    return merkle_levels([leaf_hash(entry) for entry in entries])[-1][0].hex()
+
+
+def merkle_proof(entries, position, levels=None):
+    """
+    Доказательство включения части с порядковым номером position (с нуля):
+    список (сторона, хэш соседа) от листа к корню.
+
+    :param levels: Готовые merkle_levels по тем же записям — для нескольких доказательств подряд.
+    """
+    if levels is None:
+        levels = merkle_levels([leaf_hash(entry) for entry in entries])
+    proof = []
+    for level in levels[:-1]:
+        sibling = position ^ 1
+        if sibling < len(level):
+            proof.append(('left' if sibling < position else 'right', level[sibling].hex()))
+        position //= 2
+    return proof
+
+
+def verify_proof(entry, proof, root):
+    """Проверяет, что запись части входит в дерево с корнем root."""
+    node = leaf_hash(entry)
+    for side, sibling in proof:
+        sibling = bytes.fromhex(sibling)
+        pair = sibling + node if side == 'left' else node + sibling
+        node = hashlib.sha256(NODE_PREFIX + pair).digest()
+    return node.hex() == root
+
+
+def build_manifest(entries, encoding, chunk_size_bytes, original_size, **extra):
+    """
+    Собирает манифест с корнем дерева Меркла.
+
+    :param extra: Дополнительные поля, например chunking и store для частей в общем хранилище.
+    """
+    entries = sorted(entries, key=lambda entry: entry["index"])
+    return {
+        **extra,
+        "version": MANIFEST_VERSION,
+        "algorithm": MANIFEST_ALGORITHM,
+        "encoding": encoding,
+        "chunk_size": chunk_size_bytes,
+        "original_size": original_size,
+        "part_count": len(entries),
+        "parts": entries,
+        "merkle_root": merkle_root(entries),
+    }
+
+
+def save_manifest(manifest, path):
+    with open(path, "w") as manifest_out:
+        json.dump(manifest, manifest_out)
+
+
+def load_manifest(path):
+    """Загружает манифест и проверяет, что записи частей согласуются с корнем дерева."""
+    with open(path, "r") as manifest_in:
+        manifest = json.load(manifest_in)
+    if merkle_root(manifest["parts"]) != manifest["merkle_root"]:
+        raise ValueError(f"Корень дерева Меркла не совпадает с записями манифеста: {path}")
+    return manifest
+
+
+def check_part(part_path, part_digest, chunk_digest, encoding, decode=False, compression=None, part_range=None):
+    """
+    Выполняется в процессе-воркере: проверяет одну часть по манифесту.
+
+    :param decode: Дополнительно декодировать часть и сверить хэш куска.
+    :param part_range: (смещение, длина) части внутри контейнера или None для отдельного файла.
+    :return: 'ok', 'missing' или 'corrupt'.
+    """
+    if part_path is None:
+        # Части нет на диске: кусок из повторённого байта восстанавливается по манифесту
+        return 'ok'
+    if not os.path.isfile(part_path):
+        return 'missing'
+    start, length = part_range or (0, None)
+    hasher = new_hasher()
+    with open(part_path, 'rb') as part_file:
+        part_file.seek(start)
+        for window in read_windows(part_file, DECODE_WINDOW, length):
+            hasher.update(window)
+        if hasher.hexdigest() != part_digest:
+            return 'corrupt'
+        if decode:
+            part_file.seek(start)
+            hasher = new_hasher()
+            try:
+                for block in iter_decode(part_file, encoding, compression, length):
+                    hasher.update(block)
+            except DECODE_ERRORS:
+                return 'corrupt'
+            if hasher.hexdigest() != chunk_digest:
+                return 'corrupt'
+    return 'ok'
+
+
+def check_range(path, offset, size, chunk_digest):
+    """Выполняется в процессе-воркере: совпадает ли диапазон собранного файла с хэшем куска."""
+    hasher = new_hasher()
+    with open(path, 'rb') as restored_file:
+        restored_file.seek(offset)
+        read_size = 0
+        for window in read_windows(restored_file, DECODE_WINDOW, size):
+            hasher.update(window)
+            read_size += len(window)
+    return read_size == size and hasher.hexdigest() == chunk_digest
+
+
+def find_bad_parts(manifest, chunk_digests):
+    """
+    Сравнивает хэши декодированных кусков, полученные при сборке, с манифестом.
+
+    :param chunk_digests: Словарь {номер части: хэш куска}.
+    :return: Отсортированный список номеров отсутствующих или повреждённых частей.
+    """
+    return sorted(
+        entry["index"] for entry in manifest["parts"]
+        if chunk_digests.get(entry["index"]) != entry["chunk_sha256"]
+    )
+
+
+def format_part_numbers(numbers):
+    """Компактная запись номеров частей: 1-3, 7, 9-10."""
+    groups = []
+    for number in sorted(numbers):
+        if groups and number == groups[-1][1] + 1:
+            groups[-1][1] = number
+        else:
+            groups.append([number, number])
+    return ", ".join(str(a) if a == b else f"{a}-{b}" for a, b in groups)
+
+
+def parse_part_numbers(text):
+    """Разбирает запись вида '1-3,7,9-10' в множество номеров частей."""
+    numbers = set()
+    for item in text.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if '-' in item:
+            first, last = item.split('-', 1)
+            numbers.update(range(int(first), int(last) + 1))
+        else:
+            numbers.add(int(item))
+    return numbers
+
+
+def locate_manifest(path):
+    """
+    Находит манифест и папку с частями по пути к манифесту, к JSON-метаданным
+    separator-silence.py или к папке частей separator.py.
+
+    :return: (путь к манифесту, папка с частями).
+    """
+    manifest_path = os.path.join(path, "manifest.json") if os.path.isdir(path) else path
+    with open(manifest_path, "r") as f:
+        data = json.load(f)
+    if "manifest" in data:
+        manifest_path = os.path.join(os.path.dirname(manifest_path), data["manifest"])
+        with open(manifest_path, "r") as f:
+            data = json.load(f)
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    if "store" in data:
+        # Части лежат в общем хранилище, путь к нему записан относительно манифеста
+        return manifest_path, os.path.join(manifest_dir, data["store"])
+    if os.path.basename(manifest_dir) == "json":
+        return manifest_path, os.path.join(manifest_dir, "..", "parts")
+    return manifest_path, manifest_dir
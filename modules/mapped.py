@@ -0,0 +1,100 @@
+# mapped.py
+import mmap
+import os
+
+# Способы чтения входного файла при разбиении
+READ_MODES = ('buffered', 'mmap')
+
+
+def advise(mapped, option, start=0, length=None):
+    """madvise для отображения, если ОС его поддерживает (иначе подсказка просто пропускается)."""
+    value = getattr(mmap, option, None)
+    if value is None or not hasattr(mapped, 'madvise'):
+        return
+    # Начало диапазона должно быть выровнено по странице
+    aligned = start - start % mmap.PAGESIZE
+    if length is None:
+        length = len(mapped) - aligned
+    else:
+        length = min(length + start - aligned, len(mapped) - aligned)
+    if length > 0:
+        mapped.madvise(value, aligned, length)
+
+
+class MappedInput:
+    """
+    Входной файл (или его диапазон), отображённый в память только для чтения.
+
+    view() выдаёт memoryview на байты файла без копирования: кодировщики и хэши
+    читают прямо из страничного кэша, минуя промежуточный буфер. Отображение
+    помечается MADV_SEQUENTIAL — ядро читает вперёд крупнее; will_need() просит
+    заранее подгрузить следующий кусок, а done() снимает пройденные страницы с
+    отображения, чтобы RSS процесса не рос до размера файла (данные остаются
+    в страничном кэше).
+
+        with MappedInput('input/file.bin') as mapped:
+            encode_stream(mapped.view(offset, length), part_file, 'base64')
+    """
+
+    def __init__(self, path, offset=0, length=None):
+        """
+        :param offset: Начало отображаемого диапазона в файле.
+        :param length: Длина диапазона (None — до конца файла).
+        """
+        available = max(0, os.path.getsize(path) - offset)
+        self.offset = offset
+        self.length = available if length is None else min(length, available)
+        self.mapped = None
+        self.base = 0
+        # Пустой файл отобразить нельзя — для него view() выдаёт пустой срез
+        if self.length > 0:
+            # Смещение отображения должно быть кратно гранулярности выделения
+            start = offset - offset % mmap.ALLOCATIONGRANULARITY
+            with open(path, 'rb') as f:
+                self.mapped = mmap.mmap(f.fileno(), offset + self.length - start,
+                                        access=mmap.ACCESS_READ, offset=start)
+            self.base = offset - start
+            advise(self.mapped, 'MADV_SEQUENTIAL')
+
+    def view(self, offset, length):
+        """memoryview на байты [offset, offset + length) файла; срез действителен до close()."""
+        if self.mapped is None:
+            return memoryview(b'')
+        start = self.base + offset - self.offset
+        return memoryview(self.mapped)[start:start + length]
+
+    def will_need(self, offset, length):
+        """Подсказка ядру заранее прочитать диапазон файла (MADV_WILLNEED)."""
+        if self.mapped is not None and offset < self.offset + self.length:
+            advise(self.mapped, 'MADV_WILLNEED', self.base + offset - self.offset, length)
+
+    def done(self, offset, length):
+        """
+        Диапазон файла (и всё до него — чтение последовательное) обработан:
+        его страницы больше не нужны процессу (MADV_DONTNEED).
+        """
+        if self.mapped is not None:
+            start = self.base + offset - self.offset
+            end = start + length
+            # Неполная последняя страница ещё нужна следующему куску
+            if end >= len(self.mapped):
+                end = len(self.mapped)
+            else:
+                end -= end % mmap.PAGESIZE
+            if end > start:
+                advise(self.mapped, 'MADV_DONTNEED', start, end - start)
+
+    def close(self):
+        if self.mapped is not None:
+            try:
+                self.mapped.close()
+            except BufferError:
+                # Ещё живы срезы view() — отображение освободится вместе с последним из них
+                pass
+            self.mapped = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,88 @@
+# options.py
+from modules.codec import ENCODINGS
+from modules.compression import COMPRESSIONS
+from modules.mapped import READ_MODES
+from modules.parity import STRIPE_SIZE
+
+# Поле SplitOptions по имени аргумента командной строки (остальные аргументы называются как поля)
+ARG_FIELDS = {
+    "chunk_size": "chunk_size_kb",
+    "min_chunk_size": "min_chunk_kb",
+    "max_chunk_size": "max_chunk_kb",
+    "pack_size": "pack_size_mb",
+    "parity": "parity_parts",
+    "stats": "stats_path",
+    "name": "stream_name",
+}
+
+
+class SplitOptions:
+    """
+    Параметры разбиения — общие для separator-silence.py, cli.py, batch.py и modules.api.
+
+    chunk_size_kb — размер куска в КБ или "auto" (по размеру файла и замеру записи);
+    chunking — "fixed" или "cdc" (по содержимому, границы min_chunk_kb/max_chunk_kb);
+    compression — "none", "zlib", "bz2", "lzma" или "auto"; layout — "files" или
+    "pack" (контейнеры по pack_size_mb МБ); read_mode — "buffered" или "mmap";
+    parity_parts — контрольных частей на полосу из stripe_size частей; fsync —
+    сбрасывать части на диск; stats_path — отчёт по стадиям; resume — продолжить
+    по журналу; stream_name — имя потока из stdin; sparse — не писать куски из
+    одного повторённого байта.
+
+    Обычный класс, а не dataclass: dataclasses импортирует inspect, что заметно
+    для бюджета запуска cli.py --quiet.
+    """
+
+    def __init__(self, chunk_size_kb=200, encoding="base64", chunking="fixed", min_chunk_kb=None, max_chunk_kb=None,
+                 compression="none", compression_level=None, layout="files", pack_size_mb=None, read_mode="buffered",
+                 parity_parts=0, stripe_size=STRIPE_SIZE, fsync=False, stats_path=None, resume=False,
+                 stream_name=None, sparse=False):
+        self.chunk_size_kb = chunk_size_kb
+        self.encoding = encoding
+        self.chunking = chunking
+        self.min_chunk_kb = min_chunk_kb
+        self.max_chunk_kb = max_chunk_kb
+        self.compression = compression
+        self.compression_level = compression_level
+        self.layout = layout
+        self.pack_size_mb = pack_size_mb
+        self.read_mode = read_mode
+        self.parity_parts = parity_parts
+        self.stripe_size = stripe_size
+        self.fsync = fsync
+        self.stats_path = stats_path
+        self.resume = resume
+        self.stream_name = stream_name
+        self.sparse = sparse
+
+    @classmethod
+    def from_args(cls, args):
+        """Параметры из argparse.Namespace: отсутствующие у парсера аргументы остаются по умолчанию."""
+        fields = {ARG_FIELDS.get(name, name): value for name, value in vars(args).items()}
+        return cls(**{name: fields[name] for name in vars(cls()) if name in fields})
+
+    def __repr__(self):
+        return f"SplitOptions({', '.join(f'{name}={value!r}' for name, value in vars(self).items())})"
+
+    def error(self, streaming=False):
+        """Сообщение о недопустимом или несовместимом параметре либо None (streaming — поток из stdin)."""
+        if self.encoding not in ENCODINGS:
+            return f"Неизвестная кодировка: {self.encoding}"
+        if self.compression != "auto" and self.compression not in COMPRESSIONS:
+            return f"Неизвестный метод сжатия: {self.compression}"
+        if self.read_mode not in READ_MODES:
+            return f"Неизвестный способ чтения: {self.read_mode}"
+        if self.layout == "pack" and self.chunking == "cdc":
+            return "Контейнеры не поддерживаются для cdc: части cdc хранятся в общем хранилище"
+        if self.parity_parts and self.chunking == "cdc":
+            return "Контрольные части не поддерживаются для cdc: части cdc общие для разных файлов"
+        if self.parity_parts and (self.stripe_size < 1 or self.stripe_size + self.parity_parts > 256):
+            return (f"Некорректная полоса: {self.stripe_size} частей с данными и {self.parity_parts} "
+                    f"контрольных (не больше 256 в сумме)")
+        if self.sparse and self.chunking == "cdc":
+            return "--sparse работает с фиксированными кусками: одинаковые куски cdc и так хранятся один раз"
+        # Поток из stdin: размер неизвестен, повторно прочитать его нельзя
+        if streaming and (self.parity_parts or self.compression == "auto" or self.resume or self.read_mode == "mmap"):
+            return ("Поток из stdin читается один раз: --parity, --compression auto, --resume и "
+                    "--read-mode mmap для него недоступны")
+        return None
@@ -0,0 +1,93 @@
+# pack.py
+import os
+
+from modules.codec import NULL_STATS, sync_file
+
+# Размер контейнера по умолчанию: после него начинается следующий
+PACK_SIZE = 1024 * 1024 * 1024
+
+
+def pack_name(base_name, number):
+    """Имя контейнера с номером number."""
+    return f"{base_name}_{number}.pack"
+
+
+class PackWriter:
+    """
+    Пишет закодированные части подряд в контейнеры вместо отдельного файла на часть.
+
+    Часть целиком попадает в один контейнер; когда контейнер дорастает до pack_size,
+    начинается следующий. Запись идёт только в конец, поэтому контейнер можно читать
+    последовательно и дописывать. Положение каждой части (контейнер, смещение, длина)
+    хранится в манифесте — по номеру части она находится без просмотра папки.
+
+    С fsync=True каждый контейнер сбрасывается на диск перед закрытием.
+    """
+
+    def __init__(self, pack_dir, base_name, pack_size=PACK_SIZE, fsync=False, stats=NULL_STATS):
+        self.pack_dir = pack_dir
+        self.base_name = base_name
+        self.pack_size = pack_size
+        self.fsync = fsync
+        self.stats = stats
+        self.number = 0
+        self.file = None
+        self.names = []
+
+    def _close_file(self):
+        if self.fsync:
+            sync_file(self.file, self.stats)
+        self.file.close()
+        self.file = None
+
+    def _roll(self):
+        if self.file is not None:
+            self._close_file()
+        self.number += 1
+        name = pack_name(self.base_name, self.number)
+        self.file = open(os.path.join(self.pack_dir, name), 'wb')
+        self.names.append(name)
+
+    def open_part(self):
+        """
+        Начинает следующую часть.
+
+        :return: (имя контейнера, смещение части, файл для записи части).
+        """
+        if self.file is None or self.file.tell() >= self.pack_size:
+            self._roll()
+        return self.names[-1], self.file.tell(), self.file
+
+    def add_file(self, path):
+        """Дописывает готовую часть из файла path (он удаляется) и возвращает (имя контейнера, смещение)."""
+        # Части из пула процессов копируются только при workers > 1 — shutil не замедляет запуск
+        import shutil
+        name, offset, pack_file = self.open_part()
+        start = self.stats.now()
+        with open(path, 'rb') as part_file:
+            shutil.copyfileobj(part_file, pack_file, 1024 * 1024)
+        self.stats.lap('write', start, pack_file.tell() - offset)
+        os.remove(path)
+        return name, offset
+
+    def close(self):
+        if self.file is not None:
+            self._close_file()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def part_location(parts_dir, entry):
+    """
+    Положение части по записи манифеста.
+
+    :return: (путь к файлу, (смещение, длина) внутри контейнера или None для отдельного файла).
+    """
+    path = os.path.join(parts_dir, entry["name"])
+    if "pack_offset" in entry:
+        return path, (entry["pack_offset"], entry["encoded_size"])
+    return path, None
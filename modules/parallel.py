@@ -0,0 +1,323 @@
+# parallel.py
+import argparse
+import itertools
+import os
+from collections import deque
+
+from modules.codec import DECODE_ERRORS, DECODE_WINDOW, NULL_STATS, encode_stream, iter_decode, read_windows, sync_file
+from modules.journal import temp_path
+from modules.manifest import check_part, new_hasher
+from modules.mapped import MappedInput
+from modules.pack import part_location
+from modules.sparse import hash_run, in_hole, window_fill
+
+
+def chunk_ranges(file_size, chunk_size_bytes):
+    """Возвращает (номер части, смещение, длина) для каждого куска файла."""
+    for index, offset in enumerate(range(0, file_size, chunk_size_bytes), start=1):
+        yield index, offset, min(chunk_size_bytes, file_size - offset)
+
+
+def stream_ranges(src, chunk_size_bytes):
+    """
+    Как chunk_ranges, но для потока неизвестной длины (например, stdin): куски
+    выдаются, пока в src (буферизованный поток с peek) остаются данные. Длина
+    последнего куска станет известна только после его чтения.
+    """
+    for index in itertools.count(1):
+        if not src.peek(1):
+            return
+        yield index, (index - 1) * chunk_size_bytes, chunk_size_bytes
+
+
+def encode_range(input_file, offset, length, encoding, part_path, compression=None, compression_level=None,
+                 read_mode='buffered', fsync=False, collect_stats=False):
+    """
+    Выполняется в процессе-воркере: читает свой диапазон байтов исходного файла,
+    кодирует его и записывает часть. Родитель передаёт только путь и смещение,
+    поэтому данные куска не сериализуются между процессами.
+
+    Часть пишется во временный файл и переименовывается в part_path целиком,
+    поэтому прерванный запуск не оставляет недописанных частей.
+
+    :param read_mode: 'buffered' — чтение в буфер, 'mmap' — кодирование прямо из отображения диапазона.
+    :param fsync: Сбросить часть на диск до возврата.
+    :param collect_stats: Замерять стадии и вернуть счётчики четвёртым элементом (StageStats.as_dict()).
+    :return: (размер закодированной части, хэш куска, хэш части) для манифеста.
+    """
+    stats = NULL_STATS
+    if collect_stats:
+        from modules.stats import StageStats
+        stats = StageStats()
+    chunk_hasher = new_hasher()
+    part_hasher = new_hasher()
+    part_path_tmp = temp_path(part_path)
+    with open(part_path_tmp, 'wb') as part_file:
+        if read_mode == 'mmap':
+            with MappedInput(input_file, offset, length) as mapped:
+                _, encoded_size = encode_stream(mapped.view(offset, length), part_file, encoding, None,
+                                                (chunk_hasher,), (part_hasher,), compression, compression_level, stats)
+        else:
+            with open(input_file, 'rb') as f:
+                f.seek(offset)
+                _, encoded_size = encode_stream(f, part_file, encoding, length, (chunk_hasher,), (part_hasher,),
+                                                compression, compression_level, stats)
+        if fsync:
+            sync_file(part_file, stats)
+    os.replace(part_path_tmp, part_path)
+    if collect_stats:
+        return encoded_size, chunk_hasher.hexdigest(), part_hasher.hexdigest(), stats.as_dict()
+    return encoded_size, chunk_hasher.hexdigest(), part_hasher.hexdigest()
+
+
+def hashing_jobs(input_file, jobs, hasher, read_mode='buffered', stats=NULL_STATS, sparse=False):
+    """
+    Пропускает задания дальше, по порядку обновляя hasher содержимым их диапазонов.
+
+    Хэш считается в родителе непосредственно перед отправкой задания воркеру,
+    поэтому воркер читает уже прогретые страницы из кэша, а файл с диска
+    читается один раз. В режиме 'mmap' хэш считается прямо по отображению файла.
+
+    :param stats: StageStats родителя для стадий read и hash.
+    :param sparse: Проверять попутно, заполнен ли кусок одним повторённым байтом:
+                   к заданию добавляется этот байт или None (см. modules.sparse).
+                   Дыры разреженного файла не читаются.
+    """
+    if read_mode == 'mmap':
+        with MappedInput(input_file) as mapped:
+            for job in jobs:
+                _, offset, length, _ = job
+                mapped.will_need(offset, length)
+                start = stats.now()
+                view = mapped.view(offset, length)
+                hasher.update(view)
+                if sparse:
+                    job = (*job, window_fill(view))
+                stats.lap('hash', start, length)
+                mapped.done(offset, length)
+                yield job
+        return
+
+    with open(input_file, 'rb') as f:
+        for job in jobs:
+            _, offset, length, _ = job
+            start = stats.now()
+            if sparse and in_hole(input_file, offset, length):
+                hash_run(0, length, (hasher,))
+                stats.lap('hash', start, length)
+                yield (*job, 0)
+                continue
+            f.seek(offset)
+            fill = None
+            for position, window in enumerate(read_windows(f, DECODE_WINDOW, length)):
+                start = stats.lap('read', start, len(window))
+                hasher.update(window)
+                if sparse and (position == 0 or fill is not None):
+                    window_byte = window_fill(window)
+                    fill = window_byte if position == 0 or window_byte == fill else None
+                start = stats.lap('hash', start, len(window))
+            yield (*job, fill) if sparse else job
+
+
+def ordered_map(func, tasks, workers, max_in_flight=None, executor=None):
+    """
+    Выполняет func(*args) для каждого (номер, args) из tasks в пуле процессов.
+
+    Одновременно в работе не больше max_in_flight задач (по умолчанию 2 * workers),
+    что ограничивает память. Результаты выдаются в порядке номеров задач.
+
+    :param executor: Общий пул процессов (например, пакетного режима); по умолчанию создаётся свой.
+    :return: Генератор (номер, результат).
+    """
+    if executor is None:
+        # Импорт пула (multiprocessing и concurrent.futures) заметно удлиняет запуск —
+        # он нужен только при workers > 1
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from ordered_map(func, tasks, workers, max_in_flight, executor)
+        return
+    max_in_flight = max(1, max_in_flight or 2 * workers)
+    pending = deque()
+    for index, args in tasks:
+        if len(pending) >= max_in_flight:
+            done_index, future = pending.popleft()
+            yield done_index, future.result()
+        pending.append((index, executor.submit(func, *args)))
+    while pending:
+        done_index, future = pending.popleft()
+        yield done_index, future.result()
+
+
+def parallel_split(input_file, jobs, encoding, workers, max_in_flight=None,
+                   compression=None, compression_level=None, executor=None, read_mode='buffered',
+                   fsync=False, stats=None):
+    """
+    Кодирует куски в пуле процессов.
+
+    :param jobs: Итерируемый набор (номер части, смещение, длина, путь к части).
+    :param workers: Количество процессов.
+    :param max_in_flight: Максимум одновременно обрабатываемых кусков
+                          (по умолчанию 2 * workers) — ограничивает память.
+    :param compression: Метод сжатия кусков перед кодированием.
+    :param executor: Общий пул процессов (по умолчанию создаётся свой).
+    :param read_mode: Способ чтения входного файла воркерами ('buffered' или 'mmap').
+    :param fsync: Воркеры сбрасывают каждую часть на диск.
+    :param stats: StageStats, в который складываются счётчики стадий воркеров
+                  (None или NULL_STATS — воркеры стадии не засекают).
+    :return: Генератор (номер части, (размер закодированной части, хэш куска, хэш части))
+             в порядке частей.
+    """
+    if stats is NULL_STATS:
+        stats = None
+    tasks = (
+        (index, (input_file, offset, length, encoding, part_path, compression, compression_level, read_mode,
+                 fsync, stats is not None))
+        for index, offset, length, part_path in jobs
+    )
+    results = ordered_map(encode_range, tasks, workers, max_in_flight, executor)
+    if stats is None:
+        return results
+    return merged_stats(results, stats)
+
+
+def merged_stats(results, stats):
+    """Складывает счётчики стадий из результатов воркеров в stats и выдаёт результаты без них."""
+    for index, (*result, counters) in results:
+        stats.update(counters)
+        yield index, tuple(result)
+
+
+def preallocate(output_path, size, sparse=False):
+    """
+    Создаёт выходной файл итогового размера, по возможности резервируя место на диске.
+
+    :param sparse: Только задать размер: место не резервируется, и непрописанные
+                   диапазоны (нулевые куски --sparse) остаются дырами.
+    """
+    with open(output_path, 'wb') as output:
+        output.truncate(size)
+        if size and not sparse and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(output.fileno(), 0, size)
+            except OSError:
+                # Файловая система не поддерживает резервирование — хватит truncate
+                pass
+
+
+def decode_to_offset(part_path, output_path, offset, encoding, compression=None, part_range=None,
+                     skip_corrupt=False):
+    """
+    Выполняется в процессе-воркере: декодирует часть и записывает её
+    позиционной записью (pwrite) по своему смещению в предвыделенный файл.
+
+    :param part_range: (смещение, длина) части внутри контейнера или None для отдельного файла.
+    :param skip_corrupt: Не прерываться на части, которую не удалось декодировать, —
+                         вместо хэша куска вернуть None (её восстановят по контрольным частям).
+    :return: (размер декодированной части, хэш куска для сверки с манифестом).
+    """
+    start, length = part_range or (0, None)
+    chunk_hasher = new_hasher()
+    decoded_size = 0
+    fd = os.open(output_path, os.O_WRONLY)
+    try:
+        with open(part_path, 'rb') as part_file:
+            part_file.seek(start)
+            for block in iter_decode(part_file, encoding, compression, length):
+                chunk_hasher.update(block)
+                view = memoryview(block)
+                while view:
+                    written = os.pwrite(fd, view, offset + decoded_size)
+                    view = view[written:]
+                    decoded_size += written
+    except DECODE_ERRORS:
+        if not skip_corrupt:
+            raise
+        return decoded_size, None
+    finally:
+        os.close(fd)
+    return decoded_size, chunk_hasher.hexdigest()
+
+
+def parallel_merge(jobs, output_path, encoding, workers, max_in_flight=None, hasher=None, compression=None,
+                   executor=None, skip_corrupt=False):
+    """
+    Декодирует части в пуле процессов в произвольном порядке, каждая пишется
+    по своему смещению в выходной файл, заранее созданный через preallocate().
+
+    :param jobs: Итерируемый набор (номер части, путь к части, смещение в выходном файле,
+                 (смещение, длина) части в контейнере или None).
+    :param hasher: Необязательный объект hashlib — обновляется по порядку
+                   содержимым уже записанных диапазонов (они ещё в кэше страниц).
+                   Промежутки между частями и хвост файла (куски --sparse, которые
+                   вызывающий восстановил сам) хэшируются из файла в том же порядке.
+    :param compression: Метод сжатия кусков (части распаковываются на лету).
+    :param executor: Общий пул процессов (по умолчанию создаётся свой).
+    :param skip_corrupt: Для части, которую не удалось декодировать, выдавать хэш None вместо ошибки.
+    :return: Генератор (номер части, размер декодированной части, хэш куска) в порядке частей.
+    """
+    offsets = {}
+
+    def tasks():
+        for index, part_path, offset, part_range in jobs:
+            offsets[index] = offset
+            yield index, (part_path, output_path, offset, encoding, compression, part_range, skip_corrupt)
+
+    # Без буфера: иначе после seek() могли бы читаться байты, закэшированные до того,
+    # как воркер записал соседнюю мелкую часть
+    position = 0
+    with open(output_path, 'rb', buffering=0) as written:
+        for index, (size, chunk_digest) in ordered_map(decode_to_offset, tasks(), workers, max_in_flight, executor):
+            if hasher is not None:
+                written.seek(position)
+                for window in read_windows(written, DECODE_WINDOW, offsets[index] + size - position):
+                    hasher.update(window)
+                position = offsets[index] + size
+            del offsets[index]
+            yield index, size, chunk_digest
+        if hasher is not None:
+            written.seek(position)
+            for window in read_windows(written, DECODE_WINDOW):
+                hasher.update(window)
+
+
+def verify_parts(manifest, parts_dir, indices=None, workers=1, decode=False, max_in_flight=None):
+    """
+    Проверяет части по манифесту, не читая остальные части.
+
+    :param indices: Номера проверяемых частей (None — все части).
+    :param decode: Дополнительно декодировать части и сверять хэши кусков.
+    :return: Генератор (номер части, 'ok' | 'missing' | 'corrupt') в порядке частей.
+    """
+    encoding = manifest["encoding"]
+
+    def tasks():
+        for entry in manifest["parts"]:
+            if "fill" in entry and (indices is None or entry["index"] in indices):
+                # Кусок из повторённого байта (--sparse) записан в самом манифесте
+                yield entry["index"], (None, entry["part_sha256"], entry["chunk_sha256"], encoding)
+            elif indices is None or entry["index"] in indices:
+                part_path, part_range = part_location(parts_dir, entry)
+                yield entry["index"], (part_path, entry["part_sha256"], entry["chunk_sha256"], encoding,
+                                       decode, manifest.get("compression"), part_range)
+
+    if workers > 1:
+        return ordered_map(check_part, tasks(), workers, max_in_flight)
+    return ((index, check_part(*args)) for index, args in tasks())
+
+
+def default_workers():
+    """Количество ядер процессора, доступных текущему процессу."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def workers_arg(value):
+    """Тип аргумента --workers для argparse: число процессов не меньше 0 (0 — по числу ядер)."""
+    try:
+        workers = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"нужно целое число процессов: {value}")
+    if workers < 0:
+        raise argparse.ArgumentTypeError(f"число процессов не может быть отрицательным (0 — по числу ядер): {value}")
+    return workers
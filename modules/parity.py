@@ -0,0 +1,296 @@
+# parity.py
+import os
+from functools import lru_cache
+
+from modules.codec import DECODE_ERRORS, encode_stream, iter_decode
+from modules.journal import temp_path
+from modules.manifest import new_hasher
+from modules.parallel import ordered_map
+from modules.shards import shard_name
+
+# Число частей с данными в полосе по умолчанию
+STRIPE_SIZE = 8
+
+# Порождающий полином поля GF(2^8): x^8 + x^4 + x^3 + x^2 + 1
+GF_POLYNOMIAL = 0x11d
+
+
+def _gf_tables():
+    exp = [0] * 512
+    log = [0] * 256
+    value = 1
+    for power in range(255):
+        exp[power] = value
+        log[value] = power
+        value <<= 1
+        if value & 0x100:
+            value ^= GF_POLYNOMIAL
+    # Удвоенная таблица степеней избавляет от взятия остатка при умножении
+    for power in range(255, 512):
+        exp[power] = exp[power - 255]
+    return exp, log
+
+
+GF_EXP, GF_LOG = _gf_tables()
+
+
+def gf_mul(a, b):
+    if not a or not b:
+        return 0
+    return GF_EXP[GF_LOG[a] + GF_LOG[b]]
+
+
+def gf_inverse(a):
+    if not a:
+        raise ZeroDivisionError("У нуля нет обратного в GF(256)")
+    return GF_EXP[255 - GF_LOG[a]]
+
+
+def gf_invert_matrix(matrix):
+    """Обращает квадратную матрицу над GF(256) методом Гаусса — Жордана."""
+    size = len(matrix)
+    rows = [list(row) + [int(i == j) for j in range(size)] for i, row in enumerate(matrix)]
+    for column in range(size):
+        pivot = next(row for row in range(column, size) if rows[row][column])
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        scale = gf_inverse(rows[column][column])
+        rows[column] = [gf_mul(value, scale) for value in rows[column]]
+        for row in range(size):
+            factor = rows[row][column]
+            if row != column and factor:
+                rows[row] = [value ^ gf_mul(factor, pivot_value) for value, pivot_value in zip(rows[row], rows[column])]
+    return [row[size:] for row in rows]
+
+
+@lru_cache(maxsize=256)
+def mul_table(factor):
+    """Таблица для bytes.translate: умножение каждого байта на factor в GF(256)."""
+    return bytes(gf_mul(factor, value) for value in range(256))
+
+
+def scaled(data, factor):
+    """
+    Блок байтов, умноженный на factor в GF(256), в виде целого числа (little-endian).
+
+    Умножение делается одним bytes.translate, а сложение блоков в GF(256) — это
+    XOR таких чисел: обе операции идут по всему блоку сразу на скорости C, без
+    цикла по байтам. Недостающие в коротком блоке старшие байты равны нулю, что
+    соответствует дополнению куска нулями до длины полосы.
+    """
+    if not factor:
+        return 0
+    if factor != 1:
+        data = bytes(data).translate(mul_table(factor))
+    return int.from_bytes(data, 'little')
+
+
+def coefficient(parity_index, data_index, parity_parts):
+    """
+    Коэффициент data_index-го куска полосы (с нуля) в parity_index-й контрольной части.
+
+    Одна контрольная часть — обычный XOR. Для нескольких используется матрица
+    Коши 1 / (x_p + y_j) с x_p = p и y_j = K + j: любая её квадратная подматрица
+    обратима, поэтому любые K потерянных частей полосы восстанавливаются.
+    """
+    if parity_parts == 1:
+        return 1
+    return gf_inverse(parity_index ^ (parity_parts + data_index))
+
+
+def parity_algorithm(parity_parts):
+    return 'xor' if parity_parts == 1 else 'rs'
+
+
+def stripes(entries, data_parts):
+    """
+    Разбивает записи частей на полосы по data_parts подряд; последняя может быть короче.
+
+    Серии из повтора байта (--sparse, поле fill) в полосы не входят: части на диске
+    у них нет, потерять её нельзя, а читать серию целиком ради полосы слишком дорого.
+    """
+    entries = [entry for entry in entries if "fill" not in entry]
+    return [entries[start:start + data_parts] for start in range(0, len(entries), data_parts)]
+
+
+def parity_name(base_name, stripe, parity_index):
+    return f"{base_name}_parity_{stripe:03d}_{parity_index}.txt"
+
+
+def encode_stripe(input_file, ranges, parity_parts, encoding, part_paths):
+    """
+    Выполняется в процессе-воркере: читает куски одной полосы из исходного файла
+    и записывает parity_parts закодированных контрольных частей.
+
+    :param ranges: (смещение, длина) каждого куска полосы.
+    :return: Список (длина куска, размер закодированной части, хэш куска, хэш части).
+    """
+    sums = [0] * parity_parts
+    length = max(size for _, size in ranges)
+    with open(input_file, 'rb') as f:
+        for data_index, (offset, size) in enumerate(ranges):
+            f.seek(offset)
+            chunk = f.read(size)
+            for parity_index in range(parity_parts):
+                sums[parity_index] ^= scaled(chunk, coefficient(parity_index, data_index, parity_parts))
+
+    results = []
+    for parity_sum, part_path in zip(sums, part_paths):
+        chunk_hasher = new_hasher()
+        part_hasher = new_hasher()
+        part_path_tmp = temp_path(part_path)
+        with open(part_path_tmp, 'wb') as part_file:
+            _, encoded_size = encode_stream(memoryview(parity_sum.to_bytes(length, 'little')), part_file, encoding,
+                                            None, (chunk_hasher,), (part_hasher,))
+        os.replace(part_path_tmp, part_path)
+        results.append((length, encoded_size, chunk_hasher.hexdigest(), part_hasher.hexdigest()))
+    return results
+
+
+def write_parity(input_file, entries, parts_dir, base_name, data_parts, parity_parts, encoding,
+                 workers=1, max_in_flight=None, executor=None, sharded=False):
+    """
+    Записывает контрольные части для каждой полосы из data_parts частей.
+
+    Полосы независимы, поэтому при workers > 1 кодируются в пуле процессов.
+
+    :param entries: Записи манифеста частей (фиксированные куски; серии fill пропускаются).
+    :param sharded: Раскладывать контрольные части по вложенным папкам по номеру полосы
+                    (папки уже созданы для частей с данными, полос не больше, чем частей).
+    :return: Раздел "parity" манифеста.
+    """
+    if parity_parts < 1 or data_parts + parity_parts > 256:
+        raise ValueError(f"Некорректная полоса: {data_parts} частей с данными и {parity_parts} контрольных "
+                         f"(нужно не меньше одной контрольной и не больше 256 частей в полосе)")
+    tasks = []
+    for stripe, group in enumerate(stripes(entries, data_parts), start=1):
+        names = [shard_name(parity_name(base_name, stripe, parity_index), stripe, sharded)
+                 for parity_index in range(1, parity_parts + 1)]
+        tasks.append((stripe, (input_file, [(entry["offset"], entry["size"]) for entry in group], parity_parts, encoding,
+                               [os.path.join(parts_dir, name) for name in names])))
+
+    if workers > 1:
+        results = ordered_map(encode_stripe, tasks, workers, max_in_flight, executor)
+    else:
+        results = ((stripe, encode_stripe(*args)) for stripe, args in tasks)
+
+    parts = []
+    for stripe, stripe_results in results:
+        for parity_index, (length, encoded_size, chunk_digest, part_digest) in enumerate(stripe_results, start=1):
+            parts.append({
+                "stripe": stripe,
+                "index": parity_index,
+                "name": shard_name(parity_name(base_name, stripe, parity_index), stripe, sharded),
+                "size": length,
+                "encoded_size": encoded_size,
+                "chunk_sha256": chunk_digest,
+                "part_sha256": part_digest,
+            })
+    return {
+        "algorithm": parity_algorithm(parity_parts),
+        "data_parts": data_parts,
+        "parity_parts": parity_parts,
+        "parts": parts,
+    }
+
+
+def read_parity_chunk(parts_dir, entry, encoding):
+    """Декодирует контрольную часть; None, если её нет или она повреждена."""
+    chunk = bytearray()
+    try:
+        with open(os.path.join(parts_dir, entry['name']), 'rb') as part_file:
+            for block in iter_decode(part_file, encoding):
+                chunk += block
+    except (OSError, *DECODE_ERRORS):
+        return None
+    chunk_hasher = new_hasher()
+    chunk_hasher.update(chunk)
+    if chunk_hasher.hexdigest() != entry["chunk_sha256"]:
+        return None
+    return bytes(chunk)
+
+
+def rebuild_parts(manifest, parts_dir, lost, read_chunk):
+    """
+    Восстанавливает куски потерянных частей по контрольным частям их полос.
+
+    В каждой полосе восстанавливается до parity_parts отсутствующих или
+    повреждённых частей; повреждённая контрольная часть просто не используется.
+
+    :param lost: Номера потерянных частей с данными.
+    :param read_chunk: Функция запись манифеста -> кусок уцелевшей части
+                       (например, из уже собранного файла).
+    :return: Генератор (запись манифеста, восстановленный кусок); хэш куска сверен с манифестом.
+    :raises ValueError: Потерь в полосе больше, чем уцелевших контрольных частей.
+    """
+    parity = manifest["parity"]
+    data_parts = parity["data_parts"]
+    parity_parts = parity["parity_parts"]
+    lost = set(lost)
+    parity_entries = {}
+    for entry in parity["parts"]:
+        parity_entries.setdefault(entry["stripe"], []).append(entry)
+
+    for stripe, group in enumerate(stripes(manifest["parts"], data_parts), start=1):
+        missing = [position for position, entry in enumerate(group) if entry["index"] in lost]
+        if not missing:
+            continue
+
+        available = []
+        for entry in sorted(parity_entries.get(stripe, []), key=lambda entry: entry["index"]):
+            chunk = read_parity_chunk(parts_dir, entry, manifest["encoding"])
+            if chunk is not None:
+                available.append((entry["index"] - 1, chunk))
+            if len(available) == len(missing):
+                break
+        if len(available) < len(missing):
+            raise ValueError(f"Полоса {stripe}: потеряно частей {len(missing)}, "
+                             f"уцелевших контрольных частей {len(available)} — восстановление невозможно")
+
+        length = len(available[0][1])
+        # Вклад потерянных кусков в каждую контрольную часть: из неё вычитаются уцелевшие
+        syndromes = []
+        for parity_index, chunk in available:
+            syndrome = int.from_bytes(chunk, 'little')
+            for position, entry in enumerate(group):
+                if position not in missing:
+                    syndrome ^= scaled(read_chunk(entry), coefficient(parity_index, position, parity_parts))
+            syndromes.append(syndrome.to_bytes(length, 'little'))
+
+        inverse = gf_invert_matrix([
+            [coefficient(parity_index, position, parity_parts) for position in missing]
+            for parity_index, _ in available
+        ])
+        for row, position in zip(inverse, missing):
+            value = 0
+            for factor, syndrome in zip(row, syndromes):
+                value ^= scaled(syndrome, factor)
+            entry = group[position]
+            chunk = value.to_bytes(length, 'little')[:entry["size"]]
+            chunk_hasher = new_hasher()
+            chunk_hasher.update(chunk)
+            if chunk_hasher.hexdigest() != entry["chunk_sha256"]:
+                raise ValueError(f"Часть {entry['index']} восстановлена с ошибкой: хэш куска не совпадает с манифестом")
+            yield entry, chunk
+
+
+def repair_file(manifest, parts_dir, output_path, lost):
+    """
+    Восстанавливает потерянные части прямо в собранном файле: уцелевшие куски
+    полосы читаются из него же, восстановленные пишутся по своим смещениям.
+
+    :return: Номера восстановленных частей.
+    :raises ValueError: Часть восстановить невозможно (см. rebuild_parts).
+    """
+    repaired = []
+    with open(output_path, 'r+b') as output_file:
+        def read_chunk(entry):
+            output_file.seek(entry["offset"])
+            return output_file.read(entry["size"])
+
+        for entry, chunk in rebuild_parts(manifest, parts_dir, lost, read_chunk):
+            output_file.seek(entry["offset"])
+            output_file.write(chunk)
+            repaired.append(entry["index"])
+        # Повреждённая последняя часть могла декодироваться в лишние байты
+        output_file.truncate(manifest["original_size"])
+    return repaired
@@ -0,0 +1,183 @@
+# planner.py
+import argparse
+import json
+import os
+import time
+
+from modules.codec import encode_stream
+from modules.journal import replace_json, temp_path
+
+# Границы размера куска в КБ при автоматическом выборе
+MIN_CHUNK_KB = 64
+MAX_CHUNK_KB = 256 * 1024
+
+# Желаемое число частей: не больше MAX_PARTS (иначе тысячи файлов на каждый гигабайт),
+# не меньше MIN_PARTS и PARTS_PER_WORKER на воркер (иначе пулу нечего распределять)
+MIN_PARTS = 8
+MAX_PARTS = 4096
+PARTS_PER_WORKER = 4
+
+# Доля времени, которую допустимо тратить на создание, переименование и закрытие частей
+OVERHEAD_SHARE = 0.05
+
+# Доля места, которую допустимо терять на недозаполненном последнем блоке каждой части
+SLACK_SHARE = 0.01
+
+# Замер: объём выборки и размер мелкой части, число повторов (берётся лучший)
+BENCH_BYTES = 4 * 1024 * 1024
+BENCH_PART = 16 * 1024
+BENCH_REPEATS = 3
+
+# Замер хранится в кэше и повторяется не чаще раза в CACHE_TTL секунд
+CACHE_TTL = 7 * 24 * 3600
+
+
+def chunk_size_arg(value):
+    """Тип аргумента --chunk-size для argparse: размер в КБ или 'auto'."""
+    if value == 'auto':
+        return value
+    try:
+        size = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"нужен размер в КБ или auto: {value}")
+    if size < 1:
+        raise argparse.ArgumentTypeError(f"размер куска должен быть положительным: {value}")
+    return size
+
+
+def cache_path():
+    """Файл кэша замеров: $SEPARATOR_CACHE или <XDG_CACHE_HOME или ~/.cache>/separator/chunk_planner.json."""
+    if os.environ.get('SEPARATOR_CACHE'):
+        return os.environ['SEPARATOR_CACHE']
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'separator', 'chunk_planner.json')
+
+
+def block_size(directory):
+    """Размер блока файловой системы папки (4096, если неизвестен)."""
+    try:
+        return os.statvfs(directory).f_bsize or 4096
+    except (AttributeError, OSError):
+        # os.statvfs нет в Windows
+        return 4096
+
+
+def measure_throughput(directory, encoding):
+    """
+    Замеряет на файловой системе directory скорость кодирования с записью и
+    накладные расходы на одну часть.
+
+    Одна и та же выборка случайных байтов записывается одним файлом и мелкими
+    частями по BENCH_PART так же, как пишутся настоящие части (временное имя и
+    os.replace); разница во времени, делённая на число лишних частей, — расходы
+    на часть. Из BENCH_REPEATS повторов берётся лучший.
+
+    :return: {"mb_s": скорость кодирования и записи, "part_overhead_ms": расходы на часть}.
+    """
+    import tempfile
+    data = memoryview(os.urandom(BENCH_BYTES))
+    parts = BENCH_BYTES // BENCH_PART
+    whole_seconds = split_seconds = float('inf')
+    with tempfile.TemporaryDirectory(prefix='.chunk-bench-', dir=directory) as bench_dir:
+        for repeat in range(BENCH_REPEATS):
+            start = time.perf_counter()
+            path = os.path.join(bench_dir, f"whole_{repeat}")
+            with open(temp_path(path), 'wb') as part_file:
+                encode_stream(data, part_file, encoding)
+            os.replace(temp_path(path), path)
+            whole_seconds = min(whole_seconds, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for part_number in range(parts):
+                path = os.path.join(bench_dir, f"part_{repeat}_{part_number}")
+                with open(temp_path(path), 'wb') as part_file:
+                    encode_stream(data[part_number * BENCH_PART:(part_number + 1) * BENCH_PART], part_file, encoding)
+                os.replace(temp_path(path), path)
+            split_seconds = min(split_seconds, time.perf_counter() - start)
+
+    return {
+        "mb_s": round(BENCH_BYTES / 1024 / 1024 / whole_seconds, 2),
+        "part_overhead_ms": round(max(0.0, split_seconds - whole_seconds) / (parts - 1) * 1000, 4),
+    }
+
+
+def cached_throughput(directory, encoding):
+    """
+    Замер measure_throughput из кэша (по кодировке и устройству папки) или новый.
+
+    :return: (замер, взят ли он из кэша).
+    """
+    path = cache_path()
+    key = f"{encoding}:{os.stat(directory).st_dev}"
+    try:
+        with open(path) as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        cache = {}
+    entry = cache.get(key)
+    if isinstance(entry, dict) and time.time() - entry.get("measured_at", 0) < CACHE_TTL:
+        return entry, True
+
+    entry = dict(measure_throughput(directory, encoding), measured_at=int(time.time()))
+    cache[key] = entry
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        replace_json(cache, path)
+    except OSError:
+        # Кэш недоступен для записи — замер просто повторится в следующий раз
+        pass
+    return entry, False
+
+
+def choose_chunk_size(file_size, directory, encoding, workers=1):
+    """
+    Выбирает размер куска для --chunk-size auto.
+
+    Нижняя граница — наименьший кусок, на котором расходы на часть (замер
+    cached_throughput) занимают не больше OVERHEAD_SHARE времени, а недозаполненный
+    последний блок файловой системы — не больше SLACK_SHARE места. Затем размер
+    сдвигается в желаемый диапазон числа частей: не больше MAX_PARTS и не меньше
+    max(MIN_PARTS, PARTS_PER_WORKER * workers), если кусок при этом не меньше
+    MIN_CHUNK_KB. Итог ограничен MIN_CHUNK_KB..MAX_CHUNK_KB и кратен блоку.
+
+    :param file_size: Размер исходного файла (None — поток неизвестной длины).
+    :param directory: Существующая папка, куда будут записаны части.
+    :return: (размер куска в КБ, сводка выбора для метаданных).
+    """
+    fs_block = block_size(directory)
+    bench, cached = cached_throughput(directory, encoding)
+
+    overhead_kb = bench["part_overhead_ms"] / 1000 * bench["mb_s"] * 1024 / OVERHEAD_SHARE
+    slack_kb = fs_block / 2 / SLACK_SHARE / 1024
+    chunk_kb = max(MIN_CHUNK_KB, overhead_kb, slack_kb)
+    reason = ("расходы на создание части" if overhead_kb >= max(MIN_CHUNK_KB, slack_kb)
+              else "потеря места на последнем блоке части" if slack_kb >= MIN_CHUNK_KB
+              else "минимальный размер куска")
+
+    min_parts = max(MIN_PARTS, PARTS_PER_WORKER * workers)
+    if file_size is not None:
+        file_kb = file_size / 1024
+        if file_kb / chunk_kb > MAX_PARTS:
+            chunk_kb = file_kb / MAX_PARTS
+            reason = f"не больше {MAX_PARTS} частей"
+        elif file_kb / chunk_kb < min_parts and file_kb / min_parts >= MIN_CHUNK_KB:
+            chunk_kb = file_kb / min_parts
+            reason = f"не меньше {min_parts} частей для {workers} процессов"
+    if chunk_kb > MAX_CHUNK_KB:
+        chunk_kb = MAX_CHUNK_KB
+        reason = "максимальный размер куска"
+
+    # Кусок кратен блоку файловой системы (и целому числу КБ)
+    align_kb = max(1, fs_block // 1024)
+    chunk_kb = int(-(-chunk_kb // align_kb) * align_kb)
+
+    summary = {
+        "chunk_size_kb": chunk_kb,
+        "reason": reason,
+        "file_size": file_size,
+        "parts": -(-file_size // (chunk_kb * 1024)) if file_size is not None else None,
+        "target_parts": [min_parts, MAX_PARTS],
+        "block_size": fs_block,
+        "benchmark": {"mb_s": bench["mb_s"], "part_overhead_ms": bench["part_overhead_ms"], "cached": cached},
+    }
+    return chunk_kb, summary
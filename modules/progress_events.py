@@ -0,0 +1,42 @@
+# progress_events.py
+import json
+import os
+
+
+class ProgressEmitter:
+    """
+    Пишет события прогресса строками JSON в канал (pipe), переданный запускающим процессом.
+
+    События: start (total_bytes, total_parts), part (index, bytes — обработано байтов
+    исходного файла всего), done (path). Без дескриптора события не пишутся.
+    Если канал закрылся без события done, задача завершилась с ошибкой.
+    """
+
+    def __init__(self, fd=None):
+        self.out = os.fdopen(fd, 'w', buffering=1) if fd is not None else None
+
+    def emit(self, event, **fields):
+        if self.out is None:
+            return
+        try:
+            self.out.write(json.dumps({"event": event, **fields}) + "\n")
+        except BrokenPipeError:
+            # Читатель закрыл канал — работа продолжается без событий
+            self.out = None
+
+    def start(self, total_bytes, total_parts=None):
+        self.emit("start", total_bytes=total_bytes, total_parts=total_parts)
+
+    def part(self, index, done_bytes):
+        self.emit("part", index=index, bytes=done_bytes)
+
+    def done(self, path):
+        self.emit("done", path=path)
+
+    def close(self):
+        if self.out is not None:
+            try:
+                self.out.close()
+            except BrokenPipeError:
+                pass
+            self.out = None
@@ -1,70 +1,83 @@
 # progress_tracker.py
+import json
 import time
-import re
 from modules.gpt_logger import log_error, log_success
 
+# Интервал между обновлениями строки прогресса
+REFRESH_INTERVAL = 0.2
 
-def track_progress(log_file, total_parts=None):
-    """
-    Отслеживает прогресс выполнения разрезания или восстановления файлов на основе лог-файла.
-    """
-    part_pattern = re.compile(r"Часть (\d+)/(\d+) восстановлена|Часть (\d+) сохранена")
-    total_parts_pattern = re.compile(r"Общее количество частей: (\d+)")
-    log_pattern = re.compile(r'(?P<message>.+?)(?P<path>в: .+)$')  # Шаблон для финальных строк
-    completed = False
-    logged_parts = set()
-    final_lines = []
 
-    while not completed:
-        try:
-            with open(log_file, "r") as f:
-                for line in f:
-                    # Установка общего количества частей
-                    if total_parts is None:
-                        total_match = total_parts_pattern.search(line)
-                        if total_match:
-                            total_parts = int(total_match.group(1))
-                            print(f"Общее количество частей установлено: {total_parts}")
+def format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
 
-                    # Отслеживание прогресса восстановления или разрезания
-                    match = part_pattern.search(line)
-                    if match:
-                        part_number = int(match.group(1) or match.group(3))
-                        logged_parts.add(part_number)
-                        progress_percent = (len(logged_parts) / total_parts) * 100
-                        print(f"\rПрогресс: {len(logged_parts)}/{total_parts} ({progress_percent:.2f}%) завершено", end="")
+def format_progress(done_bytes, total_bytes, parts, total_parts, elapsed):
+    """Строка прогресса: объём, скорость и оставшееся время."""
+    rate = done_bytes / elapsed if elapsed > 0 else 0.0
+    line = f"\rПрогресс: {done_bytes / 1048576:.1f}"
+    if total_bytes:
+        line += f"/{total_bytes / 1048576:.1f} МБ ({done_bytes / total_bytes * 100:.2f}%)"
+    else:
+        # Поток неизвестной длины: только объём и скорость
+        line += " МБ"
+    line += f", {rate / 1048576:.1f} МБ/с"
+    if rate and total_bytes:
+        line += f", осталось {format_duration((total_bytes - done_bytes) / rate)}"
+    if total_parts:
+        line += f", части {parts}/{total_parts}"
+    else:
+        line += f", части {parts}"
+    return line
 
-                    # Парсинг финальных строк для вывода сообщения и пути
-                    log_match = log_pattern.search(line)
-                    if log_match:
-                        message = log_match.group('message').strip()
-                        path = log_match.group('path').strip()
-                        final_lines.append(f"Message: {message}\nPath: {path}")
 
-                    # Проверка завершения задачи по фразам в логе
-                    if "восстановление завершено" in line.lower() or "разделение завершено" in line.lower():
-                        completed = True
-                        #print("\n\nПроверка завершения задачи.")
-                        log_success("Задача завершена успешно.")
-                        break
+def track_events(stream):
+    """
+    Отслеживает прогресс по событиям JSON из канала процесса (см. ProgressEmitter).
+
+    Каждое событие читается один раз по мере поступления — без опроса и повторного
+    чтения лога. Завершается, когда процесс закрывает канал.
 
-            # Завершение при достижении 100%
-            if total_parts and len(logged_parts) >= total_parts:
-                completed = True
-                print("\nЗадача завершена 100%")
-                log_success("Задача завершена успешно.")
-                break
+    :return: Последнее событие done или None, если процесс завершился без него.
+    """
+    started = False
+    total_bytes = 0
+    total_parts = None
+    done_bytes = 0
+    parts = 0
+    start_time = time.monotonic()
+    last_print = 0.0
+    finished = None
 
-            # Задержка для обновления
-            time.sleep(0.3)
+    for line in stream:
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        kind = event.get("event")
+        if kind == "start":
+            started = True
+            total_bytes = event.get("total_bytes") or 0
+            total_parts = event.get("total_parts")
+            start_time = time.monotonic()
+        elif kind == "part":
+            parts += 1
+            done_bytes = event.get("bytes", done_bytes)
+            now = time.monotonic()
+            if now - last_print >= REFRESH_INTERVAL:
+                print(format_progress(done_bytes, total_bytes, parts, total_parts, now - start_time), end="", flush=True)
+                last_print = now
+        elif kind == "done":
+            finished = event
 
-        except FileNotFoundError:
-            log_error(f"Лог-файл {log_file} не найден.")
-            time.sleep(0.5)
+    elapsed = time.monotonic() - start_time
+    if started:
+        print(format_progress(done_bytes, total_bytes, parts, total_parts, elapsed))
+    if finished is not None:
+        print(f"Задача завершена за {format_duration(elapsed)}")
+        log_success("Задача завершена успешно.")
+    else:
+        print("Задача завершилась с ошибкой, подробности в логе.")
+        log_error("Процесс завершился без события завершения задачи.")
+    return finished
 
-    # Вывод финальных строк
-    if final_lines:
-        print("\nФинальные сообщения:")
-        for line in final_lines:
-            print(line)
-## 100% рабочий код 57754
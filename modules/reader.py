@@ -0,0 +1,171 @@
+# reader.py
+import bisect
+import io
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.codec import DECODE_ERRORS, iter_decode
+from modules.manifest import load_manifest, locate_manifest, new_hasher
+from modules.pack import part_location
+
+# Объём кэша декодированных кусков по умолчанию
+CACHE_BYTES = 64 * 1024 * 1024
+
+
+class PartReader(io.RawIOBase):
+    """
+    Файл только для чтения поверх разбитого файла: read/readinto/seek без сборки.
+
+    Смещение переводится в номер части по манифесту (для фиксированных частей —
+    делением на chunk_size, для cdc — двоичным поиском), декодируются только нужные
+    части. Декодированные куски хранятся в LRU-кэше размером до cache_bytes; при
+    последовательном чтении следующие read_ahead частей декодируются заранее в фоне.
+
+        with open_parts('output/yourfile/') as f:
+            f.seek(-128, os.SEEK_END)
+            tail = f.read()
+    """
+
+    def __init__(self, path, cache_bytes=CACHE_BYTES, read_ahead=1, verify=True, parts_dir=None):
+        """
+        :param path: Манифест, JSON-метаданные separator-silence.py или папка частей separator.py.
+        :param verify: Сверять хэш каждого декодированного куска с манифестом.
+        :param parts_dir: Папка с частями, если она отличается от стандартной.
+        """
+        super().__init__()
+        manifest_path, default_parts_dir = locate_manifest(path)
+        self.manifest = load_manifest(manifest_path)
+        self.parts_dir = parts_dir or default_parts_dir
+        self.entries = self.manifest["parts"]
+        self.offsets = [entry["offset"] for entry in self.entries]
+        self.size = self.manifest["original_size"]
+        # Серия из повтора байта (--sparse) занимает несколько кусков — тогда тоже двоичный поиск
+        self.fixed = self.manifest.get("chunking") != "cdc" and not any("fill" in entry for entry in self.entries)
+        self.cache_bytes = cache_bytes
+        self.read_ahead = read_ahead
+        self.verify = verify
+        self.position = 0
+        self.cache = OrderedDict()
+        self.cached_bytes = 0
+        self.prefetched = {}
+        self.last_part = None
+        self.executor = ThreadPoolExecutor(1) if read_ahead else None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            position = offset
+        elif whence == os.SEEK_CUR:
+            position = self.position + offset
+        elif whence == os.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Некорректный whence: {whence}")
+        if position < 0:
+            raise ValueError(f"Отрицательная позиция: {position}")
+        self.position = position
+        return position
+
+    def find_part(self, position):
+        """Порядковый номер (с нуля) записи манифеста, содержащей байт position."""
+        if self.fixed:
+            return position // self.manifest["chunk_size"]
+        return bisect.bisect_right(self.offsets, position) - 1
+
+    def decode_part(self, number):
+        """Декодирует часть целиком (выполняется и в фоновом потоке)."""
+        entry = self.entries[number]
+        part_path, part_range = part_location(self.parts_dir, entry)
+        start, length = part_range or (0, None)
+        chunk = bytearray()
+        with open(part_path, 'rb') as part_file:
+            part_file.seek(start)
+            try:
+                for block in iter_decode(part_file, self.manifest["encoding"], self.manifest.get("compression"), length):
+                    chunk += block
+            except DECODE_ERRORS as e:
+                raise ValueError(f"Часть {entry['index']} повреждена: {e}") from e
+        if self.verify:
+            chunk_hash = new_hasher()
+            chunk_hash.update(chunk)
+            if chunk_hash.hexdigest() != entry["chunk_sha256"]:
+                raise ValueError(f"Часть {entry['index']} повреждена: хэш куска не совпадает с манифестом")
+        return bytes(chunk)
+
+    def chunk(self, number):
+        """Декодированный кусок из кэша, фоновой выборки или с диска."""
+        chunk = self.cache.get(number)
+        if chunk is not None:
+            self.cache.move_to_end(number)
+        else:
+            future = self.prefetched.pop(number, None)
+            chunk = future.result() if future is not None else self.decode_part(number)
+            self.cache[number] = chunk
+            self.cached_bytes += len(chunk)
+            # Вытеснение давно не читавшихся кусков; текущий остаётся всегда
+            while self.cached_bytes > self.cache_bytes and len(self.cache) > 1:
+                _, evicted = self.cache.popitem(last=False)
+                self.cached_bytes -= len(evicted)
+
+        # Последовательное чтение — следующие части декодируются заранее
+        if self.executor is not None and self.last_part in (number - 1, number):
+            for following in range(number + 1, min(number + 1 + self.read_ahead, len(self.entries))):
+                if "fill" in self.entries[following]:
+                    continue
+                if following not in self.cache and following not in self.prefetched:
+                    self.prefetched[following] = self.executor.submit(self.decode_part, following)
+        self.last_part = number
+        return chunk
+
+    def readinto(self, buffer):
+        """Заполняет buffer, переходя через границы частей; короче только в конце файла."""
+        view = memoryview(buffer).cast('B')
+        filled = 0
+        while filled < len(view) and self.position < self.size:
+            number = self.find_part(self.position)
+            entry = self.entries[number]
+            start = self.position - entry["offset"]
+            if "fill" in entry:
+                # Серия из повтора байта (--sparse) хранится в манифесте: байты выдаются
+                # без декодирования и кэша, сколько бы гигабайт ни занимала серия
+                count = min(len(view) - filled, entry["size"] - start)
+                view[filled:filled + count] = bytes((entry["fill"],)) * count
+            else:
+                chunk = self.chunk(number)
+                count = min(len(view) - filled, len(chunk) - start)
+                view[filled:filled + count] = memoryview(chunk)[start:start + count]
+            filled += count
+            self.position += count
+        return filled
+
+    def close(self):
+        if self.executor is not None:
+            for future in self.prefetched.values():
+                future.cancel()
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        self.prefetched.clear()
+        self.cache.clear()
+        self.cached_bytes = 0
+        super().close()
+
+
+def open_parts(path, buffering=io.DEFAULT_BUFFER_SIZE, **options):
+    """
+    Открывает разбитый файл для чтения (см. PartReader).
+
+    :param buffering: Размер буфера BufferedReader (0 — без буфера, сам PartReader).
+    """
+    reader = PartReader(path, **options)
+    if not buffering:
+        return reader
+    return io.BufferedReader(reader, buffering)
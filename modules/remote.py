@@ -0,0 +1,169 @@
+# remote.py
+import http.client
+import queue
+import time
+import urllib.parse
+
+from modules.parallel import ordered_map
+
+# Повторы загрузки части и начальная пауза между ними (удваивается)
+RETRIES = 3
+RETRY_DELAY = 0.5
+
+# Ответы, после которых загрузку стоит повторить
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class ConnectionPool:
+    """
+    Пул постоянных (keep-alive) HTTP-соединений к одному серверу.
+
+    Соединение берётся из пула на время запроса и возвращается после чтения
+    ответа, поэтому TCP и TLS устанавливаются один раз на соединение, а не на
+    каждую часть. Если сервер закрыл соединение, http.client откроет его заново
+    при следующем запросе; соединение с ошибкой закрывается и не возвращается.
+    """
+
+    def __init__(self, scheme, netloc, timeout=30):
+        self.connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        self.netloc = netloc
+        self.timeout = timeout
+        self.idle = queue.SimpleQueue()
+        self.opened = 0
+
+    def get(self, path, headers=None):
+        """
+        GET path одним из соединений пула.
+
+        :return: (код ответа, тело ответа).
+        :raises OSError, http.client.HTTPException: Сетевая ошибка (соединение закрыто).
+        """
+        try:
+            connection = self.idle.get_nowait()
+        except queue.Empty:
+            connection = self.connection_class(self.netloc, timeout=self.timeout)
+            self.opened += 1
+        try:
+            connection.request('GET', path, headers=headers or {})
+            response = connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            raise
+        self.idle.put(connection)
+        return response.status, body
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class HttpPartSource:
+    """
+    Источник частей для сборки по HTTP: часть загружается по шаблону URL.
+
+    В шаблоне подставляются {name} — имя части из манифеста (с вложенной папкой
+    для больших разбиений) и {index} — её номер; шаблон без подстановок считается
+    адресом папки: http://host/parts → http://host/parts/{name}. Части контейнеров
+    (layout "pack") запрашиваются заголовком Range; сервер без поддержки Range
+    отдаёт контейнер целиком, и нужный диапазон вырезается из него.
+
+        with HttpPartSource("http://node:8000/parts/{name}", connections=8) as source:
+            for entry, data, error in source.fetch_parts(manifest["parts"]):
+                ...
+    """
+
+    def __init__(self, url_template, connections=8, timeout=30, retries=RETRIES, retry_delay=RETRY_DELAY):
+        if '{' not in url_template:
+            url_template = url_template.rstrip('/') + '/{name}'
+        self.url_template = url_template
+        self.connections = max(1, connections)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        scheme, netloc, _, _, _ = urllib.parse.urlsplit(url_template.format(name='', index=0))
+        if scheme not in ('http', 'https') or not netloc:
+            raise ValueError(f"Нужен шаблон URL вида http://host/parts/{{name}}: {url_template}")
+        self.pool = ConnectionPool(scheme, netloc, timeout)
+        self.retried = 0
+
+    def __repr__(self):
+        return self.url_template
+
+    def url(self, entry):
+        return self.url_template.format(name=urllib.parse.quote(entry["name"]), index=entry["index"])
+
+    def fetch(self, entry):
+        """
+        Загружает закодированную часть с повторами и растущей паузой.
+
+        :raises FileNotFoundError: Сервер ответил 404 (часть не повторяется).
+        :raises OSError: Часть не загрузилась за retries повторов.
+        """
+        url = self.url(entry)
+        split_url = urllib.parse.urlsplit(url)
+        path = split_url.path + (f"?{split_url.query}" if split_url.query else "")
+        headers = {}
+        part_range = None
+        if "pack_offset" in entry:
+            part_range = (entry["pack_offset"], entry["encoded_size"])
+            headers['Range'] = f"bytes={entry['pack_offset']}-{entry['pack_offset'] + entry['encoded_size'] - 1}"
+
+        for attempt in range(self.retries + 1):
+            try:
+                status, body = self.pool.get(path, headers)
+            except (OSError, http.client.HTTPException) as e:
+                error = f"{url}: {e}"
+            else:
+                if status in (404, 410):
+                    raise FileNotFoundError(f"{url}: {status}")
+                if status == 206 or (status == 200 and part_range is None):
+                    return body
+                if status == 200:
+                    start, length = part_range
+                    return body[start:start + length]
+                error = f"{url}: HTTP {status}"
+                if status not in RETRY_STATUSES:
+                    raise OSError(error)
+            if attempt < self.retries:
+                self.retried += 1
+                time.sleep(self.retry_delay * 2 ** attempt)
+        raise OSError(f"{error} (повторов: {self.retries})")
+
+    def fetch_or_error(self, entry):
+        if "fill" in entry:
+            # Кусок из повторённого байта (--sparse): части нет, загружать нечего
+            return b"", None
+        try:
+            return self.fetch(entry), None
+        except OSError as e:
+            return None, e
+
+    def fetch_parts(self, entries, max_in_flight=None):
+        """
+        Загружает части параллельно, по соединению на поток.
+
+        Одновременно загружается не больше max_in_flight частей (по умолчанию
+        2 * connections), поэтому в памяти ограниченное число закодированных частей.
+
+        :param entries: Записи манифеста частей (для кусков --sparse часть — пустая строка).
+        :return: Генератор (запись, часть или None, ошибка или None) в порядке записей.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        entries = list(entries)
+        tasks = ((position, (entry,)) for position, entry in enumerate(entries))
+        with ThreadPoolExecutor(max_workers=self.connections) as executor:
+            for position, (data, error) in ordered_map(self.fetch_or_error, tasks, self.connections,
+                                                       max_in_flight, executor):
+                yield entries[position], data, error
+
+    def close(self):
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,25 @@
+# scripts.py
+import importlib.util
+import os
+
+# Корень проекта: там лежат скрипты separator-silence.py, merge_parts.py и другие
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_scripts = {}
+
+
+def load_script(file_name):
+    """
+    Загружает скрипт проекта как модуль, один раз на процесс.
+
+    Имена с дефисом (например, separator-silence.py) обычным import не загрузить.
+    Скрипт импортируется только при первом обращении, поэтому его зависимости
+    (например, rich у separator.py) не замедляют запуск команд, которым он не нужен.
+    """
+    module = _scripts.get(file_name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(file_name[:-3].replace('-', '_'), os.path.join(BASE_DIR, file_name))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _scripts[file_name] = module
+    return module
@@ -0,0 +1,50 @@
+# shards.py
+import os
+
+# Частей в одной папке. Больше частей — и они раскладываются по вложенным папкам
+# parts/000/001/..., чтобы listdir и open не замедлялись на папках с миллионами файлов
+SHARD_SIZE = 1000
+
+# Ширина номера части для потока неизвестной длины: число частей заранее не известно,
+# и порядок имён совпадает с порядком частей до 999 999 частей (дальше номера длиннее)
+STREAM_NUMBER_WIDTH = 6
+
+
+def use_shards(part_count):
+    """Раскладывать ли части по вложенным папкам (выбирается по числу частей)."""
+    return part_count > SHARD_SIZE - 1
+
+
+def part_number_width(part_count):
+    """
+    Ширина номера части в имени файла: не меньше трёх цифр и одинаковая у всех
+    частей файла, поэтому сортировка имён совпадает с порядком частей.
+    """
+    return max(3, len(str(part_count)))
+
+
+def shard_dir(index, sharded):
+    """
+    Вложенная папка части с номером index (с единицы): '000/001' для частей 1001–2000.
+
+    Путь вычисляется по номеру, поэтому часть находится без просмотра папок.
+    Разделитель — '/', как в именах частей в манифесте.
+    """
+    if not sharded:
+        return ''
+    number = (index - 1) // SHARD_SIZE
+    return f"{number // SHARD_SIZE:03d}/{number % SHARD_SIZE:03d}"
+
+
+def shard_name(name, index, sharded):
+    """Имя части относительно папки частей (с вложенной папкой, если она есть)."""
+    directory = shard_dir(index, sharded)
+    return f"{directory}/{name}" if directory else name
+
+
+def create_shards(parts_dir, part_count):
+    """Создаёт все вложенные папки заранее — воркеры пишут части, не проверяя папок."""
+    if not use_shards(part_count):
+        return
+    for first_index in range(1, part_count + 1, SHARD_SIZE):
+        os.makedirs(os.path.join(parts_dir, shard_dir(first_index, True)), exist_ok=True)
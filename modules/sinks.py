@@ -0,0 +1,305 @@
+# sinks.py
+import asyncio
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from modules.api import merge
+from modules.codec import DECODE_WINDOW, read_windows
+
+# Повторы записи и чтения части в хранилище
+RETRIES = 3
+RETRY_DELAY = 0.5
+
+
+class DirectorySink:
+    """Хранилище частей в локальной папке (или на смонтированном диске)."""
+
+    def __init__(self, path, concurrency=4):
+        self.path = path
+        self.concurrency = concurrency
+        os.makedirs(path, exist_ok=True)
+
+    def __repr__(self):
+        return f"dir:{self.path}"
+
+    def _put(self, name, data):
+        path = os.path.join(self.path, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as part_file:
+            part_file.write(data)
+        os.replace(temp_path, path)
+
+    def _get(self, name):
+        with open(os.path.join(self.path, name), 'rb') as part_file:
+            return part_file.read()
+
+    async def put(self, name, data):
+        await asyncio.to_thread(self._put, name, data)
+
+    async def get(self, name):
+        return await asyncio.to_thread(self._get, name)
+
+
+class HttpSink:
+    """Хранилище частей по HTTP: PUT <base_url>/<имя> для записи, GET — для чтения."""
+
+    def __init__(self, base_url, concurrency=8, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    def __repr__(self):
+        return self.base_url
+
+    def _url(self, name):
+        return f"{self.base_url}/{urllib.parse.quote(name)}"
+
+    def _put(self, name, data):
+        request = urllib.request.Request(self._url(name), data=data, method='PUT',
+                                         headers={'Content-Type': 'application/octet-stream'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def _get(self, name):
+        try:
+            with urllib.request.urlopen(self._url(name), timeout=self.timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                raise FileNotFoundError(f"{self._url(name)}: 404") from e
+            raise
+
+    async def put(self, name, data):
+        await asyncio.to_thread(self._put, name, data)
+
+    async def get(self, name):
+        return await asyncio.to_thread(self._get, name)
+
+
+async def with_retries(operation, retries=RETRIES, retry_delay=RETRY_DELAY):
+    """
+    Выполняет корутину-фабрику operation с повторами и растущей паузой.
+    Отсутствующая часть (FileNotFoundError) не повторяется.
+
+    :return: (результат, число повторов).
+    """
+    for attempt in range(retries + 1):
+        try:
+            return await operation(), attempt
+        except FileNotFoundError:
+            raise
+        except (OSError, urllib.error.URLError):
+            if attempt == retries:
+                raise
+            await asyncio.sleep(retry_delay * 2 ** attempt)
+
+
+async def distribute(parts, sinks, name=None, max_pending=None, retries=RETRIES, retry_delay=RETRY_DELAY):
+    """
+    Раздаёт закодированные части во все хранилища одновременно.
+
+    У каждого хранилища своя очередь и sink.concurrency одновременных записей.
+    Очередь ограничена max_pending частями (по умолчанию 2 * concurrency): если
+    самое медленное хранилище не успевает, чтение следующей части из parts
+    приостанавливается, поэтому память ограничена, а общее время стремится
+    ко времени самого медленного хранилища, а не к сумме.
+
+    :param parts: Итерируемый набор (номер, часть), например Splitter из modules.api.
+                  Следующая часть запрашивается в отдельном потоке, не блокируя цикл событий.
+    :param name: Функция номер -> имя части в хранилище (по умолчанию part_N.txt, как у Splitter).
+    :return: Словарь {хранилище: {"parts", "bytes", "retries", "seconds"}}.
+    """
+    name = name or (lambda index: f"part_{index}.txt")
+    start_time = time.perf_counter()
+    stats = {sink: {"parts": 0, "bytes": 0, "retries": 0, "seconds": 0.0} for sink in sinks}
+    queues = {sink: asyncio.Queue(max_pending or 2 * sink.concurrency) for sink in sinks}
+
+    async def writer(sink):
+        queue = queues[sink]
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            index, data = item
+            _, attempts = await with_retries(lambda: sink.put(name(index), data), retries, retry_delay)
+            stats[sink]["parts"] += 1
+            stats[sink]["bytes"] += len(data)
+            stats[sink]["retries"] += attempts
+            stats[sink]["seconds"] = time.perf_counter() - start_time
+
+    async def producer(iterator):
+        while True:
+            item = await asyncio.to_thread(next, iterator, None)
+            if item is None:
+                break
+            for sink in sinks:
+                await queues[sink].put(item)
+        for sink in sinks:
+            for _ in range(sink.concurrency):
+                await queues[sink].put(None)
+
+    async with asyncio.TaskGroup() as group:
+        for sink in sinks:
+            for _ in range(sink.concurrency):
+                group.create_task(writer(sink))
+        group.create_task(producer(iter(parts)))
+    return stats
+
+
+async def gather_parts(manifest, sinks, read_ahead=8, retries=RETRIES, retry_delay=RETRY_DELAY):
+    """
+    Асинхронный генератор (номер, часть) по манифесту в порядке частей.
+
+    Одновременно запрашивается до read_ahead частей. Часть читается из первого
+    хранилища; если там её нет или оно недоступно, пробуются следующие.
+    """
+    async def fetch(entry):
+        errors = []
+        for sink in sinks:
+            try:
+                data, _ = await with_retries(lambda: sink.get(entry["name"]), retries, retry_delay)
+                return entry["index"], data
+            except (OSError, urllib.error.URLError) as e:
+                errors.append(f"{sink}: {e}")
+        raise OSError(f"Часть {entry['index']} недоступна ни в одном хранилище: {'; '.join(errors)}")
+
+    pending = []
+    entries = iter(manifest["parts"])
+    try:
+        for entry in entries:
+            pending.append(asyncio.create_task(fetch(entry)))
+            if len(pending) >= read_ahead:
+                yield await pending.pop(0)
+        while pending:
+            yield await pending.pop(0)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def merge_from_sinks(manifest, sinks, output, read_ahead=8):
+    """
+    Собирает файл из частей, хранящихся в sinks (см. gather_parts), с проверкой по манифесту.
+
+    Декодирование и запись идут в отдельном потоке, параллельно с загрузкой следующих частей.
+
+    :return: (размер восстановленных данных, MD5 в hex).
+    """
+    loop = asyncio.get_running_loop()
+    parts = gather_parts(manifest, sinks, read_ahead)
+
+    def iter_parts():
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(parts.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+
+    try:
+        return await asyncio.to_thread(merge, iter_parts(), output, manifest=manifest)
+    finally:
+        await parts.aclose()
+
+
+class PartStoreHandler(BaseHTTPRequestHandler):
+    """
+    HTTP-хранилище частей в папке server.directory: PUT записывает часть, GET отдаёт.
+
+    Соединения постоянные (HTTP/1.1), GET понимает заголовок Range вида
+    bytes=начало-конец — так читаются части из контейнеров .pack; диапазон
+    за концом файла — ответ 416.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def _path(self):
+        name = urllib.parse.unquote(self.path.lstrip('/'))
+        path = os.path.realpath(os.path.join(self.server.directory, name))
+        if not path.startswith(os.path.realpath(self.server.directory) + os.sep):
+            return None
+        return path
+
+    def do_PUT(self):
+        path = self._path()
+        if path is None:
+            self.send_error(403)
+            return
+        data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as part_file:
+            part_file.write(data)
+        self.send_response(201)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _range(self, size):
+        """
+        Разбирает заголовок Range (bytes=начало-конец или bytes=-длина_хвоста).
+
+        :return: (начало, длина) запрошенного диапазона; None — заголовка нет или
+                 он не разобран (отдаётся весь файл); (size, 0) — диапазон за концом файла.
+        """
+        byte_range = self.headers.get('Range', '')
+        if not byte_range.startswith('bytes=') or byte_range[6:].count('-') != 1:
+            return None
+        first, last = byte_range[6:].split('-')
+        if first.isdigit() and (last.isdigit() or not last):
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if last and int(last) < start:
+                return None
+        elif not first and last.isdigit():
+            start = max(size - int(last), 0)
+            end = size - 1 if int(last) else start - 1
+        else:
+            return None
+        if start >= size or end < start:
+            return size, 0
+        return start, end - start + 1
+
+    def do_GET(self):
+        path = self._path()
+        if path is None or not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        byte_range = self._range(size)
+        if byte_range == (size, 0):
+            # Диапазон целиком за концом файла: 416 с размером файла в Content-Range
+            self.send_response(416)
+            self.send_header('Content-Range', f"bytes */{size}")
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        start, length = byte_range or (0, size)
+        self.send_response(200 if byte_range is None else 206)
+        if byte_range is not None:
+            self.send_header('Content-Range', f"bytes {start}-{start + length - 1}/{size}")
+        self.send_header('Content-Length', str(length))
+        self.end_headers()
+        # Отдаётся только запрошенный диапазон окнами, без чтения всего контейнера в память
+        with open(path, 'rb') as part_file:
+            part_file.seek(start)
+            for window in read_windows(part_file, DECODE_WINDOW, length):
+                self.wfile.write(window)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_parts(directory, host='127.0.0.1', port=0):
+    """
+    Локальное HTTP-хранилище частей (для проверки HttpSink и сборки по --parts-url
+    без внешнего сервера).
+
+    :return: ThreadingHTTPServer; адрес — server.server_address, запуск — serve_forever().
+    """
+    os.makedirs(directory, exist_ok=True)
+    server = ThreadingHTTPServer((host, port), PartStoreHandler)
+    server.directory = directory
+    return server
@@ -0,0 +1,170 @@
+# sparse.py
+import errno
+import os
+
+from modules.codec import DECODE_WINDOW, read_windows
+from modules.manifest import new_hasher, part_entry
+
+# Пробная выборка в начале куска: кусок с данными отсеивается по ней, не дочитывая окно
+PROBE_SIZE = 4096
+
+# Хэш закодированной части, которой нет на диске (пустая строка)
+EMPTY_DIGEST = new_hasher().hexdigest()
+
+# Образцы из повторённого байта и хэши кусков из них — по байту и (байту, длине)
+_patterns = {}
+_digests = {}
+
+
+def pattern(fill):
+    """Окно DECODE_WINDOW из повторённого байта fill (создаётся один раз на байт)."""
+    window = _patterns.get(fill)
+    if window is None:
+        window = _patterns[fill] = bytes((fill,)) * DECODE_WINDOW
+    return window
+
+
+def window_fill(window):
+    """
+    Байт, которым целиком заполнен window (bytes или memoryview), или None.
+
+    Окно сравнивается с образцом pattern() через bytes.startswith: он принимает
+    memoryview и сравнивает memcmp без копирования — десятки ГБ/с, тогда как
+    сравнение memoryview идёт поэлементно. Данные обычно отсеиваются уже по
+    первым PROBE_SIZE байтам.
+    """
+    if not len(window):
+        return None
+    fill = window[0]
+    expected = pattern(fill)
+    if not expected.startswith(window[:PROBE_SIZE]):
+        return None
+    for start in range(0, len(window), DECODE_WINDOW):
+        if not expected.startswith(window[start:start + DECODE_WINDOW]):
+            return None
+    return fill
+
+
+def in_hole(path, offset, length):
+    """
+    True, если диапазон файла целиком приходится на дыру разреженного файла
+    (SEEK_DATA не находит в нём данных) — его можно не читать: там нули.
+
+    Файл открывается отдельным дескриптором, чтобы lseek не сдвинул позицию
+    уже открытого буферизованного потока. Без SEEK_DATA (Windows, macOS до
+    поддержки в Python) и на файловых системах без дыр — всегда False.
+    """
+    if not length or not hasattr(os, 'SEEK_DATA'):
+        return False
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        data = os.lseek(fd, offset, os.SEEK_DATA)
+    except OSError as e:
+        # ENXIO — после offset данных до конца файла нет
+        return e.errno == errno.ENXIO
+    finally:
+        os.close(fd)
+    return data >= offset + length
+
+
+class Replay:
+    """
+    Поток для кодирования куска, начало которого уже прочитано при поиске
+    повтора: count байтов fill, затем head и дальше src.
+    """
+
+    def __init__(self, fill, count, head, src):
+        self.fill = fill
+        self.count = count
+        self.head = memoryview(head)
+        self.src = src
+
+    def readinto(self, buffer):
+        if self.count:
+            size = min(len(buffer), self.count, DECODE_WINDOW)
+            buffer[:size] = memoryview(pattern(self.fill))[:size]
+            self.count -= size
+            return size
+        if self.head:
+            size = min(len(buffer), len(self.head))
+            buffer[:size] = self.head[:size]
+            self.head = self.head[size:]
+            return size
+        return self.src.readinto(buffer)
+
+
+def chunk_run(src, offset, length, path=None):
+    """
+    Проверяет перед кодированием, заполнен ли кусок одним повторённым байтом.
+
+    :param src: memoryview на кусок (mmap), файл на позиции offset или поток (stdin).
+    :param path: Путь к входному файлу: дыра (in_hole) определяется без чтения.
+    :return: (байт, длина куска, None) — кусок из повтора прочитан или пропущен
+             (длина последнего куска потока известна только после чтения);
+             (None, length, источник) — кусок с данными, источник выдаёт его с начала.
+    """
+    if isinstance(src, memoryview):
+        fill = window_fill(src)
+        return fill, length, None if fill is not None else src
+    if path is not None and in_hole(path, offset, length):
+        src.seek(offset + length)
+        return 0, length, None
+
+    probe = src.read(min(PROBE_SIZE, length))
+    fill = window_fill(probe)
+    if fill is None:
+        return None, length, Replay(0, 0, probe, src)
+    count = len(probe)
+    for window in read_windows(src, DECODE_WINDOW, length - count):
+        if window_fill(window) != fill:
+            # Повтор оборвался: прочитанное возвращается в начало источника
+            return None, length, Replay(fill, count, bytes(window), src)
+        count += len(window)
+    return fill, count, None
+
+
+def hash_run(fill, length, hashers):
+    """Обновляет hashers length байтами fill, не читая их с диска."""
+    window = memoryview(pattern(fill))
+    for start in range(0, length, DECODE_WINDOW):
+        block = window[:min(DECODE_WINDOW, length - start)]
+        for hasher in hashers:
+            hasher.update(block)
+
+
+def run_digest(fill, length):
+    """Хэш length байтов fill (запоминается: серии обычно одной длины, например весь нулевой хвост)."""
+    digest = _digests.get((fill, length))
+    if digest is None:
+        hasher = new_hasher()
+        hash_run(fill, length, (hasher,))
+        digest = _digests[(fill, length)] = hasher.hexdigest()
+    return digest
+
+
+def run_entry(index, offset, size, fill):
+    """
+    Запись манифеста о серии подряд идущих кусков из повторённого байта: одна
+    запись {offset, size, fill} на всю серию, index — номер её первого куска.
+    Частей на диске нет (name None, закодированный размер 0). Хэш — настоящий
+    хэш всех байтов серии, поэтому лист дерева Меркла считается как обычно.
+    """
+    entry = part_entry(index, None, offset, size, 0, run_digest(fill, size), EMPTY_DIGEST)
+    entry["fill"] = fill
+    return entry
+
+
+def write_run(output_file, size, fill, hole=True):
+    """
+    Восстанавливает серию из повторённого байта с текущей позиции output_file.
+
+    Нулевая серия при hole=True не пишется: позиция сдвигается за неё одним seek, и в файле
+    остаётся дыра (размер файла после последней дыры выставляет truncate).
+    Остальные серии и вывод в поток (hole=False) пишутся окнами образца.
+    """
+    if hole and fill == 0:
+        output_file.seek(size, os.SEEK_CUR)
+        return
+    window = memoryview(pattern(fill))
+    for start in range(0, size, DECODE_WINDOW):
+        output_file.write(window[:min(DECODE_WINDOW, size - start)])
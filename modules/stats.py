@@ -0,0 +1,200 @@
+# stats.py
+import json
+import os
+import time
+
+try:
+    import resource
+except ImportError:
+    # Модуля нет в Windows — пиковая память тогда не сообщается
+    resource = None
+
+# Стадии разбиения, для которых копятся время, объём и число вызовов
+STAGES = ('read', 'hash', 'compress', 'encode', 'write', 'fsync')
+
+MB = 1024 * 1024
+
+
+class StageStats:
+    """
+    Счётчики и таймеры стадий разбиения: суммарное время, байты и число вызовов.
+
+    Замер — один вызов perf_counter на стадию окна (768 КБ) или части, без строки
+    лога на каждую часть. Воркеры возвращают свои счётчики словарём (as_dict),
+    родитель складывает их через update().
+
+        stats = StageStats()
+        start = stats.now()
+        data = f.read(size)
+        start = stats.lap('read', start, len(data))
+    """
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.bytes = dict.fromkeys(STAGES, 0)
+        self.calls = dict.fromkeys(STAGES, 0)
+
+    def now(self):
+        return time.perf_counter()
+
+    def lap(self, stage, start, size=0):
+        """Относит время от start к стадии и возвращает текущий момент — начало следующей стадии."""
+        now = time.perf_counter()
+        self.seconds[stage] += now - start
+        self.bytes[stage] += size
+        self.calls[stage] += 1
+        return now
+
+    def as_dict(self):
+        return {stage: {"seconds": self.seconds[stage], "bytes": self.bytes[stage], "calls": self.calls[stage]}
+                for stage in STAGES}
+
+    def update(self, counters):
+        """Добавляет счётчики из as_dict() (например, от воркера)."""
+        for stage, values in counters.items():
+            self.seconds[stage] += values["seconds"]
+            self.bytes[stage] += values["bytes"]
+            self.calls[stage] += values["calls"]
+
+    def report(self, wall_seconds, input_bytes, parts, workers=1):
+        """
+        Сводный отчёт: стадии, пропускная способность и пиковая память.
+
+        При workers > 1 время стадий суммируется по воркерам и может превышать общее время.
+        """
+        stages = {}
+        for stage in STAGES:
+            seconds = self.seconds[stage]
+            stages[stage] = {
+                "seconds": round(seconds, 6),
+                "bytes": self.bytes[stage],
+                "calls": self.calls[stage],
+                "mb_s": round(self.bytes[stage] / MB / seconds, 2) if seconds else None,
+            }
+        self_rss, children_rss = peak_rss()
+        return {
+            "wall_seconds": round(wall_seconds, 6),
+            "input_bytes": input_bytes,
+            "parts": parts,
+            "workers": workers,
+            "throughput_mb_s": round(input_bytes / MB / wall_seconds, 2) if wall_seconds else None,
+            "peak_rss_mb": self_rss,
+            "peak_rss_children_mb": children_rss,
+            "stages": stages,
+        }
+
+
+def peak_rss():
+    """Пиковый RSS процесса и самого крупного из дождавшихся его воркеров в МБ (None, если неизвестен)."""
+    if resource is None:
+        return None, None
+    # ru_maxrss в Linux — в КБ
+    return (round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1))
+
+
+def prometheus_text(report, labels=None):
+    """Отчёт report() в текстовом формате Prometheus (для node_exporter textfile и т. п.)."""
+    label_text = ",".join(f'{key}="{value}"' for key, value in (labels or {}).items())
+
+    def metric_labels(**extra):
+        pairs = [label_text] if label_text else []
+        pairs += [f'{key}="{value}"' for key, value in extra.items()]
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    lines = []
+    for name, kind, help_text, field in (
+            ("separator_stage_seconds_total", "counter", "Время стадии, с", "seconds"),
+            ("separator_stage_bytes_total", "counter", "Байтов обработано стадией", "bytes"),
+            ("separator_stage_calls_total", "counter", "Вызовов стадии", "calls")):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        lines += [f"{name}{metric_labels(stage=stage)} {values[field]}" for stage, values in report["stages"].items()]
+    for name, help_text, value in (
+            ("separator_wall_seconds", "Общее время, с", report["wall_seconds"]),
+            ("separator_input_bytes", "Размер исходного файла, байт", report["input_bytes"]),
+            ("separator_parts", "Число частей", report["parts"]),
+            ("separator_throughput_bytes_per_second", "Пропускная способность, байт/с",
+             round(report["input_bytes"] / report["wall_seconds"]) if report["wall_seconds"] else 0),
+            ("separator_peak_rss_bytes", "Пиковый RSS процесса, байт",
+             round((report["peak_rss_mb"] or 0) * MB))):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name}{metric_labels()} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def save_report(report, path, labels=None):
+    """Сохраняет отчёт: файл .prom — в формате Prometheus, остальные — в JSON."""
+    with open(path, 'w') as report_out:
+        if path.endswith('.prom'):
+            report_out.write(prometheus_text(report, labels))
+        else:
+            json.dump(report, report_out, indent=2)
+
+
+class Profiler:
+    """
+    Профилирование запуска через cProfile и tracemalloc (--profile).
+
+    Замедляет работу в разы, поэтому включается только явно; cProfile и tracemalloc
+    импортируются лишь при включении. При workers > 1 профилируется только родитель.
+
+        with Profiler() as profiler:
+            metadata_file = split_file(input_file, output_dir, options)
+        profiler.save(os.path.splitext(metadata_file)[0])
+    """
+
+    def __init__(self, top=30):
+        self.top = top
+        self.profile = None
+        self.snapshot = None
+        self.peak_traced = 0
+
+    def __enter__(self):
+        import cProfile
+        import tracemalloc
+        tracemalloc.start()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        import tracemalloc
+        self.profile.disable()
+        self.snapshot = tracemalloc.take_snapshot()
+        self.peak_traced = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    def save(self, base_path):
+        """
+        Сохраняет <base_path>.profile.prof (для pstats и snakeviz) и <base_path>.profile.txt
+        (самые долгие функции и места наибольших выделений памяти).
+
+        :return: Пути к двум файлам.
+        """
+        import io
+        import pstats
+        prof_path = f"{base_path}.profile.prof"
+        text_path = f"{base_path}.profile.txt"
+        self.profile.dump_stats(prof_path)
+        listing = io.StringIO()
+        pstats.Stats(self.profile, stream=listing).sort_stats('cumulative').print_stats(self.top)
+        with open(text_path, 'w') as text_out:
+            text_out.write(listing.getvalue())
+            text_out.write(f"\nПик памяти под наблюдением tracemalloc: {self.peak_traced / MB:.1f} МБ\n")
+            text_out.write(f"Наибольшие выделения памяти (top {self.top}):\n")
+            for statistic in self.snapshot.statistics('lineno')[:self.top]:
+                text_out.write(f"{statistic}\n")
+        return prof_path, text_path
+
+
+def profile_call(function):
+    """
+    Выполняет function() под Profiler и сохраняет профиль рядом с JSON-метаданными,
+    путь к которым она вернула (<метаданные без .json>.profile.prof и .profile.txt).
+
+    :return: Результат function() (при None профиль не сохраняется).
+    """
+    with Profiler() as profiler:
+        result = function()
+    if result is not None:
+        profiler.save(os.path.splitext(result)[0])
+    return result
@@ -1,12 +1,12 @@
 # prompt_toolkit_menu.py
 import subprocess
 import logging
-import time
 import os
 from prompt_toolkit import prompt
 from prompt_toolkit.shortcuts import checkboxlist_dialog, message_dialog
-from prompt_toolkit.completion import PathCompleter, WordCompleter
-from modules.progress_tracker import track_progress
+from prompt_toolkit.completion import PathCompleter, WordCompleter, merge_completers
+from modules.catalog import CATALOG_ERRORS, Catalog, find_catalog
+from modules.progress_tracker import track_events
 from modules.gpt_logger import setup_logger, log_start_process, log_end_process, log_file_info, log_success, log_error
 
 # Создаем директорию logs, если она не существует
@@ -28,19 +28,15 @@ def run_process(command, log_file):
     clear_log(log_file)
     logging.debug(f"Запущен процесс: {' '.join(command)}")
 
-    # Запуск процесса
-    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Процесс пишет события прогресса в канал — отслеживание начинается сразу,
+    # без ожидания лог-файла и без его повторного чтения
+    read_fd, write_fd = os.pipe()
+    process = subprocess.Popen(command + ['--progress-fd', str(write_fd)],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, pass_fds=(write_fd,))
+    os.close(write_fd)
 
-    # Ожидание появления нового лог-файла
-    wait_time = 2
-    while not os.path.exists(log_file):
-        logging.warning(f"Ожидание создания лог-файла: {log_file}")
-        time.sleep(0.5)
-
-    logging.debug(f"Лог-файл {log_file} найден, начинается отслеживание прогресса.")
-    time.sleep(wait_time)
-    
-    track_progress(log_file)
+    with os.fdopen(read_fd, 'r') as events:
+        track_events(events)
 
     process.communicate()
     logging.debug("Процесс завершен.")
@@ -63,7 +59,7 @@ def split_file():
 
     file_completer = PathCompleter()
     file_path = prompt("Введите путь к файлу для разрезания (используйте Tab): ", completer=file_completer, default="input/")
-    chunk_size = prompt("Введите размер куска (в КБ, по умолчанию 200): ", default="200")
+    chunk_size = prompt("Введите размер куска (в КБ или auto, по умолчанию 200): ", default="200")
     encoding_completer = WordCompleter(['hex', 'base64', 'base85'], ignore_case=True)
     encoding = prompt("Выберите кодирование (hex, base64, base85): ", completer=encoding_completer, default="base64")
 
@@ -73,6 +69,23 @@ def split_file():
     command = ['python3', '-u', 'separator-silence.py', '--input', file_path, '--output', 'output/', '--chunk-size', chunk_size, '--encoding', encoding]
     run_process(command, log_file)
 
+def catalog_completer():
+    """Подсказки JSON-метаданных из каталога output/catalog.sqlite3 по любой части пути или имени файла."""
+    catalog_path = find_catalog("output", create=False)
+    if catalog_path is None:
+        return None
+    try:
+        with Catalog(catalog_path) as catalog:
+            metadata = {
+                os.path.relpath(catalog.absolute(split_set["metadata_path"])):
+                    f"{split_set['file_name']}, {split_set['original_size']} байт, {split_set['created_at']}"
+                for split_set in catalog.find() if not split_set["metadata_path"].endswith("manifest.json")
+            }
+    except CATALOG_ERRORS as e:
+        logging.warning(f"Каталог недоступен: {e}")
+        return None
+    return WordCompleter(list(metadata), meta_dict=metadata, sentence=True, match_middle=True)
+
 def merge_file():
     """Команда для восстановления файла из частей."""
     print("\n*** Справка по навигации для выбора JSON файла ***")
@@ -81,7 +94,12 @@ def merge_file():
     print("• После выбора файла нажмите [Enter].\n")
     print("• Нажмите [Ctrl+C] для выхода в любой момент.\n")
 
+    print("• Наборы из каталога подсказываются по имени исходного файла.\n")
+
     file_completer = PathCompleter()
+    known_sets = catalog_completer()
+    if known_sets is not None:
+        file_completer = merge_completers([known_sets, file_completer])
     metadata_path = prompt("Введите путь к файлу с метаданными (JSON): ", completer=file_completer, default="output/")
     
     output_completer = PathCompleter()
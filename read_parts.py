@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# read_parts.py
+# Описание: Чтение диапазона байтов разбитого файла без сборки (декодируются только нужные части)
+import argparse
+import sys
+from modules.reader import CACHE_BYTES, open_parts
+
+
+def read_range(path, output, offset=0, length=None, parts_dir=None, cache_mb=None):
+    """
+    Копирует length байтов с позиции offset разбитого файла в output.
+
+    :param path: Манифест, JSON-метаданные separator-silence.py или папка частей separator.py.
+    :param output: Бинарный файловый объект для записи.
+    :param length: Сколько байтов прочитать (None — до конца файла).
+    :return: Число скопированных байтов.
+    """
+    cache_bytes = cache_mb * 1024 * 1024 if cache_mb else CACHE_BYTES
+    copied = 0
+    with open_parts(path, parts_dir=parts_dir, cache_bytes=cache_bytes) as source:
+        source.seek(offset)
+        while length is None or copied < length:
+            want = 1024 * 1024 if length is None else min(1024 * 1024, length - copied)
+            block = source.read(want)
+            if not block:
+                break
+            output.write(block)
+            copied += len(block)
+    return copied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Чтение диапазона байтов разбитого файла без сборки")
+    parser.add_argument('--manifest', required=True, help='Путь к манифесту, JSON-метаданным или папке частей')
+    parser.add_argument('--parts-dir', default=None, help='Папка с частями (по умолчанию определяется по манифесту)')
+    parser.add_argument('--offset', type=int, default=0, help='Смещение первого байта')
+    parser.add_argument('--length', type=int, default=None, help='Сколько байтов прочитать (по умолчанию до конца)')
+    parser.add_argument('--output', default=None, help='Файл для записи (по умолчанию стандартный вывод)')
+    parser.add_argument('--cache-size', type=int, default=None, help='Размер кэша декодированных кусков в МБ (по умолчанию 64)')
+
+    args = parser.parse_args()
+
+    try:
+        if args.output:
+            with open(args.output, 'wb') as output_file:
+                read_range(args.manifest, output_file, args.offset, args.length, args.parts_dir, args.cache_size)
+        else:
+            read_range(args.manifest, sys.stdout.buffer, args.offset, args.length, args.parts_dir, args.cache_size)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        sys.exit(2)
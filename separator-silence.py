@@ -1,11 +1,26 @@
 # separator-silence.py
 import os
+import sys
 import hashlib
 import argparse
-import json
 import time
-import base64
 import logging
+from contextlib import nullcontext
+from functools import partial
+from modules.codec import DECODE_WINDOW, NULL_STATS, encode_chunk, encode_stream, read_windows, sync_file
+from modules.cdc import chunk_bounds, dedup_ratio, store_directory, store_split
+from modules.compression import choose_compression
+from modules.journal import JournalWriter, load_journal, remove_temp_files, replace_json, temp_path
+from modules.manifest import build_manifest, new_hasher, part_entry, save_manifest
+from modules.mapped import MappedInput
+from modules.options import SplitOptions
+from modules.pack import PACK_SIZE, PackWriter
+from modules.planner import chunk_size_arg, choose_chunk_size
+from modules.parity import write_parity
+from modules.sparse import chunk_run, hash_run, run_entry
+from modules.shards import SHARD_SIZE, STREAM_NUMBER_WIDTH, create_shards, part_number_width, shard_name, use_shards
+from modules.progress_events import ProgressEmitter
+from modules.parallel import chunk_ranges, default_workers, hashing_jobs, parallel_split, stream_ranges, verify_parts, workers_arg
 
 # Очищаем лог перед началом записи
 with open("logs/separator-silence.log", "w") as f:
@@ -16,80 +31,492 @@ logging.basicConfig(filename="logs/separator-silence.log", level=logging.INFO,
                     format="%(asctime)s - %(levelname)s - %(message)s")
 logging.info("===========separator-silence.py начал===========log %s==========", time.strftime('%Y-%m-%d %H:%M:%S'))
 
-def split_file(input_file, output_dir, chunk_size_kb, encoding):
-    """Функция для разрезания файла на части."""
+class SplitParts:
+    """
+    Части одного разбиения: имена и пути по номеру, контейнеры (layout "pack"),
+    журнал готовых частей и записи манифеста в порядке готовности.
+
+    done — части, готовые по журналу при продолжении: они сразу попадают в записи
+    и не кодируются заново. Подряд идущие куски из одного повторённого байта
+    сливаются в одну серию (одна запись манифеста на серию).
+    """
+
+    def __init__(self, parts_dir, base_name, name_width, sharded, progress, packer=None, journal=None, done=None):
+        self.parts_dir = parts_dir
+        self.base_name = base_name
+        self.name_width = name_width
+        self.sharded = sharded
+        self.progress = progress
+        self.packer = packer
+        self.journal = journal
+        self.done = done or {}
+        self.entries = [self.done[index] for index in sorted(self.done)]
+        self.encoded_size = sum(entry["encoded_size"] for entry in self.entries)
+        # Незакрытая серия кусков из повтора байта: [номер первого куска, смещение, длина, байт]
+        self.run = None
+
+    def part_name(self, part_number):
+        # Номера одной ширины: порядок имён совпадает с порядком частей и после 999
+        return shard_name(f"{self.base_name}_part_{part_number:0{self.name_width}d}.txt", part_number, self.sharded)
+
+    def part_path(self, part_number):
+        return os.path.join(self.parts_dir, self.part_name(part_number))
+
+    def add(self, entry):
+        """Записывает готовую часть в манифест и журнал (серии повтора не журналируются — их дёшево найти заново)."""
+        if self.run is not None and entry["offset"] >= self.run[1] + self.run[2]:
+            # Кусок за концом серии: продлить её уже нечем
+            self.close_run()
+        self.entries.append(entry)
+        if self.journal is not None and "fill" not in entry:
+            self.journal.record(entry)
+        self.encoded_size += entry["encoded_size"]
+        if "fill" in entry:
+            logging.debug("Части %d и далее — повтор байта %d на %d байт, не записаны",
+                          entry["index"], entry["fill"], entry["size"])
+        else:
+            logging.debug("Часть %d сохранена", entry["index"])
+        self.progress.part(entry["index"], entry["offset"] + entry["size"])
+
+    def add_run(self, part_number, offset, length, fill):
+        """Кусок из одного повторённого байта: часть не пишется, кусок продлевает серию или начинает новую."""
+        run = self.run
+        if run is not None and run[1] + run[2] == offset and run[3] == fill:
+            run[2] += length
+            return
+        self.close_run()
+        self.run = [part_number, offset, length, fill]
+
+    def close_run(self):
+        """Серия из повтора байта уходит в манифест одной записью {offset, size, fill}."""
+        if self.run is not None:
+            run, self.run = self.run, None
+            self.add(run_entry(*run))
+
+    def data_jobs(self, jobs):
+        """Задания с проверенным байтом повтора: куски из повтора записываются сразу, остальные идут воркерам."""
+        for index, offset, length, path, fill in jobs:
+            if fill is None:
+                yield index, offset, length, path
+            elif index not in self.done:
+                self.add_run(index, offset, length, fill)
+
+
+def encode_cdc(parts, source, store_dir, encoding, chunk_size, min_chunk_kb, max_chunk_kb, hasher, workers,
+               max_in_flight, compression, compression_level, executor):
+    """
+    Кодирует куски переменной длины (chunking="cdc") в общее хранилище store_dir:
+    куски, уже лежащие там, не кодируются и не пишутся повторно.
+
+    :param source: Путь к файлу или поток (stdin).
+    :return: (объём впервые записанных кусков, объём, сэкономленный дедупликацией).
+    """
+    min_size, avg_size, max_size = chunk_bounds(
+        chunk_size, min_chunk_kb and min_chunk_kb * 1024, max_chunk_kb and max_chunk_kb * 1024)
+    stored_bytes = saved_bytes = 0
+    for entry, is_new in store_split(source, store_dir, encoding, min_size, avg_size, max_size, (hasher,), workers,
+                                     max_in_flight, compression, compression_level, executor):
+        parts.add(entry)
+        if is_new:
+            stored_bytes += entry["size"]
+        else:
+            saved_bytes += entry["size"]
+    return stored_bytes, saved_bytes
+
+
+def encode_parallel(parts, input_file, file_size, chunk_size, encoding, hasher, workers, max_in_flight,
+                    compression, compression_level, executor, read_mode, fsync, stats, sparse):
+    """
+    Кодирует фиксированные куски в пуле процессов: каждый воркер сам читает свой
+    диапазон байтов и записывает часть, а родитель по порядку хэширует куски в
+    общую контрольную сумму hasher (и при sparse отсеивает куски из повтора байта).
+    """
+    jobs = (
+        (index, offset, length, parts.part_path(index))
+        for index, offset, length in chunk_ranges(file_size, chunk_size)
+    )
+    jobs = hashing_jobs(input_file, jobs, hasher, read_mode, stats, sparse)
+    if sparse:
+        jobs = parts.data_jobs(jobs)
+    jobs = (job for job in jobs if job[0] not in parts.done)
+    for index, (part_size, chunk_digest, part_digest) in parallel_split(input_file, jobs, encoding, workers, max_in_flight,
+                                                                        compression, compression_level, executor,
+                                                                        read_mode, fsync, stats):
+        offset = (index - 1) * chunk_size
+        name, pack_offset = parts.part_name(index), None
+        if parts.packer is not None:
+            # Готовая часть дописывается в контейнер в порядке номеров
+            name, pack_offset = parts.packer.add_file(parts.part_path(index))
+        parts.add(part_entry(
+            index, name, offset, min(chunk_size, file_size - offset),
+            part_size, chunk_digest, part_digest, pack_offset,
+        ))
+
+
+def write_part(parts, part_number, offset, length, source, encoding, hasher, compression, compression_level,
+               fsync, stats, make_dir=False):
+    """
+    Кодирует кусок из source окнами (память не зависит от --chunk-size) в отдельную
+    часть или в контейнер и записывает её в манифест.
+
+    :param make_dir: Создать вложенную папку части (у потока они создаются по мере записи).
+    :return: Длина куска — у последнего куска потока она известна только после чтения.
+    """
+    chunk_hash = new_hasher()
+    part_hash = new_hasher()
+    if parts.packer is not None:
+        name, pack_offset, part_file = parts.packer.open_part()
+    else:
+        name, pack_offset = parts.part_name(part_number), None
+        if make_dir:
+            os.makedirs(os.path.dirname(parts.part_path(part_number)), exist_ok=True)
+        part_file = open(temp_path(parts.part_path(part_number)), "wb")
+    length, part_size = encode_stream(source, part_file, encoding, length, (hasher, chunk_hash), (part_hash,),
+                                      compression, compression_level, stats)
+    if parts.packer is None:
+        if fsync:
+            sync_file(part_file, stats)
+        part_file.close()
+        # Под итоговым именем часть появляется только целиком
+        os.replace(part_file.name, parts.part_path(part_number))
+    parts.add(part_entry(
+        part_number, name, offset, length,
+        part_size, chunk_hash.hexdigest(), part_hash.hexdigest(), pack_offset,
+    ))
+    return length
+
+
+def encode_sequential(parts, input_file, file_size, chunk_size, encoding, hasher, compression, compression_level,
+                      read_mode, fsync, stats, sparse):
+    """
+    Кодирует фиксированные куски по порядку в одном процессе: из файла, из его
+    отображения в память (read_mode="mmap") или из потока stdin (input_file="-").
+    """
+    streaming = input_file == "-"
+    mapped = MappedInput(input_file) if read_mode == "mmap" else None
+    with mapped or (nullcontext(sys.stdin.buffer) if streaming else open(input_file, "rb")) as f:
+        ranges = stream_ranges(f, chunk_size) if streaming else chunk_ranges(file_size, chunk_size)
+        for part_number, offset, length in ranges:
+            source = f
+            if mapped is not None:
+                # Срез отображения вместо чтения; следующий кусок ядро подгружает заранее
+                source = mapped.view(offset, length)
+                mapped.will_need(offset + length, chunk_size)
+            if part_number in parts.done:
+                # Часть уже на диске и совпала с журналом: кусок только хэшируется
+                start = stats.now()
+                if mapped is not None:
+                    hasher.update(source)
+                    mapped.done(offset, length)
+                else:
+                    for window in read_windows(f, DECODE_WINDOW, length):
+                        start = stats.lap('read', start, len(window))
+                        hasher.update(window)
+                stats.lap('hash', start, length)
+                parts.progress.part(part_number, offset + length)
+                continue
+            if sparse:
+                # Кусок из одного байта не кодируется; иначе source выдаёт его с начала
+                start = stats.now()
+                fill, length, source = chunk_run(source, offset, length, None if streaming else input_file)
+                start = stats.lap('read', start, length)
+                if fill is not None:
+                    hash_run(fill, length, (hasher,))
+                    stats.lap('hash', start, length)
+                    if mapped is not None:
+                        mapped.done(offset, length)
+                    parts.add_run(part_number, offset, length, fill)
+                    continue
+            # Первая часть вложенной папки могла оказаться повтором и не создать её
+            make_dir = streaming and parts.sharded and (part_number % SHARD_SIZE == 1 or sparse)
+            length = write_part(parts, part_number, offset, length, source, encoding, hasher, compression,
+                                compression_level, fsync, stats, make_dir)
+            if mapped is not None:
+                mapped.done(offset, length)
+
+
+def add_parity(parts, input_file, stripe_size, parity_parts, encoding, workers, max_in_flight, executor):
+    """Контрольные части по полосам — отдельным проходом по исходному файлу; возвращает запись parity манифеста."""
+    parity = write_parity(input_file, parts.entries, parts.parts_dir, parts.base_name,
+                          stripe_size, parity_parts, encoding, workers, max_in_flight, executor, parts.sharded)
+    logging.info(f"Контрольных частей сохранено: {len(parity['parts'])} ({parity['algorithm']}, "
+                 f"{parity_parts} на полосу из {stripe_size})")
+    return parity
+
+
+def report_stats(stats, elapsed_time, file_size, part_count, workers, stats_path, file_name):
+    """Итог по стадиям одной строкой в лог и отчёт в stats_path (JSON или .prom)."""
+    from modules.stats import STAGES, save_report
+    stats_report = stats.report(elapsed_time, file_size, part_count, workers)
+    logging.info("Стадии: " + ", ".join(
+        f"{stage} {stats_report['stages'][stage]['seconds']:.3f} с" for stage in STAGES if stats_report['stages'][stage]['calls']
+    ) + f"; {stats_report['throughput_mb_s']} МБ/с, пиковый RSS {stats_report['peak_rss_mb']} МБ")
+    save_report(stats_report, stats_path, {"file": file_name})
+    return stats_report
+
+
+def record_catalog(output_dir, metadata_file):
+    """Набор попадает в каталог output/catalog.sqlite3 (поиск и сборка мусора — catalog.py)."""
+    from modules import catalog
+    try:
+        catalog.record_split(output_dir, metadata_file)
+    except catalog.CATALOG_ERRORS as e:
+        logging.warning(f"Каталог не обновлён: {e}")
+
+
+def split_file(input_file, output_dir, options, workers=1, max_in_flight=None, progress=None, executor=None):
+    """
+    Функция для разрезания файла на части с параметрами options (SplitOptions; input_file="-" — поток из stdin).
+
+    workers > 1 — кодирование в пуле процессов, executor — общий пул (batch.py).
+    Возвращает путь к JSON-метаданным или None при ошибке.
+    """
+    progress = progress or ProgressEmitter()
+    # Размер куска и сжатие могут выбираться автоматически ниже
+    encoding, chunk_size_kb = options.encoding, options.chunk_size_kb
+    compression, compression_level = options.compression, options.compression_level
+    streaming = input_file == "-"
+    error = options.error(streaming)
+    if error is not None:
+        logging.error(error)
+        return
+    if streaming and workers != 1:
+        logging.info("Поток из stdin кодируется в одном процессе: воркеры читают свои диапазоны из файла")
+        workers = 1
+    if workers == 0:
+        workers = default_workers()
+
+    # Размер куска по размеру файла, числу частей и замеру скорости записи
+    chunk_size_auto = None
+    if chunk_size_kb == "auto":
+        if not streaming and not os.path.isfile(input_file):
+            logging.error(f"Файл не найден: {input_file}")
+            return
+        os.makedirs(output_dir, exist_ok=True)
+        chunk_size_kb, chunk_size_auto = choose_chunk_size(
+            None if streaming else os.path.getsize(input_file), output_dir, encoding, workers)
+        logging.info(f"Автоматически выбран размер куска: {chunk_size_kb} КБ ({chunk_size_auto['reason']})")
+
     chunk_size = chunk_size_kb * 1024  # Размер куска в байтах
-    file_name = os.path.basename(input_file)
+    file_name = (options.stream_name or "stdin") if streaming else os.path.basename(input_file)
     file_hash = hashlib.md5(file_name.encode()).hexdigest()[:5]
+    base_name = f"{file_name[:5]}_{file_hash}"
 
     # Директории для хранения частей и метаданных
-    parts_dir = os.path.join(output_dir, f"{file_name[:5]}_{file_hash}", "parts")
-    json_dir = os.path.join(output_dir, f"{file_name[:5]}_{file_hash}", "json")
+    parts_dir = os.path.join(output_dir, base_name, "parts")
+    json_dir = os.path.join(output_dir, base_name, "json")
+
+    compression_auto = None
+    if compression == "auto":
+        compression, compression_level, compression_auto = choose_compression(
+            input_file, chunk_size, partial(encode_chunk, encoding=encoding))
+        logging.info(f"Автоматически выбрано сжатие: {compression} (уровень {compression_level})")
+
+    store_dir = store_directory(output_dir, encoding, compression)
 
-    os.makedirs(parts_dir, exist_ok=True)
+    os.makedirs(store_dir if options.chunking == "cdc" else parts_dir, exist_ok=True)
     os.makedirs(json_dir, exist_ok=True)
 
     start_time = time.time()
+    # Счётчики стадий копятся по окнам и частям, в лог попадает только итог. Замер
+    # (и modules.stats) включается только с --stats — обычный запуск таймеры не вызывает
+    stats = NULL_STATS
+    if options.stats_path:
+        from modules.stats import StageStats
+        stats = StageStats()
 
-    # Подсчет общего количества частей
-    file_size = os.path.getsize(input_file)
-    total_parts = (file_size + chunk_size - 1) // chunk_size  # Общее количество частей
-    logging.info(f"Общее количество частей: {total_parts}")
-
-    with open(input_file, "rb") as f:
-        part_number = 1
-        while True:
-            chunk = f.read(chunk_size)
-            if not chunk:
-                break
-
-            part_file_name = f"{file_name[:5]}_{file_hash}_part_{part_number:03d}.txt"
-            part_file_path = os.path.join(parts_dir, part_file_name)
-
-            with open(part_file_path, "wb") as part_file:
-                if encoding == "hex":
-                    part_file.write(chunk.hex().encode())
-                elif encoding == "base64":
-                    part_file.write(base64.b64encode(chunk))
-                elif encoding == "base85":
-                    part_file.write(base64.b85encode(chunk))
-                else:
-                    logging.error(f"Неизвестная кодировка: {encoding}")
-                    return
-            logging.info(f"Часть {part_number} сохранена")
-            part_number += 1
+    # Контрольная сумма содержимого считается в том же проходе, что и части
+    content_md5 = hashlib.md5()
+
+    # Подсчет общего количества частей (для разбиения по содержимому — оценка;
+    # для потока размер и число частей известны только в конце)
+    file_size = None if streaming else os.path.getsize(input_file)
+    total_parts = None if streaming else (file_size + chunk_size - 1) // chunk_size  # Общее количество частей
+    logging.info(f"Общее количество частей: {'неизвестно (поток из stdin)' if streaming else total_parts}")
+    progress.start(file_size, total_parts)
+
+    # Объём впервые записанных в хранилище кусков и сэкономленный дедупликацией
+    stored_bytes = file_size
+    saved_bytes = 0
+
+    # Много частей раскладываются по вложенным папкам parts/000/001/..., путь каждой
+    # части вычисляется по номеру и записывается в манифест. Для потока число частей
+    # заранее неизвестно: вложенные папки создаются по мере записи
+    sharded = options.layout == "files" and options.chunking == "fixed" and (streaming or use_shards(total_parts))
+    if sharded and not streaming:
+        create_shards(parts_dir, total_parts)
+    name_width = STREAM_NUMBER_WIDTH if streaming else part_number_width(total_parts)
+
+    # Журнал готовых частей; при продолжении части из него сверяются с хэшами на диске
+    journal = None
+    done = {}
+    if options.chunking == "fixed" and options.layout == "files" and not streaming:
+        journal_path = os.path.join(json_dir, f"{file_hash}_{file_name}.journal")
+        journal_header = {"input_size": file_size, "input_mtime_ns": os.stat(input_file).st_mtime_ns,
+                          "chunk_size": chunk_size, "encoding": encoding,
+                          "compression": compression, "compression_level": compression_level}
+        if options.resume:
+            remove_temp_files(parts_dir)
+            # Серии из повтора байта находятся заново: в журнале их быть не должно
+            records = {index: record for index, record in load_journal(journal_path, journal_header).items()
+                       if "fill" not in record}
+            checked = verify_parts({"parts": [records[index] for index in sorted(records)], "encoding": encoding,
+                                    "compression": compression}, parts_dir, workers=workers)
+            done = {index: records[index] for index, status in checked if status == "ok"}
+            logging.info(f"Продолжение: готовых частей по журналу {len(records)}, "
+                         f"совпали с хэшами {len(done)} из {total_parts}")
+        journal = JournalWriter(journal_path, journal_header, (done[index] for index in sorted(done)))
+    elif options.resume and options.layout == "pack":
+        logging.warning("Продолжение не поддерживается для контейнеров: разбиение начинается заново")
+
+    # Контейнеры с частями подряд вместо отдельных файлов
+    packer = None
+    if options.layout == "pack":
+        pack_size = options.pack_size_mb * 1024 * 1024 if options.pack_size_mb else PACK_SIZE
+        packer = PackWriter(parts_dir, base_name, pack_size, options.fsync, stats)
+    parts = SplitParts(parts_dir, base_name, name_width, sharded, progress, packer, journal, done)
+
+    if options.chunking == "cdc":
+        stored_bytes, saved_bytes = encode_cdc(
+            parts, sys.stdin.buffer if streaming else input_file, store_dir, encoding, chunk_size,
+            options.min_chunk_kb, options.max_chunk_kb, content_md5, workers, max_in_flight, compression,
+            compression_level, executor)
+    elif workers > 1:
+        encode_parallel(parts, input_file, file_size, chunk_size, encoding, content_md5, workers, max_in_flight,
+                        compression, compression_level, executor, options.read_mode, options.fsync, stats,
+                        options.sparse)
+    else:
+        encode_sequential(parts, input_file, file_size, chunk_size, encoding, content_md5, compression,
+                          compression_level, options.read_mode, options.fsync, stats, options.sparse)
+
+    parts.close_run()
+    if packer is not None:
+        packer.close()
+
+    if streaming:
+        # Поток закончился: теперь известны его размер и число частей
+        file_size = sum(entry["size"] for entry in parts.entries)
+        if options.chunking == "fixed":
+            stored_bytes = file_size
+        logging.info(f"Поток из stdin прочитан: {file_size} байт, частей {len(parts.entries)}")
+    if options.chunking == "cdc":
+        logging.info(f"Дедупликация: сэкономлено {saved_bytes} байт, коэффициент {dedup_ratio(file_size, stored_bytes)}")
+
+    # Готовые при продолжении части стоят в начале списка
+    parts.entries.sort(key=lambda entry: entry["index"])
+    manifest_entries = parts.entries
+    runs = [entry for entry in manifest_entries if "fill" in entry]
+    if options.sparse:
+        logging.info(f"Серий из повтора байта: {len(runs)}, не записано {sum(entry['size'] for entry in runs)} байт")
+
+    parity = None
+    if options.parity_parts:
+        parity = add_parity(parts, input_file, options.stripe_size, options.parity_parts, encoding, workers,
+                            max_in_flight, executor)
 
     elapsed_time = time.time() - start_time
+    stats_report = None
+    if options.stats_path:
+        stats_report = report_stats(stats, elapsed_time, file_size, len(manifest_entries), workers,
+                                    options.stats_path, file_name)
+
+    # Манифест с хэшами частей и корнем дерева Меркла
+    manifest_extra = {"compression": compression, "compression_level": compression_level, "layout": options.layout}
+    if options.chunking == "cdc":
+        manifest_extra.update(chunking="cdc", store=os.path.relpath(store_dir, json_dir))
+    if parity is not None:
+        manifest_extra["parity"] = parity
+    if sharded:
+        manifest_extra["sharded"] = True
+    manifest = build_manifest(manifest_entries, encoding, chunk_size, file_size, **manifest_extra)
+    manifest_name = f"{file_hash}_{file_name}.manifest.json"
+    save_manifest(manifest, os.path.join(json_dir, manifest_name))
 
     # Создание JSON-файла с метаданными
     metadata = {
         "file_name": file_name,
         "original_file_name": file_name,
         "original_size": file_size,
-        "part_count": part_number - 1,
+        "part_count": len(manifest_entries),
         "chunk_size": chunk_size_kb,
         "encoding": encoding,
+        "chunking": options.chunking,
+        "layout": options.layout,
+        "sharded": sharded,
+        "compression": compression,
+        "compression_level": compression_level,
         "total_size": file_size,
-        "md5": file_hash,
+        "encoded_size": parts.encoded_size,
+        "parity_parts": options.parity_parts,
+        "stripe_size": options.stripe_size if options.parity_parts else None,
+        "parity_encoded_size": sum(entry["encoded_size"] for entry in parity["parts"]) if parity else 0,
+        "md5": content_md5.hexdigest(),
+        "name_hash": file_hash,
+        "manifest": manifest_name,
+        "merkle_root": manifest["merkle_root"],
+        "stored_bytes": stored_bytes,
+        "dedup_saved_bytes": saved_bytes,
+        "dedup_ratio": dedup_ratio(file_size, stored_bytes),
+        "sparse": options.sparse,
+        "sparse_runs": len(runs),
+        "sparse_bytes": sum(entry["size"] for entry in runs),
         "elapsed_time_seconds": elapsed_time,
+        "stats": stats_report,
         "creation_date": time.strftime('%Y-%m-%dT%H:%M:%S')
     }
 
+    if compression_auto is not None:
+        metadata["compression_auto"] = compression_auto
+    if chunk_size_auto is not None:
+        metadata["chunk_size_auto"] = chunk_size_auto
+
+    # Метаданные записываются последними и целиком: по ним разбиение считается завершённым
     metadata_file = os.path.join(json_dir, f"{file_hash}_{file_name}.json")
-    with open(metadata_file, "w") as metadata_out:
-        json.dump(metadata, metadata_out)
+    replace_json(metadata, metadata_file)
+    if journal is not None:
+        journal.remove()
+
+    record_catalog(output_dir, metadata_file)
 
-    logging.info(f"Разделение завершено. Куски сохранены в: {parts_dir}")
+    progress.done(metadata_file)
+    logging.info(f"Разделение завершено. Куски сохранены в: {store_dir if options.chunking == 'cdc' else parts_dir}")
     logging.info(f"JSON файл с метаданными сохранен в: {json_dir}/{file_hash}_{file_name}.json")
     logging.info("===========separator-silence.py завершен===========log %s==========", time.strftime('%Y-%m-%d %H:%M:%S'))
+    return metadata_file
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Разрезание файла на части")
-    parser.add_argument('--input', required=True, help='Путь к входному файлу')
+    parser.add_argument('--input', required=True, help="Путь к входному файлу ('-' — поток из stdin)")
+    parser.add_argument('--name', default=None, help="Имя файла в метаданных для --input - (по умолчанию stdin)")
     parser.add_argument('--output', required=True, help='Путь к директории для сохранения частей')
-    parser.add_argument('--chunk-size', type=int, default=200, help='Размер куска в КБ')
+    parser.add_argument('--chunk-size', type=chunk_size_arg, default=200, help='Размер куска в КБ (auto — по размеру файла и замеру скорости записи)')
     parser.add_argument('--encoding', choices=['hex', 'base64', 'base85'], default='base64', help='Кодирование для частей')
+    parser.add_argument('--workers', type=workers_arg, default=1, help='Количество процессов для кодирования (0 — по числу ядер)')
+    parser.add_argument('--max-in-flight', type=int, default=None, help='Максимум кусков в обработке одновременно (по умолчанию 2 * workers)')
+    parser.add_argument('--chunking', choices=['fixed', 'cdc'], default='fixed', help='fixed — куски фиксированного размера, cdc — по содержимому с дедупликацией')
+    parser.add_argument('--min-chunk-size', type=int, default=None, help='Минимальный размер куска в КБ для cdc (по умолчанию chunk-size / 4)')
+    parser.add_argument('--max-chunk-size', type=int, default=None, help='Максимальный размер куска в КБ для cdc (по умолчанию chunk-size * 4)')
+    parser.add_argument('--compression', choices=['none', 'zlib', 'bz2', 'lzma', 'auto'], default='none', help='Сжатие кусков перед кодированием (auto — выбор по выборке кусков)')
+    parser.add_argument('--compression-level', type=int, default=None, help='Уровень сжатия (по умолчанию: zlib 6, bz2 9, lzma 6)')
+    parser.add_argument('--layout', choices=['files', 'pack'], default='files', help='files — файл на каждую часть, pack — части подряд в контейнерах с индексом в манифесте')
+    parser.add_argument('--progress-fd', type=int, default=None, help='Дескриптор канала для событий прогресса в формате JSON (для меню)')
+    parser.add_argument('--pack-size', type=int, default=1024, help='Размер контейнера в МБ для pack, после которого начинается следующий')
+    parser.add_argument('--parity', type=int, default=0, help='Контрольных частей на полосу (0 — без них, 1 — XOR, больше — Рид — Соломон)')
+    parser.add_argument('--stripe-size', type=int, default=8, help='Частей с данными в полосе для --parity')
+    parser.add_argument('--read-mode', choices=['buffered', 'mmap'], default='buffered', help='buffered — чтение кусков в буфер, mmap — кодирование прямо из отображения файла в память')
+    parser.add_argument('--fsync', action='store_true', help='Сбрасывать каждую часть (контейнер) на диск перед закрытием')
+    parser.add_argument('--stats', default=None, help='Сохранить отчёт по стадиям: .prom — в формате Prometheus, иначе JSON')
+    parser.add_argument('--profile', action='store_true', help='Профилировать запуск (cProfile и tracemalloc), профиль — рядом с JSON-метаданными')
+    parser.add_argument('--resume', action='store_true', help='Продолжить прерванное разбиение: готовые части из журнала сверяются с хэшами и не кодируются заново')
+    parser.add_argument('--sparse', action='store_true', help='Не записывать куски из одного повторённого байта (нули образов дисков): сборка восстанавливает их дырами')
 
     args = parser.parse_args()
 
-    split_file(args.input, args.output, args.chunk_size, args.encoding)
+    split = partial(split_file, args.input, args.output, SplitOptions.from_args(args), args.workers,
+                    args.max_in_flight, ProgressEmitter(args.progress_fd))
+    if args.profile:
+        # cProfile и tracemalloc — только при --profile
+        from modules.stats import profile_call
+        profile_call(split)
+    else:
+        split()
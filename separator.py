@@ -1,34 +1,29 @@
 #!/usr/bin/env python
 import os
-import base64
+import argparse
 import hashlib
 import time
 import math
+from functools import partial
 import rich_click as click
 from rich.console import Console
 from rich.progress import Progress
 from rich.table import Table
+from modules.codec import ENCODINGS, encode_chunk, encode_stream
+from modules.catalog import CATALOG_ERRORS, record_split
+from modules.cdc import chunk_bounds, dedup_ratio, store_directory, store_split
+from modules.compression import COMPRESSIONS, choose_compression
+from modules.manifest import build_manifest, new_hasher, part_entry, save_manifest
+from modules.mapped import READ_MODES, MappedInput
+from modules.pack import PACK_SIZE, PackWriter
+from modules.planner import chunk_size_arg, choose_chunk_size
+from modules.shards import create_shards, shard_name, use_shards
+from modules.parallel import chunk_ranges, default_workers, hashing_jobs, parallel_split
+from modules.stats import STAGES, StageStats
 
 # Инициализация Rich для красивого вывода
 console = Console(force_terminal=True, color_system="256")
 
-def calculate_md5(file_path):
-    """Вычисление контрольной суммы файла."""
-    md5_hash = hashlib.md5()
-    with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            md5_hash.update(byte_block)
-    return md5_hash.hexdigest()
-
-def calculate_total_size(directory):
-    """Подсчёт общего размера всех файлов в указанной директории."""
-    total_size = 0
-    for dirpath, dirnames, filenames in os.walk(directory):
-        for filename in filenames:
-            filepath = os.path.join(dirpath, filename)
-            total_size += os.path.getsize(filepath)
-    return total_size
-
 def format_size(size_bytes):
     """Форматирует размер файла в человекочитаемый формат."""
     if size_bytes == 0:
@@ -44,75 +39,214 @@ def calculate_increase_percentage(original_size, new_size):
     increase = ((new_size - original_size) / original_size) * 100
     return round(increase, 2)
 
-def split_file(input_file, output_dir, chunk_size, encoding):
+def split_file(input_file, output_dir, chunk_size, encoding, workers=1, max_in_flight=None,
+               chunking='fixed', min_chunk_size=None, max_chunk_size=None,
+               compression='none', compression_level=None, layout='files', pack_size=None, read_mode='buffered'):
     """
     Разбивает файл на части заданного размера и сохраняет в указанную папку.
     Также вычисляет контрольную сумму файла и размер частей.
 
     :param input_file: Путь к исходному файлу.
     :param output_dir: Папка для сохранения частей.
-    :param chunk_size: Размер части в КБ.
+    :param chunk_size: Размер части в КБ или 'auto' — выбор по размеру файла, числу частей,
+                       блоку файловой системы и замеру скорости записи (сводка — в манифесте).
     :param encoding: Метод кодирования частей файла ('hex', 'base64' или 'base85').
+    :param workers: Количество процессов для кодирования (0 — по числу ядер).
+    :param max_in_flight: Максимум кусков в обработке одновременно (по умолчанию 2 * workers).
+    :param chunking: 'fixed' — части фиксированного размера, 'cdc' — части переменной длины
+                     по содержимому в общем хранилище <output>/store/<кодировка>/ с дедупликацией.
+    :param min_chunk_size: Минимальный размер куска в КБ для 'cdc' (по умолчанию chunk_size / 4).
+    :param max_chunk_size: Максимальный размер куска в КБ для 'cdc' (по умолчанию chunk_size * 4).
+    :param compression: Сжатие кусков перед кодированием ('none', 'zlib', 'bz2', 'lzma' или 'auto').
+    :param compression_level: Уровень сжатия (по умолчанию: zlib 6, bz2 9, lzma 6).
+    :param layout: 'files' — файл на каждую часть, 'pack' — части подряд в контейнерах <имя>_N.pack,
+                   положение каждой части записывается в манифест.
+    :param pack_size: Размер контейнера в МБ, после которого начинается следующий (по умолчанию 1024).
+    :param read_mode: 'buffered' — чтение кусков в буфер, 'mmap' — кодирование и хэширование прямо
+                      из отображения файла в память без копирования (для фиксированных частей).
     """
     if not os.path.isfile(input_file):
         console.print(f"[red]Ошибка:[/red] Файл '{input_file}' не найден.")
         return
 
-    # Создаем отдельную папку для частей в output/
+    if encoding not in ENCODINGS:
+        console.print(f"[red]Ошибка:[/red] Некорректный тип кодирования '{encoding}'.")
+        return
+
+    if compression != 'auto' and compression not in COMPRESSIONS:
+        console.print(f"[red]Ошибка:[/red] Некорректный метод сжатия '{compression}'.")
+        return
+
+    if read_mode not in READ_MODES:
+        console.print(f"[red]Ошибка:[/red] Некорректный способ чтения '{read_mode}'.")
+        return
+
+    if layout == 'pack' and chunking == 'cdc':
+        console.print("[red]Ошибка:[/red] Контейнеры не поддерживаются для cdc: части cdc хранятся в общем хранилище.")
+        return
+
+    if workers == 0:
+        workers = default_workers()
+
+    # Автоматический выбор размера куска; сводка выбора сохраняется в манифесте
+    chunk_size_auto = None
+    if chunk_size == 'auto':
+        os.makedirs(output_dir, exist_ok=True)
+        chunk_size, chunk_size_auto = choose_chunk_size(os.path.getsize(input_file), output_dir, encoding, workers)
+        console.print(f"Размер куска: [cyan]{chunk_size} КБ[/cyan] ({chunk_size_auto['reason']})")
+
+    # Автоматический выбор сжатия по нескольким кускам файла
+    if compression == 'auto':
+        compression, compression_level, _ = choose_compression(
+            input_file, chunk_size * 1024, partial(encode_chunk, encoding=encoding))
+
+    # Создаем отдельную папку для частей в output/ (для 'cdc' в ней только манифест)
     base_file_name = os.path.basename(input_file).rsplit('.', 1)[0]
+    store_dir = store_directory(output_dir, encoding, compression)
     output_dir = os.path.join(output_dir, base_file_name)
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    # Вычисляем контрольную сумму исходного файла
-    file_md5 = calculate_md5(input_file)
+    # Контрольная сумма и общий размер частей считаются в том же проходе, что и разбиение
+    md5_hash = hashlib.md5()
+    total_size_parts = 0
+    # Записи манифеста: хэши каждой закодированной части и декодированного куска
+    manifest_entries = []
 
     # Размер исходного файла
     file_size = os.path.getsize(input_file)
     chunk_size_bytes = chunk_size * 1024
     num_chunks = (file_size + chunk_size_bytes - 1) // chunk_size_bytes
 
+    # Объём впервые записанных в хранилище кусков и сэкономленный дедупликацией
+    stored_bytes = file_size
+    saved_bytes = 0
+
+    # Много частей раскладываются по вложенным папкам 000/001/..., путь каждой части
+    # вычисляется по номеру и записывается в манифест
+    sharded = layout == 'files' and chunking == 'fixed' and use_shards(num_chunks)
+    if sharded:
+        create_shards(output_dir, num_chunks)
+
+    def part_name(index):
+        return shard_name(f"{base_file_name}_part_{index}.txt", index, sharded)
+
+    # Контейнеры с частями подряд вместо отдельных файлов
+    packer = None
+    # Время стадий копится по окнам и частям и выводится строками отчётной таблицы
+    stats = StageStats()
+    if layout == 'pack':
+        packer = PackWriter(output_dir, base_file_name, pack_size * 1024 * 1024 if pack_size else PACK_SIZE, stats=stats)
+
     # Прогресс-бар с переносом строки
     with Progress() as progress:
         console.print(f"\nРазбиение файла: {input_file} на части...\n")  # Добавляем перенос строки
-        task = progress.add_task(f"\n", total=num_chunks)
+        # Число частей при разбиении по содержимому заранее неизвестно — прогресс в байтах
+        task = progress.add_task(f"\n", total=file_size if chunking == 'cdc' else num_chunks)
         start_time = time.time()
 
         try:
-            with open(input_file, 'rb') as file:
+            if chunking == 'cdc':
+                min_size, avg_size, max_size = chunk_bounds(
+                    chunk_size_bytes, min_chunk_size and min_chunk_size * 1024, max_chunk_size and max_chunk_size * 1024)
+                stored_bytes = 0
                 index = 1
-                while True:
-                    chunk = file.read(chunk_size_bytes)
-                    if not chunk:
-                        break
-
-                    chunk_file_name = os.path.join(output_dir, f"{base_file_name}_part_{index}.txt")
-
-                    if encoding == 'hex':
-                        encoded_chunk = chunk.hex()
-                    elif encoding == 'base64':
-                        encoded_chunk = base64.b64encode(chunk).decode('utf-8')
-                    elif encoding == 'base85':
-                        encoded_chunk = base64.b85encode(chunk).decode('utf-8')
+                for entry, is_new in store_split(input_file, store_dir, encoding, min_size, avg_size, max_size,
+                                                 (md5_hash,), workers, max_in_flight, compression, compression_level):
+                    manifest_entries.append(entry)
+                    total_size_parts += entry["encoded_size"]
+                    if is_new:
+                        stored_bytes += entry["size"]
                     else:
-                        console.print(f"[red]Ошибка:[/red] Некорректный тип кодирования '{encoding}'.")
-                        return
-
-                    with open(chunk_file_name, 'w') as chunk_file:
-                        chunk_file.write(encoded_chunk)
-
+                        saved_bytes += entry["size"]
+                    index += 1
+                    progress.update(task, advance=entry["size"])
+            elif workers > 1:
+                # Каждый воркер сам читает свой диапазон байтов и записывает часть
+                jobs = (
+                    (index, offset, length, os.path.join(output_dir, part_name(index)))
+                    for index, offset, length in chunk_ranges(file_size, chunk_size_bytes)
+                )
+                index = 1
+                jobs = hashing_jobs(input_file, jobs, md5_hash, read_mode, stats)
+                for part_index, (encoded_size, chunk_digest, part_digest) in parallel_split(input_file, jobs, encoding, workers, max_in_flight,
+                                                                                                            compression, compression_level,
+                                                                                                            read_mode=read_mode, stats=stats):
+                    offset = (part_index - 1) * chunk_size_bytes
+                    name, pack_offset = part_name(part_index), None
+                    if packer is not None:
+                        # Готовая часть дописывается в контейнер в порядке номеров
+                        name, pack_offset = packer.add_file(os.path.join(output_dir, name))
+                    manifest_entries.append(part_entry(
+                        part_index, name, offset,
+                        min(chunk_size_bytes, file_size - offset), encoded_size, chunk_digest, part_digest, pack_offset,
+                    ))
+                    total_size_parts += encoded_size
                     index += 1
                     progress.update(task, advance=1)
+            else:
+                mapped = MappedInput(input_file) if read_mode == 'mmap' else None
+                with mapped or open(input_file, 'rb') as file:
+                    index = 1
+                    for index, offset, length in chunk_ranges(file_size, chunk_size_bytes):
+                        source = file
+                        if mapped is not None:
+                            # Срез отображения вместо чтения; следующий кусок ядро подгружает заранее
+                            source = mapped.view(offset, length)
+                            mapped.will_need(offset + length, chunk_size_bytes)
+                        chunk_file_name = os.path.join(output_dir, part_name(index))
+                        chunk_hash = new_hasher()
+                        part_hash = new_hasher()
+
+                        # Кусок кодируется окнами — память не зависит от --chunk-size
+                        if packer is not None:
+                            name, pack_offset, chunk_file = packer.open_part()
+                        else:
+                            name, pack_offset = part_name(index), None
+                            chunk_file = open(chunk_file_name, 'wb')
+                        _, encoded_size = encode_stream(source, chunk_file, encoding, length, (md5_hash, chunk_hash), (part_hash,),
+                                                        compression, compression_level, stats)
+                        if packer is None:
+                            chunk_file.close()
+                        if mapped is not None:
+                            mapped.done(offset, length)
+                        total_size_parts += encoded_size
+                        manifest_entries.append(part_entry(
+                            index, name, offset, length,
+                            encoded_size, chunk_hash.hexdigest(), part_hash.hexdigest(), pack_offset,
+                        ))
+
+                        index += 1
+                        progress.update(task, advance=1)
+
+            if packer is not None:
+                packer.close()
 
             # Добавляем перенос строки перед выводом таблицы
             console.print("\n")
 
+            file_md5 = md5_hash.hexdigest()
+
             # Сохраняем контрольную сумму в файл
             with open(os.path.join(output_dir, "checksum.md5"), 'w') as checksum_file:
                 checksum_file.write(file_md5)
 
-            # Подсчёт общего размера всех частей
-            total_size_parts = calculate_total_size(output_dir)
+            # Манифест с хэшами частей и корнем дерева Меркла
+            manifest_extra = {"compression": compression, "compression_level": compression_level, "layout": layout}
+            if chunking == 'cdc':
+                manifest_extra.update(chunking='cdc', store=os.path.relpath(store_dir, output_dir))
+            if sharded:
+                manifest_extra["sharded"] = True
+            if chunk_size_auto is not None:
+                manifest_extra["chunk_size_auto"] = chunk_size_auto
+            manifest = build_manifest(manifest_entries, encoding, chunk_size_bytes, file_size, **manifest_extra)
+            save_manifest(manifest, os.path.join(output_dir, "manifest.json"))
+
+            # Папка частей попадает в каталог <output>/catalog.sqlite3 (поиск и сборка мусора — catalog.py)
+            try:
+                record_split(os.path.dirname(output_dir), os.path.join(output_dir, "manifest.json"))
+            except CATALOG_ERRORS as e:
+                console.print(f"[yellow]Предупреждение: каталог не обновлён: {e}[/yellow]")
 
             # Вычисление процента увеличения размера
             increase_percentage = calculate_increase_percentage(file_size, total_size_parts)
@@ -122,7 +256,8 @@ def split_file(input_file, output_dir, chunk_size, encoding):
             # Отчетная таблица
             #table = Table(title="Результат разбиения файла")
             # Отчетная таблица с добавлением названия кодирования
-            table = Table(title=f"\nРезультат разбиения файла ({encoding})")  # Добавляем название алгоритма кодирования в заголовок
+            title_codec = encoding if compression == 'none' else f"{compression}:{compression_level or 'default'} + {encoding}"
+            table = Table(title=f"\nРезультат разбиения файла ({title_codec})")  # Добавляем название алгоритма кодирования в заголовок
 
             table.add_column("Файл", justify="right", style="cyan", no_wrap=True)
             table.add_column("Значение", style="magenta")
@@ -130,26 +265,64 @@ def split_file(input_file, output_dir, chunk_size, encoding):
             table.add_row("Имя файла", os.path.basename(input_file))
             table.add_row("Размер исходного файла", format_size(file_size))
             table.add_row("Число частей", str(index - 1))
+            if packer is not None:
+                table.add_row("Число контейнеров", str(len(packer.names)))
             table.add_row("Общий размер частей", format_size(total_size_parts))
-            table.add_row("Общий размер увеличился", f"на +{increase_percentage}% от оригинала")
+            if increase_percentage >= 0:
+                table.add_row("Общий размер увеличился", f"на +{increase_percentage}% от оригинала")
+            else:
+                table.add_row("Общий размер уменьшился", f"на {-increase_percentage}% от оригинала")
             table.add_row("Контрольная сумма (MD5)", file_md5)
+            table.add_row("Корень Меркла (SHA-256)", manifest["merkle_root"])
+            if chunking == 'cdc':
+                ratio = dedup_ratio(file_size, stored_bytes)
+                table.add_row("Записано новых данных", format_size(stored_bytes))
+                table.add_row("Сэкономлено дедупликацией", format_size(saved_bytes))
+                table.add_row("Коэффициент дедупликации", f"{ratio}x" if ratio is not None else "∞ (все куски уже в хранилище)")
             table.add_row("Время выполнения", f"{end_time - start_time:.2f} секунд")
+            report = stats.report(end_time - start_time, file_size, index - 1, workers)
+            table.add_row("Скорость", f"{report['throughput_mb_s']} МБ/с")
+            for stage in STAGES:
+                stage_report = report["stages"][stage]
+                if stage_report["calls"]:
+                    speed = f", {stage_report['mb_s']} МБ/с" if stage_report["mb_s"] and stage_report["bytes"] else ""
+                    table.add_row(f"Стадия {stage}", f"{stage_report['seconds']:.3f} с{speed}")
+            if report["peak_rss_mb"] is not None:
+                table.add_row("Пиковая память (RSS)", f"{report['peak_rss_mb']} МБ")
 
             console.print(table)
 
             # Сообщение о завершении
             console.print(f"\n[bold green]✔ Файл успешно разбит на {index - 1} частей.[/bold green]")
-            console.print(f"[bold green]✔ Контрольная сумма сохранена.[/bold green]")
+            console.print(f"[bold green]✔ Контрольная сумма и манифест частей сохранены.[/bold green]")
 
         except Exception as e:
             console.print(f"[red]Ошибка при обработке файла:[/red] {e}")
 
+def parse_chunk_size(ctx, param, value):
+    """Размер куска в КБ или 'auto' для --chunk-size."""
+    try:
+        return chunk_size_arg(value)
+    except argparse.ArgumentTypeError as e:
+        raise click.BadParameter(str(e))
+
 @click.command()
 @click.option('--input', 'input', required=True, help='Путь к исходному файлу для разделения на части.')
 @click.option('--output', 'output', required=True, help='Путь к папке для сохранения частей.')
-@click.option('--chunk-size', type=int, default=100, help='Размер каждой части в КБ (по умолчанию 100 КБ).')
+@click.option('--chunk-size', default='100', callback=parse_chunk_size, help='Размер каждой части в КБ (по умолчанию 100 КБ). auto — выбор по размеру файла, числу частей, блоку файловой системы и замеру скорости записи.')
 @click.option('--encoding', type=click.Choice(['hex', 'base64', 'base85'], case_sensitive=False), default='base85', help='Тип кодирования частей файла (hex, base64, base85). По умолчанию base85.')
-def main(input, output, chunk_size, encoding):
+@click.option('--workers', type=click.IntRange(min=0), default=1, help='Количество процессов для кодирования частей (0 — по числу ядер). По умолчанию 1.')
+@click.option('--max-in-flight', type=int, default=None, help='Максимум кусков в обработке одновременно (по умолчанию 2 * workers).')
+@click.option('--chunking', type=click.Choice(['fixed', 'cdc'], case_sensitive=False), default='fixed', help='fixed — части фиксированного размера, cdc — части по содержимому в общем хранилище с дедупликацией.')
+@click.option('--compression', type=click.Choice(['none', 'zlib', 'bz2', 'lzma', 'auto'], case_sensitive=False), default='none', help='Сжатие кусков перед кодированием. auto — выбор метода и уровня по выборке кусков (для уже сжатых данных сжатие отключается).')
+@click.option('--compression-level', type=int, default=None, help='Уровень сжатия (по умолчанию: zlib 6, bz2 9, lzma 6).')
+@click.option('--layout', type=click.Choice(['files', 'pack'], case_sensitive=False), default='files', help='files — файл на каждую часть, pack — части подряд в контейнерах .pack с индексом в манифесте.')
+@click.option('--pack-size', type=int, default=1024, help='Размер контейнера в МБ для pack, после которого начинается следующий. По умолчанию 1024.')
+@click.option('--min-chunk-size', type=int, default=None, help='Минимальный размер куска в КБ для cdc (по умолчанию chunk-size / 4).')
+@click.option('--max-chunk-size', type=int, default=None, help='Максимальный размер куска в КБ для cdc (по умолчанию chunk-size * 4).')
+@click.option('--read-mode', type=click.Choice(['buffered', 'mmap'], case_sensitive=False), default='buffered', help='buffered — чтение кусков в буфер, mmap — кодирование прямо из отображения файла в память. По умолчанию buffered.')
+def main(input, output, chunk_size, encoding, workers, max_in_flight, chunking, compression, compression_level, layout, pack_size,
+         min_chunk_size, max_chunk_size, read_mode):
     """
     **Разбивает файл на части и сохраняет их в указанную папку.**
 
@@ -160,7 +333,8 @@ def main(input, output, chunk_size, encoding):
     python3 separator.py --input input/yourfile.mp4 --output output/ --chunk-size 200 --encoding base85
     ```
     """
-    split_file(input, output, chunk_size, encoding)
+    split_file(input, output, chunk_size, encoding, workers, max_in_flight, chunking, min_chunk_size, max_chunk_size,
+               compression, compression_level, layout, pack_size, read_mode)
 
 if __name__ == '__main__':
     main()
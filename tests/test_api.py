@@ -0,0 +1,122 @@
+# test_api.py
+# Разбиение и сборка в текущем процессе (modules.api): Splitter, split, merge и
+# iter_merge — круговой путь, параметры SplitOptions и отказы на повреждённых,
+# пропущенных и переставленных частях.
+import hashlib
+import io
+import os
+
+import pytest
+
+from modules.api import Splitter, iter_merge, merge, split
+from modules.options import SplitOptions
+from modules.scripts import load_script
+
+DATA = os.urandom(50 * 1000 + 123)
+
+
+@pytest.mark.parametrize("encoding", ["hex", "base64", "base85"])
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_round_trip(encoding, compression):
+    """Части Splitter собираются merge с манифестом в исходные байты."""
+    splitter = Splitter(DATA, 8 * 1024, encoding, compression, base_name="data")
+    parts = list(splitter)
+    assert len(parts) == 7
+    assert splitter.size == len(DATA)
+    assert splitter.md5 == hashlib.md5(DATA).hexdigest()
+    assert splitter.manifest["parts"][0]["name"] == "data_part_1.txt"
+
+    output = io.BytesIO()
+    assert merge(parts, output, manifest=splitter.manifest) == (len(DATA), splitter.md5)
+    assert output.getvalue() == DATA
+    # Без манифеста достаточно кодировки и сжатия
+    assert b"".join(iter_merge((part for _, part in parts), encoding, compression)) == DATA
+
+
+def test_sources(tmp_path):
+    """Путь, файловый объект и пустой источник разбиваются так же, как байты."""
+    path = tmp_path / "data.bin"
+    path.write_bytes(DATA)
+    expected = list(split(DATA, 8 * 1024))
+    assert list(split(str(path), 8 * 1024)) == expected
+    with open(path, "rb") as source:
+        assert list(split(source, 8 * 1024)) == expected
+    assert list(split(b"")) == []
+    with pytest.raises(TypeError):
+        list(split(12345))
+
+
+def test_matches_silent_script(tmp_path):
+    """Части и корень манифеста совпадают с разбиением separator-silence.py."""
+    original = tmp_path / "data.bin"
+    original.write_bytes(DATA)
+    options = SplitOptions(chunk_size_kb=16, encoding="base85")
+    metadata_file = load_script("separator-silence.py").split_file(str(original), str(tmp_path / "output"), options)
+    manifest = load_script("merge_parts-silence.py").load_manifest(metadata_file[:-len(".json")] + ".manifest.json")
+
+    splitter = Splitter.from_options(DATA, options)
+    parts = dict(splitter)
+    assert splitter.manifest["merkle_root"] == manifest["merkle_root"]
+    parts_dir = os.path.join(os.path.dirname(metadata_file), "..", "parts")
+    for entry in manifest["parts"]:
+        with open(os.path.join(parts_dir, entry["name"]), "rb") as part_file:
+            assert part_file.read() == parts[entry["index"]]
+
+
+@pytest.mark.parametrize("options", [
+    SplitOptions(chunking="cdc"),
+    SplitOptions(layout="pack"),
+    SplitOptions(parity_parts=1),
+    SplitOptions(sparse=True),
+    SplitOptions(chunk_size_kb="auto"),
+])
+def test_from_options_rejects_disk_features(options):
+    with pytest.raises(ValueError, match="Splitter"):
+        Splitter.from_options(DATA, options)
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError, match="кодировка"):
+        Splitter(DATA, encoding="base32")
+    with pytest.raises(ValueError, match="сжатия"):
+        Splitter(DATA, compression="zstd")
+    with pytest.raises(ValueError, match="файла на диске"):
+        Splitter(DATA, compression="auto")
+
+
+@pytest.fixture
+def split_parts():
+    splitter = Splitter(DATA, 8 * 1024, "base64")
+    return list(splitter), splitter.manifest
+
+
+def test_corrupt_part(split_parts):
+    parts, manifest = split_parts
+    index, part = parts[2]
+    parts[2] = (index, part[:-4] + b"AAAA")
+    with pytest.raises(ValueError, match="Часть 3 повреждена"):
+        merge(parts, io.BytesIO(), manifest=manifest)
+
+
+def test_missing_part(split_parts):
+    parts, manifest = split_parts
+    with pytest.raises(ValueError, match="Ожидалась часть 3, получена 4"):
+        merge(parts[:2] + parts[3:], io.BytesIO(), manifest=manifest)
+    with pytest.raises(ValueError, match="в манифесте: 7"):
+        merge(parts[:-1], io.BytesIO(), manifest=manifest)
+
+
+def test_reordered_parts(split_parts):
+    parts, manifest = split_parts
+    parts[1], parts[2] = parts[2], parts[1]
+    with pytest.raises(ValueError, match="Ожидалась часть 2, получена 3"):
+        merge(parts, io.BytesIO(), manifest=manifest)
+
+
+def test_foreign_part_content(split_parts):
+    """Часть, чей хэш подменён в манифесте вместе с ней, ловится по хэшу куска."""
+    parts, manifest = split_parts
+    parts[0] = (1, parts[1][1])
+    manifest["parts"][0]["part_sha256"] = manifest["parts"][1]["part_sha256"]
+    with pytest.raises(ValueError, match="хэш куска"):
+        merge(parts, io.BytesIO(), manifest=manifest)
@@ -0,0 +1,80 @@
+# test_batch.py
+# Пакетное разбиение и сборка (batch.py): круговой путь для дерева папок с
+# одноимёнными файлами, большие файлы по кускам в общем пуле и отчёт об ошибках.
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from modules.scripts import load_script
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def batch(*args):
+    return subprocess.run([sys.executable, os.path.join(ROOT, "batch.py"), *args],
+                          cwd=ROOT, capture_output=True, text=True)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """Папка ввода с подпапками и одноимёнными файлами: {относительный путь: байты}."""
+    files = {
+        "a.bin": os.urandom(300 * 1024),
+        os.path.join("sub", "a.bin"): os.urandom(40 * 1024),
+        os.path.join("sub", "deep", "b.txt"): b"hello\n" * 1000,
+        "empty.bin": b"",
+    }
+    for relative, data in files.items():
+        path = tmp_path / "input" / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return files
+
+
+@pytest.mark.parametrize("large_size", ["0", "64"], ids=["chunked", "whole"])
+def test_round_trip(tmp_path, tree, large_size):
+    """Все файлы дерева разбиваются и собираются по тем же подпапкам."""
+    result = batch("split", "--input", str(tmp_path / "input"), "--output", str(tmp_path / "output"),
+                   "--chunk-size", "64", "--workers", "2", "--large-size", large_size)
+    assert result.returncode == 0, result.stdout + result.stderr
+    report = json.loads((tmp_path / "output" / "batch_split_report.json").read_text())
+    assert report["files"] == report["succeeded"] == len(tree)
+
+    result = batch("merge", "--input", str(tmp_path / "output"), "--output", str(tmp_path / "merged"),
+                   "--workers", "2", "--large-size", large_size)
+    assert result.returncode == 0, result.stdout + result.stderr
+    for relative, data in tree.items():
+        assert (tmp_path / "merged" / relative).read_bytes() == data
+
+
+def test_collect_files_keeps_subdirectories(tmp_path, tree):
+    collect_files = load_script("batch.py").collect_files
+    found = {os.path.relpath(path, tmp_path / "input"): subdir for path, subdir in collect_files([str(tmp_path / "input")])}
+    assert found == {relative: os.path.dirname(relative) or "." for relative in tree}
+    pattern = str(tmp_path / "input" / "**" / "*.bin")
+    assert sorted(os.path.basename(path) for path, _ in collect_files([pattern])) == ["a.bin", "a.bin", "empty.bin"]
+
+
+def test_failed_merge_reported(tmp_path, tree):
+    """Файл с удалённой частью попадает в отчёт как ошибка, остальные собираются."""
+    batch("split", "--input", str(tmp_path / "input"), "--output", str(tmp_path / "output"),
+          "--chunk-size", "64", "--workers", "2")
+    parts_dir = next(root for root, _, names in os.walk(tmp_path / "output")
+                     if os.path.basename(root) == "parts" and len(names) == 5)
+    os.remove(os.path.join(parts_dir, sorted(os.listdir(parts_dir))[0]))
+
+    result = batch("merge", "--input", str(tmp_path / "output"), "--output", str(tmp_path / "merged"), "--workers", "2")
+    assert result.returncode == 1
+    report = json.loads((tmp_path / "merged" / "batch_merge_report.json").read_text())
+    assert report["succeeded"] == len(tree) - 1
+    assert len(report["failed"]) == 1
+    assert (tmp_path / "merged" / "sub" / "a.bin").read_bytes() == tree[os.path.join("sub", "a.bin")]
+
+
+def test_no_input(tmp_path):
+    (tmp_path / "input").mkdir()
+    result = batch("split", "--input", str(tmp_path / "input"), "--output", str(tmp_path / "output"))
+    assert result.returncode == 2
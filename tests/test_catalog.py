@@ -0,0 +1,155 @@
+# test_catalog.py
+# Каталог наборов частей (modules.catalog, catalog.py): запись разбиений и сборок,
+# поиск, удаление набора, пересборка обходом дерева и сборка мусора, в том числе
+# кусков общего хранилища cdc.
+import os
+import random
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from modules.catalog import Catalog, find_catalog
+from modules.options import SplitOptions
+from modules.scripts import load_script
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def split(tmp_path, name, data, options=None):
+    original = tmp_path / "input" / name
+    original.parent.mkdir(exist_ok=True)
+    original.write_bytes(data)
+    return load_script("separator-silence.py").split_file(
+        str(original), str(tmp_path / "output"), options or SplitOptions(chunk_size_kb=8))
+
+
+def catalog(tmp_path):
+    return Catalog(find_catalog(str(tmp_path / "output"), create=False))
+
+
+def files_under(directory):
+    return {os.path.join(root, name) for root, _, names in os.walk(directory) for name in names}
+
+
+@pytest.fixture
+def two_sets(tmp_path):
+    """Наборы video.bin (40 КБ) и notes.txt (10 КБ) в общем каталоге output."""
+    video = split(tmp_path, "video.bin", random.Random(1).randbytes(40 * 1024))
+    notes = split(tmp_path, "notes.txt", random.Random(2).randbytes(10 * 1024))
+    return video, notes
+
+
+def test_find(tmp_path, two_sets):
+    video, notes = two_sets
+    with catalog(tmp_path) as split_catalog:
+        assert [split_set["file_name"] for split_set in split_catalog.find()] == ["notes.txt", "video.bin"]
+        video_set, = split_catalog.find(name="VIDEO")
+        assert video_set["metadata_path"] == os.path.relpath(video, tmp_path / "output")
+        assert video_set["part_count"] == 5 and video_set["original_size"] == 40 * 1024
+
+        for hash_prefix in (video_set["md5"][:8], video_set["merkle_root"][:8].upper(),
+                            split_catalog.parts(video_set["id"])[3]["chunk_sha256"][:10]):
+            assert [split_set["id"] for split_set in split_catalog.find(hash_prefix=hash_prefix)] == [video_set["id"]]
+        assert [split_set["file_name"] for split_set in split_catalog.find(min_size=20 * 1024)] == ["video.bin"]
+        assert [split_set["file_name"] for split_set in split_catalog.find(max_size=20 * 1024)] == ["notes.txt"]
+        today = video_set["created_at"][:10]
+        assert len(split_catalog.find(since=today, until=today)) == 2
+        assert split_catalog.find(until="2000-01-01") == []
+        # Подстановочные символы LIKE ищутся буквально
+        assert split_catalog.find(name="%") == [] and split_catalog.find(name="_") == []
+
+
+def test_merge_history(tmp_path, two_sets):
+    video, _ = two_sets
+    os.makedirs(tmp_path / "merged")
+    output_path = load_script("merge_parts-silence.py").merge_file(video, str(tmp_path / "merged"))
+    with catalog(tmp_path) as split_catalog:
+        video_set = split_catalog.get(video)
+        merge, = split_catalog.merges(video_set["id"])
+        assert merge["output_path"] == os.path.abspath(output_path)
+        assert merge["md5"] == video_set["md5"]
+
+
+def test_delete(tmp_path, two_sets):
+    """Удаление набора убирает части, метаданные и папку набора; другой набор не затронут."""
+    video, notes = two_sets
+    set_dir = os.path.dirname(os.path.dirname(video))
+    before = files_under(os.path.dirname(os.path.dirname(notes)))
+    with catalog(tmp_path) as split_catalog:
+        removed, freed = split_catalog.delete(os.path.basename(set_dir))
+        assert removed == 5 + 2 and freed > 40 * 1024
+        with pytest.raises(KeyError, match="Набор не найден"):
+            split_catalog.get(video)
+        assert [split_set["file_name"] for split_set in split_catalog.find()] == ["notes.txt"]
+    assert not os.path.exists(set_dir)
+    assert files_under(os.path.dirname(os.path.dirname(notes))) == before
+
+
+def test_rebuild(tmp_path, two_sets):
+    """Каталог собирается заново по дереву; набор, удалённый с диска вручную, убирается из каталога."""
+    video, notes = two_sets
+    os.remove(tmp_path / "output" / "catalog.sqlite3")
+    shutil.rmtree(os.path.dirname(os.path.dirname(notes)))
+    with Catalog(str(tmp_path / "output" / "catalog.sqlite3")) as split_catalog:
+        assert split_catalog.rebuild(workers=2) == (1, 0, [])
+        video_set, = split_catalog.find()
+        assert len(split_catalog.parts(video_set["id"])) == 5
+
+    split(tmp_path, "notes.txt", b"again")
+    shutil.rmtree(os.path.dirname(os.path.dirname(video)))
+    with catalog(tmp_path) as split_catalog:
+        assert split_catalog.rebuild() == (1, 1, [])
+
+
+def test_orphans(tmp_path, two_sets):
+    """Части прежнего разбиения тем же именем и прерванного разбиения без журнала — мусор."""
+    video, _ = two_sets
+    split(tmp_path, "video.bin", random.Random(1).randbytes(40 * 1024), SplitOptions(chunk_size_kb=16))
+    abandoned = tmp_path / "output" / "lost_12345" / "parts"
+    abandoned.mkdir(parents=True)
+    (abandoned / "lost_part_1.txt").write_text("x")
+    resumable = tmp_path / "output" / "keep_12345"
+    (resumable / "parts").mkdir(parents=True)
+    (resumable / "json").mkdir()
+    (resumable / "parts" / "keep_part_1.txt").write_text("x")
+    (resumable / "json" / "keep.journal").write_text("{}")
+
+    with catalog(tmp_path) as split_catalog:
+        split_catalog.rebuild()
+        assert split_catalog.orphans() == []
+        orphans = split_catalog.orphans(min_age=0)
+    parts_dir = os.path.join(os.path.dirname(video), "..", "parts")
+    # 40 КБ по 16 КБ — 3 части; старые части 4 и 5 от разбиения по 8 КБ
+    assert len(orphans) == 3
+    assert str(abandoned / "lost_part_1.txt") in orphans
+    assert sum(os.path.samefile(os.path.dirname(path), parts_dir) for path in orphans) == 2
+
+
+def test_gc_cdc_store(tmp_path):
+    """catalog.py gc освобождает куски хранилища только удалённого набора cdc, общие куски остаются."""
+    shared = random.Random(3).randbytes(64 * 1024)
+    options = SplitOptions(chunk_size_kb=8, chunking="cdc")
+    first = split(tmp_path, "first.bin", shared + random.Random(4).randbytes(64 * 1024), options)
+    second = split(tmp_path, "second.bin", shared, options)
+    store = tmp_path / "output" / "store"
+    stored = files_under(store)
+
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "catalog.py"), "delete", "--output",
+                             str(tmp_path / "output"), os.path.basename(os.path.dirname(os.path.dirname(first)))],
+                            cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert files_under(store) == stored
+
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "catalog.py"), "gc", "--output",
+                             str(tmp_path / "output"), "--min-age", "0", "--workers", "1"],
+                            cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    remaining = files_under(store)
+    assert remaining < stored
+
+    os.makedirs(tmp_path / "merged")
+    output_path = load_script("merge_parts-silence.py").merge_file(second, str(tmp_path / "merged"))
+    with open(output_path, "rb") as merged_file:
+        assert merged_file.read() == shared
@@ -0,0 +1,97 @@
+# test_cdc.py
+# Разбиение по содержимому (modules.cdc): устойчивые границы кусков, пределы
+# min/max, дедупликация в общем хранилище и сборка файлов, разбитых с --chunking cdc.
+import io
+import os
+import random
+
+import pytest
+
+from modules.cdc import chunk_bounds, iter_cdc_chunks
+from modules.options import SplitOptions
+from modules.scripts import load_script
+
+MIN_SIZE, AVG_SIZE, MAX_SIZE = chunk_bounds(4096)
+
+
+def random_bytes(size, seed):
+    return random.Random(seed).randbytes(size)
+
+
+def cut_offsets(data):
+    return [offset for offset, _ in iter_cdc_chunks(io.BytesIO(data), MIN_SIZE, AVG_SIZE, MAX_SIZE)]
+
+
+def test_chunks_cover_input_within_bounds():
+    """Куски идут подряд, покрывают весь поток и, кроме последнего, лежат в пределах min..max."""
+    data = random_bytes(300 * 1024, 1) + bytes(64 * 1024)
+    chunks = list(iter_cdc_chunks(io.BytesIO(data), MIN_SIZE, AVG_SIZE, MAX_SIZE))
+    assert b"".join(chunk for _, chunk in chunks) == data
+    offset = 0
+    for chunk_offset, chunk in chunks:
+        assert chunk_offset == offset
+        offset += len(chunk)
+    assert all(MIN_SIZE <= len(chunk) <= MAX_SIZE for _, chunk in chunks[:-1])
+    # Нули не дают срезов по хэшу: длинный повтор режется по max_size
+    assert MAX_SIZE in {len(chunk) for _, chunk in chunks}
+
+
+def test_cut_points_survive_insert():
+    """Вставка в начало сдвигает границы, но не меняет куски после места вставки."""
+    data = random_bytes(200 * 1024, 2)
+    offsets = cut_offsets(data)
+    assert offsets == cut_offsets(data)
+
+    shifted = cut_offsets(b"inserted" + data)
+    common = set(offsets) & {offset - len(b"inserted") for offset in shifted}
+    assert len(common) >= len(offsets) - 2
+
+
+def test_chunk_bounds_invalid():
+    with pytest.raises(ValueError, match="min <= avg <= max"):
+        chunk_bounds(4096, min_size=8192)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_dedup_and_round_trip(tmp_path, workers):
+    """Повторное разбиение того же содержимого не пишет новых кусков, оба файла собираются."""
+    block = random_bytes(96 * 1024, 3)
+    first = tmp_path / "first.bin"
+    first.write_bytes(block * 2)
+    second = tmp_path / "second.bin"
+    second.write_bytes(b"prefix" + block * 2)
+
+    split_file = load_script("separator-silence.py").split_file
+    merge_file = load_script("merge_parts-silence.py").merge_file
+    options = SplitOptions(chunk_size_kb=8, chunking="cdc")
+    store = tmp_path / "output" / "store" / "base64"
+
+    first_metadata = split_file(str(first), str(tmp_path / "output"), options, workers)
+    stored = sum(len(files) for _, _, files in os.walk(store))
+    second_metadata = split_file(str(second), str(tmp_path / "output"), options, workers)
+    added = sum(len(files) for _, _, files in os.walk(store)) - stored
+    # Повтор внутри файла и общее со вторым файлом хранятся один раз
+    assert added <= 3
+
+    for metadata_file, original in ((first_metadata, first), (second_metadata, second)):
+        merged = tmp_path / f"merged_{original.stem}"
+        os.makedirs(merged)
+        output_path = merge_file(metadata_file, str(merged), workers)
+        assert output_path is not None
+        with open(output_path, "rb") as merged_file:
+            assert merged_file.read() == original.read_bytes()
+
+
+def test_missing_store_part(tmp_path):
+    """Удалённый из хранилища кусок — ошибка сборки, а не неполный файл."""
+    original = tmp_path / "data.bin"
+    original.write_bytes(random_bytes(64 * 1024, 4))
+    metadata_file = load_script("separator-silence.py").split_file(
+        str(original), str(tmp_path / "output"), SplitOptions(chunk_size_kb=8, chunking="cdc"))
+    store = tmp_path / "output" / "store" / "base64"
+    victim = next(os.path.join(root, files[0]) for root, _, files in os.walk(store) if files)
+    os.remove(victim)
+
+    os.makedirs(tmp_path / "merged")
+    assert load_script("merge_parts-silence.py").merge_file(metadata_file, str(tmp_path / "merged")) is None
+    assert not (tmp_path / "merged" / "data.bin").exists()
@@ -0,0 +1,104 @@
+# test_manifest.py
+# Манифест частей и дерево Меркла (modules.manifest) и проверка частей verify_parts.py:
+# отсутствующие и повреждённые части, подмена манифеста, доказательства включения
+# выбранных частей в корень --root.
+import json
+import os
+
+import pytest
+
+from modules.manifest import merkle_proof, merkle_root, verify_proof
+from modules.options import SplitOptions
+from modules.scripts import load_script
+
+
+@pytest.fixture
+def split_set(tmp_path):
+    """Разбиение 100 КБ кусками по 16 КБ (7 частей): (путь к метаданным, манифест)."""
+    original = tmp_path / "data.bin"
+    original.write_bytes(os.urandom(100 * 1024))
+    metadata_file = load_script("separator-silence.py").split_file(
+        str(original), str(tmp_path / "output"), SplitOptions(chunk_size_kb=16))
+    manifest_path = metadata_file[:-len(".json")] + ".manifest.json"
+    return metadata_file, load_script("merge_parts-silence.py").load_manifest(manifest_path)
+
+
+def part_path(metadata_file, manifest, index):
+    return os.path.join(os.path.dirname(metadata_file), "..", "parts", manifest["parts"][index - 1]["name"])
+
+
+def test_verify_missing_and_corrupt(split_set):
+    """Отсутствующая и повреждённая части находятся по манифесту, остальные проходят проверку."""
+    metadata_file, manifest = split_set
+    verify_parts = load_script("verify_parts.py")
+    assert verify_parts.check(metadata_file)["bad_parts"] == {}
+
+    os.remove(part_path(metadata_file, manifest, 2))
+    with open(part_path(metadata_file, manifest, 5), "r+b") as part_file:
+        part_file.write(b"!")
+    result = verify_parts.check(metadata_file, workers=2)
+    assert result["checked"] == 7
+    assert result["bad_parts"] == {2: "missing", 5: "corrupt"}
+    assert verify_parts.check(metadata_file, "3-4")["bad_parts"] == {}
+
+
+def test_decode_finds_swapped_content(split_set):
+    """Часть с верным хэшем части, но чужим куском ловится только декодированием (--decode)."""
+    metadata_file, manifest = split_set
+    manifest_path = metadata_file[:-len(".json")] + ".manifest.json"
+    manifest["parts"][0]["chunk_sha256"] = manifest["parts"][1]["chunk_sha256"]
+    manifest["merkle_root"] = merkle_root(manifest["parts"])
+    with open(manifest_path, "w") as manifest_out:
+        json.dump(manifest, manifest_out)
+
+    verify_parts = load_script("verify_parts.py")
+    assert verify_parts.check(manifest_path)["bad_parts"] == {}
+    assert verify_parts.check(manifest_path, decode=True)["bad_parts"] == {1: "corrupt"}
+
+
+def test_tampered_manifest(split_set, tmp_path):
+    """Хэш части, изменённый без пересчёта корня, отклоняется и проверкой, и сборкой."""
+    metadata_file, manifest = split_set
+    manifest_path = metadata_file[:-len(".json")] + ".manifest.json"
+    manifest["parts"][3]["part_sha256"] = manifest["parts"][4]["part_sha256"]
+    with open(manifest_path, "w") as manifest_out:
+        json.dump(manifest, manifest_out)
+
+    with pytest.raises(ValueError, match="Корень дерева Меркла"):
+        load_script("verify_parts.py").check(metadata_file)
+    os.makedirs(tmp_path / "merged")
+    assert load_script("merge_parts-silence.py").merge_file(metadata_file, str(tmp_path / "merged")) is None
+
+
+@pytest.mark.parametrize("count", [1, 2, 5, 7, 8])
+def test_proofs_for_every_leaf(count):
+    """Доказательство каждого листа сходится к корню при любом числе листьев, в том числе непарном."""
+    entries = [{"part_sha256": f"{index:064x}", "chunk_sha256": f"{index * 7:064x}"} for index in range(count)]
+    root = merkle_root(entries)
+    for position, entry in enumerate(entries):
+        assert verify_proof(entry, merkle_proof(entries, position), root)
+    forged = dict(entries[0], chunk_sha256="f" * 64)
+    assert not verify_proof(forged, merkle_proof(entries, 0), root)
+
+
+def test_verify_subset_with_proofs(split_set):
+    """--parts с --root: выбранные части проверяются, доказательства сходятся к корню без манифеста."""
+    metadata_file, manifest = split_set
+    result = load_script("verify_parts.py").check(metadata_file, "2-3,7", root=manifest["merkle_root"])
+    assert result["checked"] == 3
+    assert not result["bad_parts"]
+    assert sorted(result["proofs"]) == [2, 3, 7]
+    for proof in result["proofs"].values():
+        assert verify_proof(proof["entry"], proof["proof"], manifest["merkle_root"])
+
+
+def test_verify_subset_wrong_root(split_set):
+    """Часть, не входящая в ожидаемый корень, и отсутствующий номер части — ошибка проверки."""
+    metadata_file, manifest = split_set
+    verify_parts = load_script("verify_parts.py")
+    with pytest.raises(ValueError, match="не входит"):
+        verify_parts.check(metadata_file, "2", root="0" * 64)
+    with pytest.raises(ValueError, match="нет в манифесте"):
+        verify_parts.check(metadata_file, "99", root=manifest["merkle_root"])
+    with pytest.raises(ValueError, match="не совпадает"):
+        verify_parts.check(metadata_file, root="0" * 64)
@@ -0,0 +1,112 @@
+# test_parity.py
+# Контрольные части (modules.parity, --parity): восстановление отсутствующих,
+# повреждённых и обрезанных частей при сборке по XOR и Рида — Соломону и отказ,
+# когда потерь в полосе больше, чем контрольных частей.
+import os
+import random
+from itertools import combinations
+
+import pytest
+
+from modules.options import SplitOptions
+from modules.parity import coefficient, gf_invert_matrix, gf_mul
+from modules.scripts import load_script
+
+# 10 кусков по 8 КБ, последний короче: полосы по 4 куска — 4, 4 и 2
+DATA = random.Random(16).randbytes(75 * 1024 + 5)
+
+
+def split(tmp_path, parity_parts, workers=1):
+    original = tmp_path / "data.bin"
+    original.write_bytes(DATA)
+    options = SplitOptions(chunk_size_kb=8, parity_parts=parity_parts, stripe_size=4)
+    metadata_file = load_script("separator-silence.py").split_file(str(original), str(tmp_path / "output"),
+                                                                     options, workers)
+    parts_dir = os.path.join(os.path.dirname(metadata_file), "..", "parts")
+    manifest = load_script("merge_parts-silence.py").load_manifest(metadata_file[:-len(".json")] + ".manifest.json")
+    return metadata_file, parts_dir, manifest
+
+
+def damage(parts_dir, manifest, index, how):
+    path = os.path.join(parts_dir, manifest["parts"][index - 1]["name"])
+    if how == "missing":
+        os.remove(path)
+    elif how == "corrupt":
+        with open(path, "r+b") as part_file:
+            part_file.seek(100)
+            part_file.write(b"AAAA")
+    elif how == "truncated":
+        with open(path, "r+b") as part_file:
+            part_file.truncate(os.path.getsize(path) // 2)
+
+
+def merge(tmp_path, metadata_file, workers=1):
+    merged = tmp_path / "merged"
+    os.makedirs(merged, exist_ok=True)
+    return load_script("merge_parts-silence.py").merge_file(metadata_file, str(merged), workers)
+
+
+@pytest.mark.parametrize("how", ["missing", "corrupt", "truncated"])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_xor_repairs_one_loss_per_stripe(tmp_path, how, workers):
+    """По одной потере в каждой полосе, в том числе в короткой последней, восстанавливается XOR."""
+    metadata_file, parts_dir, manifest = split(tmp_path, 1, workers)
+    assert manifest["parity"]["algorithm"] == "xor"
+    for index in (2, 8, 10):
+        damage(parts_dir, manifest, index, how)
+    output_path = merge(tmp_path, metadata_file, workers)
+    assert output_path is not None
+    with open(output_path, "rb") as merged_file:
+        assert merged_file.read() == DATA
+
+
+def test_xor_two_losses_in_stripe_fail(tmp_path):
+    """Две потери в одной полосе XOR не восстановить: сборка завершается ошибкой без файла."""
+    metadata_file, parts_dir, manifest = split(tmp_path, 1)
+    damage(parts_dir, manifest, 5, "missing")
+    damage(parts_dir, manifest, 7, "corrupt")
+    assert merge(tmp_path, metadata_file) is None
+    assert not (tmp_path / "merged" / "data.bin").exists()
+
+
+def test_rs_repairs_two_losses_per_stripe(tmp_path):
+    """Рид — Соломон с двумя контрольными частями восстанавливает любые две потери полосы."""
+    metadata_file, parts_dir, manifest = split(tmp_path, 2)
+    assert manifest["parity"]["algorithm"] == "rs"
+    damage(parts_dir, manifest, 1, "missing")
+    damage(parts_dir, manifest, 4, "truncated")
+    damage(parts_dir, manifest, 6, "corrupt")
+    damage(parts_dir, manifest, 7, "missing")
+    damage(parts_dir, manifest, 9, "corrupt")
+    output_path = merge(tmp_path, metadata_file)
+    assert output_path is not None
+    with open(output_path, "rb") as merged_file:
+        assert merged_file.read() == DATA
+
+
+def test_rs_lost_parity_part(tmp_path):
+    """Потерянная контрольная часть — тоже потеря полосы: вторая ещё восстанавливает кусок."""
+    metadata_file, parts_dir, manifest = split(tmp_path, 2)
+    os.remove(os.path.join(parts_dir, manifest["parity"]["parts"][0]["name"]))
+    damage(parts_dir, manifest, 2, "missing")
+    assert merge(tmp_path, metadata_file) is not None
+
+
+def test_rs_three_losses_fail(tmp_path):
+    metadata_file, parts_dir, manifest = split(tmp_path, 2)
+    for index in (1, 2, 3):
+        damage(parts_dir, manifest, index, "missing")
+    assert merge(tmp_path, metadata_file) is None
+
+
+@pytest.mark.parametrize("parity_parts", [2, 3, 4])
+def test_cauchy_submatrices_invertible(parity_parts):
+    """Любая квадратная подматрица 2 x 2 матрицы Коши для полосы из 4 кусков обратима."""
+    matrix = [[coefficient(p, j, parity_parts) for j in range(4)] for p in range(parity_parts)]
+    for rows in combinations(range(parity_parts), 2):
+        for columns in combinations(range(4), 2):
+            sub = [[matrix[row][column] for column in columns] for row in rows]
+            inverse = gf_invert_matrix(sub)
+            for i in range(2):
+                for j in range(2):
+                    assert gf_mul(sub[i][0], inverse[0][j]) ^ gf_mul(sub[i][1], inverse[1][j]) == int(i == j)
@@ -0,0 +1,97 @@
+# test_planner.py
+# Выбор размера куска для --chunk-size auto (modules.planner): границы числа
+# частей, кратность блоку, кэш замера и разбиение с auto.
+import argparse
+import json
+import os
+import time
+
+import pytest
+
+from modules.options import SplitOptions
+from modules.planner import (MAX_CHUNK_KB, MAX_PARTS, MIN_CHUNK_KB, block_size, cached_throughput, chunk_size_arg,
+                             choose_chunk_size)
+from modules.scripts import load_script
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def bench(tmp_path, monkeypatch):
+    """Кэш с готовым замером для tmp_path: выбор детерминирован и не пишет на диск выборку."""
+    cache = tmp_path / "cache.json"
+    monkeypatch.setenv("SEPARATOR_CACHE", str(cache))
+    entry = {"mb_s": 100.0, "part_overhead_ms": 0.1, "measured_at": int(time.time())}
+    cache.write_text(json.dumps({f"base64:{os.stat(tmp_path).st_dev}": entry}))
+    return entry
+
+
+def test_chunk_size_arg():
+    assert chunk_size_arg("auto") == "auto"
+    assert chunk_size_arg("128") == 128
+    for value in ("0", "-5", "big"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            chunk_size_arg(value)
+
+
+def test_lower_bound_from_overhead(tmp_path, bench):
+    """Без ограничений по числу частей кусок — наименьший, при котором расходы на часть не больше 5%."""
+    chunk_kb, summary = choose_chunk_size(None, str(tmp_path), "base64")
+    # 0.1 мс * 100 МБ/с = 10 КБ на часть, 5% от куска — 200 КБ
+    assert chunk_kb >= 200
+    assert chunk_kb % max(1, block_size(str(tmp_path)) // 1024) == 0
+    assert summary["reason"] == "расходы на создание части"
+    assert summary["benchmark"]["cached"] and summary["parts"] is None
+
+
+def test_part_count_bounds(tmp_path, bench):
+    chunk_kb, summary = choose_chunk_size(100 * 1024 * MB, str(tmp_path), "base64")
+    assert summary["parts"] <= MAX_PARTS
+    assert summary["reason"] == f"не больше {MAX_PARTS} частей"
+
+    chunk_kb, summary = choose_chunk_size(64 * MB, str(tmp_path), "base64", workers=8)
+    assert summary["parts"] >= 32
+    assert chunk_kb >= MIN_CHUNK_KB
+
+    # Маленький файл не дробится мельче MIN_CHUNK_KB ради числа частей
+    chunk_kb, summary = choose_chunk_size(MB, str(tmp_path), "base64", workers=8)
+    assert chunk_kb >= MIN_CHUNK_KB and summary["parts"] < 32
+
+    chunk_kb, summary = choose_chunk_size(10 ** 7 * MB, str(tmp_path), "base64")
+    assert chunk_kb == MAX_CHUNK_KB
+    assert summary["reason"] == "максимальный размер куска"
+
+
+def test_measures_and_caches(tmp_path, monkeypatch):
+    """Без кэша замер выполняется, сохраняется и при следующем выборе берётся из кэша."""
+    monkeypatch.setenv("SEPARATOR_CACHE", str(tmp_path / "nested" / "cache.json"))
+    entry, cached = cached_throughput(str(tmp_path), "hex")
+    assert not cached and entry["mb_s"] > 0 and entry["part_overhead_ms"] >= 0
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".chunk-bench-")]
+    assert cached_throughput(str(tmp_path), "hex") == (entry, True)
+
+    # Просроченный замер повторяется
+    cache = json.loads((tmp_path / "nested" / "cache.json").read_text())
+    for stale in cache.values():
+        stale["measured_at"] = 0
+    (tmp_path / "nested" / "cache.json").write_text(json.dumps(cache))
+    assert not cached_throughput(str(tmp_path), "hex")[1]
+
+
+def test_split_auto(tmp_path, bench):
+    """Разбиение с auto записывает выбранный размер и сводку в метаданные и собирается."""
+    original = tmp_path / "data.bin"
+    original.write_bytes(os.urandom(3 * MB))
+    output = tmp_path / "output"
+    output.mkdir()
+    metadata_file = load_script("separator-silence.py").split_file(
+        str(original), str(output), SplitOptions(chunk_size_kb="auto"), workers=2)
+    with open(metadata_file) as metadata_in:
+        metadata = json.load(metadata_in)
+    assert metadata["chunk_size"] == metadata["chunk_size_auto"]["chunk_size_kb"]
+    assert metadata["part_count"] == metadata["chunk_size_auto"]["parts"]
+
+    os.makedirs(tmp_path / "merged")
+    output_path = load_script("merge_parts-silence.py").merge_file(metadata_file, str(tmp_path / "merged"))
+    with open(output_path, "rb") as merged_file:
+        assert merged_file.read() == original.read_bytes()
@@ -0,0 +1,79 @@
+# test_reader.py
+# Чтение разбитого файла без сборки (modules.reader): произвольные read/seek
+# против исходных байтов для фиксированных кусков, cdc и контейнеров, кэш и
+# отказ на повреждённой части.
+import os
+import random
+
+import pytest
+
+from modules.options import SplitOptions
+from modules.reader import PartReader, open_parts
+from modules.scripts import load_script
+
+DATA = random.Random(7).randbytes(150 * 1024 + 77)
+
+
+def split(tmp_path, options):
+    original = tmp_path / "data.bin"
+    original.write_bytes(DATA)
+    return load_script("separator-silence.py").split_file(str(original), str(tmp_path / "output"), options)
+
+
+@pytest.mark.parametrize("options", [
+    SplitOptions(chunk_size_kb=16),
+    SplitOptions(chunk_size_kb=16, compression="zlib", encoding="base85"),
+    SplitOptions(chunk_size_kb=8, chunking="cdc"),
+    SplitOptions(chunk_size_kb=16, layout="pack", pack_size_mb=1),
+], ids=["fixed", "zlib", "cdc", "pack"])
+@pytest.mark.parametrize("buffering", [0, 4096])
+def test_random_reads(tmp_path, options, buffering):
+    """Чтение с произвольных позиций через границы частей совпадает с исходным файлом."""
+    metadata_file = split(tmp_path, options)
+    rng = random.Random(1)
+    with open_parts(metadata_file, buffering, cache_bytes=32 * 1024) as reader:
+        assert reader.read() == DATA
+        for _ in range(50):
+            start = rng.randrange(len(DATA))
+            size = rng.randrange(1, 40 * 1024)
+            assert reader.seek(start) == start
+            assert reader.read(size) == DATA[start:start + size]
+        reader.seek(-100, os.SEEK_END)
+        assert reader.read() == DATA[-100:]
+        reader.seek(len(DATA) + 10)
+        assert reader.read(10) == b""
+
+
+def test_seek_whence_and_cache_limit(tmp_path):
+    metadata_file = split(tmp_path, SplitOptions(chunk_size_kb=16))
+    with PartReader(metadata_file, cache_bytes=20 * 1024, read_ahead=0) as reader:
+        reader.seek(100)
+        assert reader.seek(50, os.SEEK_CUR) == 150
+        assert reader.read(10) == DATA[150:160]
+        reader.seek(40 * 1024)
+        reader.read(10)
+        # В кэше больше одного куска не помещается
+        assert len(reader.cache) == 1
+        assert reader.cached_bytes <= 16 * 1024
+        with pytest.raises(ValueError, match="Отрицательная"):
+            reader.seek(-1)
+        with pytest.raises(ValueError, match="whence"):
+            reader.seek(0, 5)
+
+
+def test_corrupt_part(tmp_path):
+    """Повреждённая часть — ValueError при чтении её байтов, остальные части читаются."""
+    metadata_file = split(tmp_path, SplitOptions(chunk_size_kb=16))
+    manifest = load_script("merge_parts-silence.py").load_manifest(metadata_file[:-len(".json")] + ".manifest.json")
+    part_path = os.path.join(os.path.dirname(metadata_file), "..", "parts", manifest["parts"][2]["name"])
+    with open(part_path, "r+b") as part_file:
+        part_file.write(b"AAAA")
+
+    with open_parts(metadata_file, 0) as reader:
+        assert reader.read(16 * 1024) == DATA[:16 * 1024]
+        reader.seek(2 * 16 * 1024 + 5)
+        with pytest.raises(ValueError, match="Часть 3 повреждена"):
+            reader.read(10)
+    with open_parts(metadata_file, 0, verify=False) as reader:
+        reader.seek(2 * 16 * 1024)
+        assert reader.read(16 * 1024) != DATA[2 * 16 * 1024:3 * 16 * 1024]
@@ -0,0 +1,180 @@
+# test_remote.py
+# Хранилище частей по HTTP (modules.sinks.serve_parts): раздача и сбор частей
+# (distribute/gather_parts) и сборка по --parts-url для раскладок files и pack.
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from modules.options import SplitOptions
+from modules.sinks import HttpSink, PartStoreHandler, distribute, gather_parts, serve_parts
+from modules.scripts import load_script
+
+LAYOUTS = ["files", "pack"]
+
+
+class FlakyHandler(PartStoreHandler):
+    """Первый GET каждого пути отвечает 503, следующие — как обычное хранилище."""
+
+    failed = set()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            first = self.path not in self.failed
+            self.failed.add(self.path)
+        if first:
+            self.send_error(503)
+            return
+        super().do_GET()
+
+
+class MemorySink:
+    """Хранилище частей в памяти: каждая запись занимает delay секунд."""
+
+    def __init__(self, delay, concurrency=2):
+        self.delay = delay
+        self.concurrency = concurrency
+        self.parts = {}
+
+    async def put(self, name, data):
+        await asyncio.sleep(self.delay)
+        self.parts[name] = data
+
+    async def get(self, name):
+        return self.parts[name]
+
+
+@pytest.fixture
+def start_server():
+    servers = []
+
+    def start(directory, handler=PartStoreHandler):
+        server = serve_parts(str(directory))
+        server.RequestHandlerClass = handler
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        host, port = server.server_address
+        return f"http://{host}:{port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(params=LAYOUTS)
+def split_set(request, tmp_path):
+    """Разбиение 300 КБ данных кусками по 64 КБ: (исходный файл, метаданные, папка частей, манифест)."""
+    layout = request.param
+    original = tmp_path / "data.bin"
+    original.write_bytes(os.urandom(150 * 1024) + bytes(range(256)) * 600)
+    metadata_file = load_script("separator-silence.py").split_file(
+        str(original), str(tmp_path / "output"), SplitOptions(chunk_size_kb=64, layout=layout))
+    json_dir = os.path.dirname(metadata_file)
+    manifest_name = [name for name in os.listdir(json_dir) if name.endswith(".manifest.json")][0]
+    manifest = load_script("merge_parts-silence.py").load_manifest(os.path.join(json_dir, manifest_name))
+    assert manifest["layout"] == layout
+    return original, metadata_file, os.path.join(json_dir, "../parts"), manifest
+
+
+def stored_files(parts_dir):
+    """Файлы частей (или контейнеров .pack) набора: имя относительно папки -> содержимое."""
+    files = {}
+    for root, _, names in os.walk(parts_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, "rb") as stored:
+                files[os.path.relpath(path, parts_dir)] = stored.read()
+    return files
+
+
+def stored_manifest(names):
+    """Манифест для gather_parts по именам файлов: у контейнера .pack одна запись на файл."""
+    return {"parts": [{"index": index, "name": name} for index, name in enumerate(names, start=1)]}
+
+
+async def gather(manifest, sinks, **kwargs):
+    return [item async for item in gather_parts(manifest, sinks, **kwargs)]
+
+
+def merge_from_url(metadata_file, output_dir, url):
+    os.makedirs(output_dir, exist_ok=True)
+    return load_script("merge_parts-silence.py").merge_file(
+        metadata_file, str(output_dir), parts_url=f"{url}/{{name}}")
+
+
+def test_distribute_gather_round_trip(split_set, start_server, tmp_path):
+    """Части набора раздаются PUT-ами, читаются обратно и собираются по --parts-url из того же хранилища."""
+    original, metadata_file, parts_dir, _ = split_set
+    files = stored_files(parts_dir)
+    names = sorted(files)
+    url = start_server(tmp_path / "store")
+    sink = HttpSink(url, concurrency=4)
+
+    stats = asyncio.run(distribute(((index, files[name]) for index, name in enumerate(names, start=1)),
+                                   [sink], name=lambda index: names[index - 1]))
+    assert stats[sink]["parts"] == len(names)
+    assert stats[sink]["bytes"] == sum(len(data) for data in files.values())
+
+    gathered = asyncio.run(gather(stored_manifest(names), [sink]))
+    assert [data for _, data in gathered] == [files[name] for name in names]
+
+    output_path = merge_from_url(metadata_file, tmp_path / "merged", url)
+    assert open(output_path, "rb").read() == original.read_bytes()
+
+
+def test_merge_from_parts_url(split_set, start_server, tmp_path):
+    """Сборка по --parts-url из папки частей: части контейнеров читаются по Range."""
+    original, metadata_file, parts_dir, _ = split_set
+    output_path = merge_from_url(metadata_file, tmp_path / "merged", start_server(parts_dir))
+    assert output_path == str(tmp_path / "merged" / "data.bin")
+    assert open(output_path, "rb").read() == original.read_bytes()
+
+
+def test_missing_part(split_set, start_server, tmp_path):
+    """Отсутствующая часть (404) не повторяется: сборка не завершается, файл не появляется."""
+    _, metadata_file, parts_dir, manifest = split_set
+    os.remove(os.path.join(parts_dir, manifest["parts"][1]["name"]))
+    url = start_server(parts_dir)
+
+    with pytest.raises(OSError, match="недоступна"):
+        asyncio.run(gather(manifest, [HttpSink(url)], retries=3, retry_delay=0))
+    assert merge_from_url(metadata_file, tmp_path / "merged", url) is None
+    assert not os.path.exists(tmp_path / "merged" / "data.bin")
+
+
+def test_retry_on_503(split_set, start_server, tmp_path):
+    """Ответ 503 повторяется: и gather_parts, и сборка по --parts-url получают все части."""
+    original, metadata_file, parts_dir, _ = split_set
+    files = stored_files(parts_dir)
+    names = sorted(files)
+    FlakyHandler.failed.clear()
+    url = start_server(parts_dir, FlakyHandler)
+
+    gathered = asyncio.run(gather(stored_manifest(names), [HttpSink(url)], retry_delay=0))
+    assert [data for _, data in gathered] == [files[name] for name in names]
+
+    FlakyHandler.failed.clear()
+    output_path = merge_from_url(metadata_file, tmp_path / "merged", url)
+    assert open(output_path, "rb").read() == original.read_bytes()
+
+
+def test_distribute_fan_out():
+    """Медленное и быстрое хранилища пишутся одновременно: время — как у медленного, а не сумма, байты одинаковые."""
+    parts = [(index, os.urandom(1024)) for index in range(1, 41)]
+
+    def elapsed(sinks):
+        start = time.perf_counter()
+        asyncio.run(distribute(parts, sinks))
+        return time.perf_counter() - start
+
+    slow_alone = elapsed([MemorySink(0.02)])
+    fast_alone = elapsed([MemorySink(0.01)])
+    slow, fast = MemorySink(0.02), MemorySink(0.01)
+    both = elapsed([slow, fast])
+
+    assert both < slow_alone + fast_alone * 0.5
+    assert slow.parts == fast.parts == {f"part_{index}.txt": data for index, data in parts}
@@ -0,0 +1,118 @@
+# test_resume.py
+# Продолжение прерванных запусков (--resume, modules.journal): разбиение
+# продолжается по журналу готовых частей с удалением .tmp, сборка — по журналу
+# и .partial; части, не совпавшие с хэшами, обрабатываются заново.
+import glob
+import os
+import random
+
+import pytest
+
+from modules.options import SplitOptions
+from modules.progress_events import ProgressEmitter
+from modules.scripts import load_script
+
+# 20 кусков по 8 КБ
+DATA = random.Random(20).randbytes(160 * 1024)
+
+
+class Interrupt(ProgressEmitter):
+    """Прерывает запуск (как Ctrl+C) после after событий part; считает события."""
+
+    def __init__(self, after=None):
+        super().__init__()
+        self.after = after
+        self.parts = []
+
+    def part(self, index, done_bytes):
+        self.parts.append(index)
+        if self.after is not None and len(self.parts) >= self.after:
+            raise KeyboardInterrupt
+
+
+@pytest.fixture
+def original(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(DATA)
+    return path
+
+
+def split(original, tmp_path, progress, resume=False, workers=1):
+    return load_script("separator-silence.py").split_file(
+        str(original), str(tmp_path / "output"), SplitOptions(chunk_size_kb=8, resume=resume), workers,
+        progress=progress)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_resume_split(tmp_path, original, workers):
+    """Части из журнала не перезаписываются, повреждённая кодируется заново, .tmp удаляются."""
+    with pytest.raises(KeyboardInterrupt):
+        split(original, tmp_path, Interrupt(after=8), workers=workers)
+    journal_path, = glob.glob(str(tmp_path / "output" / "*" / "json" / "*.journal"))
+    assert not glob.glob(str(tmp_path / "output" / "*" / "json" / "*_data.bin.json"))
+    parts_dir = os.path.join(os.path.dirname(journal_path), "..", "parts")
+    with open(journal_path) as journal:
+        # Заголовок и записи готовых частей
+        assert len(journal.read().splitlines()) > 1
+
+    names = sorted(os.listdir(parts_dir))
+    inodes = {name: os.stat(os.path.join(parts_dir, name)).st_ino for name in names}
+    with open(os.path.join(parts_dir, names[1]), "ab") as part_file:
+        part_file.write(b"garbage")
+    stale = os.path.join(parts_dir, names[0] + ".12345.tmp")
+    with open(stale, "wb") as stale_file:
+        stale_file.write(b"half-written")
+
+    metadata_file = split(original, tmp_path, Interrupt(), resume=True, workers=workers)
+    assert metadata_file is not None
+    assert not os.path.exists(stale)
+    assert not os.path.exists(journal_path)
+    # Часть из журнала осталась прежним файлом, повреждённая записана заново
+    assert os.stat(os.path.join(parts_dir, names[0])).st_ino == inodes[names[0]]
+    assert os.stat(os.path.join(parts_dir, names[1])).st_ino != inodes[names[1]]
+    assert len(os.listdir(parts_dir)) == 20
+
+    os.makedirs(tmp_path / "merged")
+    output_path = load_script("merge_parts-silence.py").merge_file(metadata_file, str(tmp_path / "merged"))
+    with open(output_path, "rb") as merged_file:
+        assert merged_file.read() == DATA
+
+
+def test_resume_split_changed_input(tmp_path, original):
+    """Журнал от другого содержимого файла не используется: разбиение идёт заново."""
+    with pytest.raises(KeyboardInterrupt):
+        split(original, tmp_path, Interrupt(after=8))
+    changed = bytes(reversed(DATA))
+    original.write_bytes(changed)
+    os.utime(original, ns=(1, 1))
+    metadata_file = split(original, tmp_path, Interrupt(), resume=True)
+
+    os.makedirs(tmp_path / "merged")
+    output_path = load_script("merge_parts-silence.py").merge_file(metadata_file, str(tmp_path / "merged"))
+    with open(output_path, "rb") as merged_file:
+        assert merged_file.read() == changed
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_resume_merge(tmp_path, original, workers):
+    """Собранные до прерывания части не декодируются заново, испорченный диапазон .partial — декодируется."""
+    metadata_file = split(original, tmp_path, Interrupt())
+    merge_file = load_script("merge_parts-silence.py").merge_file
+    merged = tmp_path / "merged"
+    os.makedirs(merged)
+    with pytest.raises(KeyboardInterrupt):
+        merge_file(metadata_file, str(merged), workers, progress=Interrupt(after=12))
+    partial_path = merged / "data.bin.partial"
+    assert partial_path.exists() and (merged / "data.bin.journal").exists()
+    assert not (merged / "data.bin").exists()
+    with open(partial_path, "r+b") as partial_file:
+        partial_file.seek(8 * 1024 + 100)
+        partial_file.write(b"X" * 10)
+
+    progress = Interrupt()
+    output_path = merge_file(metadata_file, str(merged), workers, progress=progress, resume=True)
+    assert output_path == str(merged / "data.bin")
+    with open(output_path, "rb") as merged_file:
+        assert merged_file.read() == DATA
+    assert 2 in progress.parts and len(progress.parts) < 20
+    assert not any(name.endswith((".partial", ".journal")) for name in os.listdir(merged))
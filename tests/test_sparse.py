@@ -0,0 +1,154 @@
+# test_sparse.py
+# Куски из одного повторённого байта (--sparse, modules.sparse): серии подряд
+# идущих таких кусков — одна запись манифеста без части на диске; сборка
+# восстанавливает нули дырами, чтение и проверка частей проходят по сериям.
+import os
+import random
+
+import pytest
+
+from modules.options import SplitOptions
+from modules.progress_events import ProgressEmitter
+from modules.reader import open_parts
+from modules.scripts import load_script
+from modules.sparse import window_fill
+
+KB = 1024
+CHUNK_KB = 32
+
+
+@pytest.fixture
+def image(tmp_path):
+    """
+    Образ диска: данные, дыра в 2 МБ, 96 КБ байта 0xFF, данные и дыра в конце.
+    :return: (путь, байты образа).
+    """
+    rng = random.Random(25)
+    layout = [rng.randbytes(100 * KB), bytes(2048 * KB), b"\xff" * (96 * KB), rng.randbytes(40 * KB),
+              bytes(1024 * KB)]
+    path = tmp_path / "disk.img"
+    with open(path, "wb") as image_file:
+        for block in layout:
+            if block.count(0) == len(block):
+                image_file.seek(len(block), os.SEEK_CUR)
+            else:
+                image_file.write(block)
+        image_file.truncate()
+    return path, b"".join(layout)
+
+
+class Interrupt(ProgressEmitter):
+    """Прерывает сборку (как Ctrl+C) после after событий part."""
+
+    def __init__(self, after):
+        super().__init__()
+        self.after = after
+
+    def part(self, index, done_bytes):
+        self.after -= 1
+        if not self.after:
+            raise KeyboardInterrupt
+
+
+def split(tmp_path, path, workers=1, **options):
+    return load_script("separator-silence.py").split_file(
+        str(path), str(tmp_path / "output"), SplitOptions(chunk_size_kb=CHUNK_KB, sparse=True, **options), workers)
+
+
+def manifest_of(metadata_file):
+    return load_script("merge_parts-silence.py").load_manifest(metadata_file[:-len(".json")] + ".manifest.json")
+
+
+def has_holes(path):
+    stat = os.stat(path)
+    return stat.st_blocks * 512 < stat.st_size
+
+
+def test_window_fill():
+    assert window_fill(b"") is None
+    assert window_fill(b"\x00" * 100000) == 0
+    assert window_fill(memoryview(b"\x07" * 5000)) == 7
+    assert window_fill(b"\x00" * 99999 + b"\x01") is None
+    assert window_fill(b"ab") is None
+
+
+@pytest.mark.parametrize("workers, options", [
+    (1, {}),
+    (2, {}),
+    (1, {"read_mode": "mmap"}),
+    (2, {"read_mode": "mmap"}),
+    (1, {"layout": "pack"}),
+], ids=["w1", "w2", "mmap-w1", "mmap-w2", "pack"])
+def test_runs_and_round_trip(tmp_path, image, workers, options):
+    """Повторы сливаются в три серии, сборка (и в несколько процессов) восстанавливает образ с дырами."""
+    path, data = image
+    metadata_file = split(tmp_path, path, workers, **options)
+    manifest = manifest_of(metadata_file)
+    runs = [entry for entry in manifest["parts"] if "fill" in entry]
+    # Куски на стыках с данными остаются частями; последний кусок серии короче
+    assert [(entry["offset"] // KB, entry["size"] // KB, entry["fill"]) for entry in runs] == [
+        (128, 2016, 0), (2176, 64, 0xFF), (2304, 1004, 0)]
+    # Записей меньше, чем кусков: серии занимают по одной
+    assert len(manifest["parts"]) < len(data) // (CHUNK_KB * KB)
+    parts_dir = os.path.join(os.path.dirname(metadata_file), "..", "parts")
+    assert sum(len(names) for _, _, names in os.walk(parts_dir)) < len(manifest["parts"])
+
+    for merge_workers in (1, 2):
+        merged = tmp_path / f"merged_{merge_workers}"
+        os.makedirs(merged)
+        output_path = load_script("merge_parts-silence.py").merge_file(metadata_file, str(merged), merge_workers)
+        with open(output_path, "rb") as merged_file:
+            assert merged_file.read() == data
+        if has_holes(path):
+            assert has_holes(output_path)
+
+    assert load_script("verify_parts.py").check(metadata_file, decode=True)["bad_parts"] == {}
+
+
+def test_reader_over_runs(tmp_path, image):
+    path, data = image
+    metadata_file = split(tmp_path, path)
+    rng = random.Random(5)
+    with open_parts(metadata_file) as reader:
+        for start in [0, 96 * KB - 10, 2144 * KB - 10, 2240 * KB - 10, len(data) - 100] + \
+                [rng.randrange(len(data)) for _ in range(30)]:
+            reader.seek(start)
+            assert reader.read(50 * KB) == data[start:start + 50 * KB]
+
+
+def test_resume_merge_fills_runs(tmp_path, image):
+    """В продолжаемом .partial на месте серии могли остаться чужие байты — сборка пишет нули заново."""
+    path, data = image
+    metadata_file = split(tmp_path, path)
+    merged = tmp_path / "merged"
+    os.makedirs(merged)
+    merge_file = load_script("merge_parts-silence.py").merge_file
+    with pytest.raises(KeyboardInterrupt):
+        merge_file(metadata_file, str(merged), progress=Interrupt(after=6))
+    with open(merged / "disk.img.partial", "r+b") as partial_file:
+        partial_file.seek(1000 * KB)
+        partial_file.write(b"garbage")
+
+    output_path = merge_file(metadata_file, str(merged), resume=True)
+    with open(output_path, "rb") as merged_file:
+        assert merged_file.read() == data
+
+
+def test_parity_skips_runs(tmp_path, image):
+    """Контрольные части считаются только по частям с данными; потерянная часть восстанавливается."""
+    path, data = image
+    metadata_file = split(tmp_path, path, parity_parts=1, stripe_size=2)
+    manifest = manifest_of(metadata_file)
+    data_parts = [entry for entry in manifest["parts"] if "fill" not in entry]
+    assert len(manifest["parity"]["parts"]) == -(-len(data_parts) // 2)
+    os.remove(os.path.join(os.path.dirname(metadata_file), "..", "parts", data_parts[-1]["name"]))
+
+    merged = tmp_path / "merged"
+    os.makedirs(merged)
+    output_path = load_script("merge_parts-silence.py").merge_file(metadata_file, str(merged))
+    with open(output_path, "rb") as merged_file:
+        assert merged_file.read() == data
+
+
+def test_sparse_rejects_cdc():
+    assert "--sparse" in SplitOptions(sparse=True, chunking="cdc").error()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# verify_parts.py
+# Описание: Проверка частей по манифесту (хэши частей и корень дерева Меркла) без сборки файла
+import argparse
+import sys
+import time
+from modules.manifest import (format_part_numbers, leaf_hash, load_manifest, locate_manifest, merkle_levels,
+                              merkle_proof, parse_part_numbers, verify_proof)
+from modules.parallel import default_workers, verify_parts, workers_arg
+
+STATUS_MESSAGES = {
+    'missing': "отсутствует",
+    'corrupt': "повреждена",
+}
+
+
+def prove_parts(manifest, indices, root):
+    """
+    Доказательства включения выбранных частей в дерево с корнем root.
+
+    Каждое доказательство сверяется с root через verify_proof: запись части вместе
+    с ним можно передать дальше и проверить по одному корню, без всего манифеста.
+
+    :return: Словарь {номер: {"entry": запись манифеста, "proof": [(сторона, хэш соседа), ...]}}.
+    :raises ValueError: Части нет в манифесте или она не входит в дерево с корнем root.
+    """
+    entries = manifest["parts"]
+    positions = {entry["index"]: position for position, entry in enumerate(entries)}
+    levels = merkle_levels([leaf_hash(entry) for entry in entries])
+    proofs = {}
+    for index in sorted(indices):
+        if index not in positions:
+            raise ValueError(f"Части {index} нет в манифесте")
+        entry = entries[positions[index]]
+        proof = merkle_proof(entries, positions[index], levels)
+        if not verify_proof(entry, proof, root):
+            raise ValueError(f"Часть {index} не входит в дерево Меркла с корнем {root}")
+        proofs[index] = {"entry": entry, "proof": proof}
+    return proofs
+
+
+def check(path, parts=None, workers=1, decode=False, root=None, parts_dir=None):
+    """
+    Проверяет части по манифесту, ничего не печатая.
+
+    Параметры — как у verify().
+
+    :return: Словарь {"merkle_root", "checked", "bad_parts": {номер: 'missing' | 'corrupt'}, "seconds"};
+             для parts вместе с root — ещё "proofs" (см. prove_parts).
+    """
+    manifest_path, default_parts_dir = locate_manifest(path)
+    manifest = load_manifest(manifest_path)
+    indices = parse_part_numbers(parts) if parts else None
+    proofs = None
+    if root is not None and indices is not None:
+        # Выбранные части доказываются по отдельности: корень сверяется через путь каждой из них
+        proofs = prove_parts(manifest, indices, root)
+    elif root is not None and manifest["merkle_root"] != root:
+        raise ValueError(f"Корень дерева Меркла {manifest['merkle_root']} не совпадает с ожидаемым {root}")
+
+    if workers == 0:
+        workers = default_workers()
+
+    start_time = time.time()
+    bad_parts = {}
+    checked = 0
+    for index, status in verify_parts(manifest, parts_dir or default_parts_dir, indices, workers, decode):
+        checked += 1
+        if status != 'ok':
+            bad_parts[index] = status
+    result = {
+        "merkle_root": manifest["merkle_root"],
+        "checked": checked,
+        "bad_parts": bad_parts,
+        "seconds": time.time() - start_time,
+    }
+    if proofs is not None:
+        result["proofs"] = proofs
+    return result
+
+
+def verify(path, parts=None, workers=1, decode=False, root=None, parts_dir=None):
+    """
+    Проверяет части по манифесту и печатает номера отсутствующих и повреждённых частей.
+
+    :param path: Манифест, JSON-метаданные separator-silence.py или папка частей separator.py.
+    :param parts: Номера проверяемых частей, например '1-3,7' (None — все части).
+    :param workers: Количество процессов (0 — по числу ядер).
+    :param decode: Дополнительно декодировать части и сверять хэши кусков.
+    :param root: Ожидаемый корень дерева Меркла (например, из блокчейна pyChainLite); вместе с parts
+                 каждая выбранная часть проверяется доказательством включения в этот корень.
+    :param parts_dir: Папка с частями, если она отличается от стандартной.
+    :return: Список номеров частей, не прошедших проверку.
+    """
+    result = check(path, parts, workers, decode, root, parts_dir)
+    bad_parts = list(result["bad_parts"])
+    for index, status in result["bad_parts"].items():
+        print(f"Часть {index}: {STATUS_MESSAGES[status]}")
+
+    print(f"Проверено частей: {result['checked']} за {result['seconds']:.2f} секунд")
+    print(f"Корень дерева Меркла: {result['merkle_root']}")
+    if "proofs" in result:
+        print(f"Доказательства включения в корень проверены для частей: {format_part_numbers(result['proofs'])}")
+    if bad_parts:
+        print(f"Не прошли проверку: {format_part_numbers(bad_parts)}")
+    else:
+        print("Все проверенные части совпадают с манифестом.")
+    return bad_parts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка частей по манифесту без сборки файла")
+    parser.add_argument('--manifest', required=True, help='Путь к манифесту, JSON-метаданным или папке частей')
+    parser.add_argument('--parts-dir', default=None, help='Папка с частями (по умолчанию определяется по манифесту)')
+    parser.add_argument('--parts', default=None, help="Проверить только указанные части, например '1-3,7'")
+    parser.add_argument('--workers', type=workers_arg, default=1, help='Количество процессов для проверки (0 — по числу ядер)')
+    parser.add_argument('--decode', action='store_true', help='Дополнительно декодировать части и сверять хэши кусков')
+    parser.add_argument('--root', default=None, help='Ожидаемый корень дерева Меркла (с --parts — доказательства включения частей)')
+
+    args = parser.parse_args()
+
+    try:
+        bad = verify(args.manifest, args.parts, args.workers, args.decode, args.root, args.parts_dir)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ошибка: {e}")
+        sys.exit(2)
+    sys.exit(1 if bad else 0)